@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measures how long compile_and_run_all() takes to fail when the first diag
+fails to compile. Fails if the build doesn't fail on the compile error or if
+any diag is run: as when compile_all() raises before run_all(), no diag runs
+once a diag fails to compile.
+"""
+
+import argparse
+import logging as log
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from build_tools import DiagFactory  # noqa
+from build_tools.diag_factory import DiagFactoryError  # noqa
+from build_tools.environment import get_environment_manager  # noqa
+
+JUMPSTART_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir)
+)
+
+
+def create_failing_diag(diag_src_dir, output_dir):
+    # Copies a diag and breaks its C sources so that it fails to compile.
+    failing_diag_src_dir = os.path.join(output_dir, "compile_failure")
+    shutil.copytree(diag_src_dir, failing_diag_src_dir)
+    for file_name in os.listdir(failing_diag_src_dir):
+        if file_name.endswith(".c"):
+            with open(os.path.join(failing_diag_src_dir, file_name), "a") as f:
+                f.write('\n#error "This diag is expected to fail to compile"\n')
+    return failing_diag_src_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--diag_src_dirs",
+        help="Source directories of the diags built after the diag that fails to compile.",
+        nargs="+",
+        default=[
+            os.path.join(JUMPSTART_DIR, "tests", "common", "test000"),
+            os.path.join(JUMPSTART_DIR, "tests", "common", "test001"),
+        ],
+    )
+    parser.add_argument(
+        "--toolchain",
+        help="Toolchain to build the diags with.",
+        default="gcc",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
+    else:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
+
+    environment = get_environment_manager().get_environment("spike")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The diags are compiled one at a time in manifest order so the
+        # failing diag finishes compiling before any diag can be run.
+        diagnostics = {
+            "compile_failure": {
+                "source_dir": create_failing_diag(args.diag_src_dirs[0], temp_dir),
+            }
+        }
+        for diag_src_dir in args.diag_src_dirs:
+            diagnostics[os.path.basename(os.path.normpath(diag_src_dir))] = {
+                "source_dir": diag_src_dir
+            }
+
+        factory = DiagFactory(
+            build_manifest_yaml={"diagnostics": diagnostics},
+            root_build_dir=os.path.join(temp_dir, "build"),
+            environment=environment,
+            toolchain=args.toolchain,
+            rng_seed=None,
+            jumpstart_dir=JUMPSTART_DIR,
+            keep_meson_builddir=False,
+            jobs=1,
+            skip_write_manifest=True,
+        )
+
+        start_time = time.perf_counter()
+        compile_error = None
+        try:
+            factory.compile_and_run_all()
+        except DiagFactoryError as exc:
+            compile_error = exc
+        elapsed_time = time.perf_counter() - start_time
+
+        factory.summarize()
+
+        units = factory._diag_units
+
+    log.info(f"Built {len(units)} diags in {elapsed_time:.3f}s")
+
+    if compile_error is None or "failed to compile" not in str(compile_error):
+        log.error(f"The build didn't fail on the compile error: {compile_error}")
+        sys.exit(1)
+
+    if units["compile_failure"].compile_passed():
+        log.error("The diag that was expected to fail to compile compiled")
+        sys.exit(1)
+
+    run_diags = [
+        diag_name for diag_name, unit in units.items() if unit.run_state != unit.RunState.PENDING
+    ]
+    if run_diags:
+        log.error(f"Diags were run after a diag failed to compile: {', '.join(run_diags)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measures how long it takes to emit the generated sources of a diag with many
+CPUs and page table entries.
+"""
+
+import argparse
+import logging as log
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from generate_diag_sources import SourceGenerator  # noqa
+
+JUMPSTART_SOURCE_ATTRIBUTES_YAML = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        os.path.pardir,
+        os.path.pardir,
+        "src",
+        "public",
+        "jumpstart_public_source_attributes.yaml",
+    )
+)
+MAPPINGS_START_ADDRESS = 0xC0020000
+
+
+def create_diag_attributes_yaml(file_path, num_cpus, num_leaf_ptes):
+    diag_attributes = {
+        "satp_mode": "sv39",
+        "active_cpu_mask": bin((1 << num_cpus) - 1),
+        "mappings": [
+            {
+                "va": MAPPINGS_START_ADDRESS,
+                "pa": MAPPINGS_START_ADDRESS,
+                "xwr": "0b101",
+                "page_size": 0x1000,
+                "num_pages": 2,
+                "pma_memory_type": "wb",
+                "linker_script_section": ".text",
+            },
+            {
+                "va": MAPPINGS_START_ADDRESS + 0x2000,
+                "pa": MAPPINGS_START_ADDRESS + 0x2000,
+                "xwr": "0b011",
+                "page_size": 0x1000,
+                "num_pages": num_leaf_ptes,
+                "pma_memory_type": "wb",
+                "linker_script_section": ".data",
+            },
+        ],
+    }
+    with open(file_path, "w") as f:
+        yaml.dump(diag_attributes, f)
+
+
+def time_emit(source_generator, output_dir):
+    # Returns the time taken to emit each generated file.
+    output_files = {
+        "linker_script": os.path.join(output_dir, "diag.linker_script.ld"),
+        "assembly": os.path.join(output_dir, "diag.generated.S"),
+        "defines": os.path.join(output_dir, "diag.defines.h"),
+        "data_structures": os.path.join(output_dir, "diag.data_structures.h"),
+    }
+    emit_functions = {
+        "linker_script": source_generator.generate_linker_script,
+        "assembly": source_generator.generate_assembly_file,
+        "defines": source_generator.generate_defines_file,
+        "data_structures": source_generator.generate_data_structures_file,
+    }
+
+    emit_times = {}
+    for output_type, output_file in output_files.items():
+        start_time = time.perf_counter()
+        emit_functions[output_type](output_file)
+        emit_times[output_type] = time.perf_counter() - start_time
+        log.info(
+            f"{output_type:>16}: {emit_times[output_type]:8.3f}s ({os.path.getsize(output_file)} bytes)"
+        )
+    return emit_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_cpus",
+        help="Number of active CPUs in the diag.",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--num_leaf_ptes",
+        help="Number of 4K leaf PTEs mapped by the diag.",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--max_emit_time",
+        help="Fail if emitting all the generated files takes longer than this many seconds.",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
+    else:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        diag_attributes_yaml = os.path.join(output_dir, "diag.diag_attributes.yaml")
+        create_diag_attributes_yaml(diag_attributes_yaml, args.num_cpus, args.num_leaf_ptes)
+
+        start_time = time.perf_counter()
+        source_generator = SourceGenerator(
+            JUMPSTART_SOURCE_ATTRIBUTES_YAML,
+            diag_attributes_yaml,
+            None,
+            ["mmode", "smode", "umode"],
+        )
+        log.info(
+            f"Processed the memory map of {args.num_cpus} CPUs and {args.num_leaf_ptes} leaf PTEs in {time.perf_counter() - start_time:.3f}s"
+        )
+
+        emit_time = sum(time_emit(source_generator, output_dir).values())
+        log.info(f"Emitted all the generated files in {emit_time:.3f}s")
+
+    if args.max_emit_time is not None and emit_time > args.max_emit_time:
+        log.error(f"Emitting the generated files took longer than {args.max_emit_time}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measures how long it takes to generate and walk G-stage page tables with a
+mapping through every --root_index_step'th entry of the 2048 entry root table
+of sv39x4 or sv48x4. Fails unless the walk of each mapping goes through its
+root table entry and ends at its SPA. This includes the root indices >= 512,
+such as root[0x600] for the sv39x4 GPA 0xffffff8000000000.
+"""
+
+import argparse
+import logging as log
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from generate_diag_sources import SourceGenerator  # noqa
+from memory_management import PageTableAttributes, PteCodec  # noqa
+
+JUMPSTART_SOURCE_ATTRIBUTES_YAML = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        os.path.pardir,
+        os.path.pardir,
+        "src",
+        "public",
+        "jumpstart_public_source_attributes.yaml",
+    )
+)
+MAPPINGS_START_ADDRESS = 0xC0020000
+SPA_START_ADDRESS = 0x100000000
+
+
+def get_root_index_gpas(hgatp_mode, root_index_step):
+    # Returns the canonical GPA of the first page mapped through each
+    # root_index_step'th root table entry. Root indices whose GPAs can't be
+    # canonical are skipped.
+    pte_codec = PteCodec.get_codec(hgatp_mode)
+    va_mask = PageTableAttributes(hgatp_mode).get_attribute("va_mask")
+    va_bits = va_mask.bit_length()
+    root_shift, root_mask = pte_codec.vpn_fields[0]
+
+    gpas = {}
+    for root_index in range(0, root_mask + 1, root_index_step):
+        gpa = (root_index << root_shift) & va_mask
+        if (gpa >> (va_bits - 1)) & 1:
+            gpa |= ((1 << 64) - 1) & ~va_mask
+        if pte_codec.get_vpn(gpa, 0) == root_index:
+            gpas[root_index] = gpa
+    return gpas
+
+
+def create_diag_attributes_yaml(file_path, hgatp_mode, gpas):
+    mappings = [
+        {
+            "va": MAPPINGS_START_ADDRESS,
+            "pa": MAPPINGS_START_ADDRESS,
+            "xwr": "0b101",
+            "page_size": 0x1000,
+            "num_pages": 2,
+            "pma_memory_type": "wb",
+            "linker_script_section": ".text",
+        },
+        {
+            "va": MAPPINGS_START_ADDRESS + 0x2000,
+            "pa": MAPPINGS_START_ADDRESS + 0x2000,
+            "xwr": "0b011",
+            "page_size": 0x1000,
+            "num_pages": 1,
+            "pma_memory_type": "wb",
+            "linker_script_section": ".data",
+        },
+    ]
+    for mapping_index, gpa in enumerate(gpas):
+        mappings.append(
+            {
+                "gpa": gpa,
+                "spa": SPA_START_ADDRESS + mapping_index * 0x1000,
+                "xwr": "0b011",
+                "umode": "0b1",
+                "page_size": 0x1000,
+                "num_pages": 1,
+                "pma_memory_type": "wb",
+            }
+        )
+
+    diag_attributes = {
+        "satp_mode": "sv39",
+        "active_cpu_mask": "0b1",
+        "enable_virtualization": True,
+        "hgatp_mode": hgatp_mode,
+        "max_num_pagetable_pages_per_stage": "auto",
+        "mappings": mappings,
+    }
+    with open(file_path, "w") as f:
+        yaml.dump(diag_attributes, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--hgatp_mode",
+        help="G-stage translation mode.",
+        choices=["sv39x4", "sv48x4"],
+        default="sv39x4",
+    )
+    parser.add_argument(
+        "--root_index_step",
+        help="Map a page through every this many root table entries.",
+        type=lambda x: int(x, 0),
+        default=0x40,
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
+    else:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
+
+    gpas = get_root_index_gpas(args.hgatp_mode, args.root_index_step)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        diag_attributes_yaml = os.path.join(temp_dir, "g_stage.diag_attributes.yaml")
+        create_diag_attributes_yaml(diag_attributes_yaml, args.hgatp_mode, gpas.values())
+
+        start_time = time.perf_counter()
+        source_generator = SourceGenerator(
+            JUMPSTART_SOURCE_ATTRIBUTES_YAML,
+            diag_attributes_yaml,
+            None,
+            ["mmode", "smode", "umode"],
+        )
+        generate_time = time.perf_counter() - start_time
+
+    pte_size_in_bytes = PteCodec.get_codec(args.hgatp_mode).pte_size_in_bytes
+    root_address = source_generator.page_tables["cpu"]["g"].get_start_address()
+
+    failed = False
+    start_time = time.perf_counter()
+    walk_cache = {}
+    for mapping_index, (root_index, gpa) in enumerate(gpas.items()):
+        expected_spa = SPA_START_ADDRESS + mapping_index * 0x1000
+        try:
+            translation = source_generator.translate_stage("cpu", "g", gpa, walk_cache)
+        except Exception as exc:
+            log.error(f"Walk of GPA {hex(gpa)} through root[{hex(root_index)}] failed: {exc}")
+            failed = True
+            continue
+
+        root_pte_address = int(translation["ptes"][0]["address"], 16)
+        if root_pte_address != root_address + root_index * pte_size_in_bytes:
+            log.error(
+                f"Walk of GPA {hex(gpa)} read the root PTE at {hex(root_pte_address)}, expected root[{hex(root_index)}]"
+            )
+            failed = True
+        if int(translation["dest_address"], 16) != expected_spa:
+            log.error(
+                f"GPA {hex(gpa)} through root[{hex(root_index)}] translated to {translation['dest_address']}, expected {hex(expected_spa)}"
+            )
+            failed = True
+    walk_time = time.perf_counter() - start_time
+
+    log.info(
+        f"Generated {args.hgatp_mode} G-stage page tables for {len(gpas)} root indices in {generate_time:.3f}s and walked them in {walk_time:.3f}s"
+    )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
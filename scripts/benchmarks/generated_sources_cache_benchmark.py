@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measures how long DiagFactory takes to generate the sources of diags with an
+empty generated sources cache and again in another build directory with the
+cache filled by the first build. As with build_diag.py without --rng_seed,
+each build picks new random RNG seeds for the diags. Fails unless the second
+build restores the sources of every diag from the cache with the
+BUILD_RNG_SEED define of its own seed.
+"""
+
+import argparse
+import glob
+import logging as log
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from build_tools import DiagFactory  # noqa
+from build_tools.environment import get_environment_manager  # noqa
+
+JUMPSTART_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir)
+)
+
+
+def time_source_generation(diag_src_dirs, build_dir, cache_dir):
+    # Returns the DiagFactory and the time it took to generate the sources of
+    # all the diags.
+    factory = DiagFactory(
+        build_manifest_yaml={
+            "diagnostics": {
+                os.path.basename(os.path.normpath(diag_src_dir)): {"source_dir": diag_src_dir}
+                for diag_src_dir in diag_src_dirs
+            }
+        },
+        root_build_dir=build_dir,
+        environment=get_environment_manager().get_environment("spike"),
+        toolchain="gcc",
+        rng_seed=None,
+        jumpstart_dir=JUMPSTART_DIR,
+        keep_meson_builddir=False,
+        jobs=os.cpu_count(),
+        skip_write_manifest=True,
+        generated_sources_cache_dir=cache_dir,
+    )
+
+    start_time = time.perf_counter()
+    factory._prepare_all_units()
+    return factory, time.perf_counter() - start_time
+
+
+def get_build_rng_seed_define(defines_file):
+    with open(defines_file) as f:
+        for line in f:
+            if line.startswith("#define BUILD_RNG_SEED "):
+                return int(line.split()[2], 16)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--diag_src_dirs",
+        help="Source directories of the diags to generate the sources of.",
+        nargs="+",
+        default=sorted(glob.glob(os.path.join(JUMPSTART_DIR, "tests", "common", "test0[0-2]*"))),
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
+    else:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_dir = os.path.join(temp_dir, "cache")
+
+        _, cold_time = time_source_generation(
+            args.diag_src_dirs, os.path.join(temp_dir, "build0"), cache_dir
+        )
+        factory, warm_time = time_source_generation(
+            args.diag_src_dirs, os.path.join(temp_dir, "build1"), cache_dir
+        )
+
+        log.info(
+            f"Generated the sources of {len(args.diag_src_dirs)} diags in {cold_time:.3f}s with an empty cache and in {warm_time:.3f}s with a filled cache"
+        )
+
+        failed = False
+        cache_stats = factory.generated_sources_cache.get_stats()
+        if cache_stats["misses"] > 0 or cache_stats["hits"] != len(args.diag_src_dirs):
+            log.error(
+                f"The second build had {cache_stats['hits']} hit(s) and {cache_stats['misses']} miss(es), expected {len(args.diag_src_dirs)} hit(s)"
+            )
+            failed = True
+
+        for diag_name, unit in factory._diag_units.items():
+            defines_file = os.path.join(
+                unit.build_dir, "generated_sources", f"{diag_name}.defines.h"
+            )
+            build_rng_seed = get_build_rng_seed_define(defines_file)
+            if build_rng_seed != unit.rng_seed:
+                log.error(
+                    f"{defines_file} defines BUILD_RNG_SEED as {build_rng_seed}, expected {unit.rng_seed}"
+                )
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
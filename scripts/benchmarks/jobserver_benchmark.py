@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Runs jobs from more threads than there are tokens through the Jobserver
+and measures how long they take. Fails if the jobs don't all finish, or if
+more jobs than tokens run at the same time.
+"""
+
+import argparse
+import logging as log
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from build_tools.jobserver import Jobserver  # noqa
+
+
+class JobCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.num_running_jobs = 0
+        self.max_num_running_jobs = 0
+
+    def run_job(self, jobserver, job_duration):
+        with jobserver.job():
+            with self.lock:
+                self.num_running_jobs += 1
+                self.max_num_running_jobs = max(self.max_num_running_jobs, self.num_running_jobs)
+            time.sleep(job_duration)
+            with self.lock:
+                self.num_running_jobs -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_tokens",
+        help="Number of jobserver tokens.",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--num_threads",
+        help="Number of threads running jobs.",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--num_jobs",
+        help="Number of jobs to run.",
+        type=int,
+        default=32,
+    )
+    parser.add_argument(
+        "--job_duration",
+        help="Duration of each job in seconds.",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument(
+        "--timeout",
+        help="Fail if the jobs take longer than this many seconds.",
+        type=float,
+        default=30,
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
+    else:
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
+
+    job_counter = JobCounter()
+    jobserver = Jobserver(args.num_tokens)
+    with jobserver:
+        start_time = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=args.num_threads)
+        futures = [
+            executor.submit(job_counter.run_job, jobserver, args.job_duration)
+            for _ in range(args.num_jobs)
+        ]
+        done, not_done = wait(futures, timeout=args.timeout)
+        if not_done:
+            log.error(
+                f"{len(not_done)} of {args.num_jobs} jobs didn't finish within {args.timeout}s"
+            )
+            # The threads waiting for a token can't be stopped.
+            os._exit(1)
+        executor.shutdown()
+        elapsed_time = time.perf_counter() - start_time
+        for future in done:
+            future.result()
+
+    log.info(
+        f"Ran {args.num_jobs} jobs on {args.num_threads} threads with {args.num_tokens} token(s) in {elapsed_time:.3f}s"
+    )
+    log.info(f"At most {job_counter.max_num_running_jobs} job(s) ran at the same time")
+
+    if job_counter.max_num_running_jobs > args.num_tokens:
+        log.error(f"More jobs ran at the same time than there are tokens ({args.num_tokens})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measures how PageTables construction scales with the number of leaf PTEs."""
+
+import argparse
+import logging as log
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from memory_management import (  # noqa
+    MemoryMapping,
+    PageSize,
+    PageTables,
+    TranslationContext,
+)
+
+PAGETABLES_START_ADDRESS = 0x80000000
+MAPPINGS_START_ADDRESS = 0xC0000000
+
+
+def create_mappings(translation_context, num_leaf_ptes, num_pagetable_pages):
+    mappings = [
+        MemoryMapping(
+            {
+                "va": PAGETABLES_START_ADDRESS,
+                "pa": PAGETABLES_START_ADDRESS,
+                "xwr": "0b001",
+                "umode": "0b0",
+                "page_size": PageSize.SIZE_4K,
+                "num_pages": num_pagetable_pages,
+                "pma_memory_type": "wb",
+                "translation_stage": "s",
+                "linker_script_section": ".jumpstart.cpu.rodata.s_stage.pagetables",
+            },
+            translation_context,
+        ),
+        MemoryMapping(
+            {
+                "va": MAPPINGS_START_ADDRESS,
+                "pa": MAPPINGS_START_ADDRESS,
+                "xwr": "0b011",
+                "umode": "0b0",
+                "page_size": PageSize.SIZE_4K,
+                "num_pages": num_leaf_ptes,
+                "pma_memory_type": "wb",
+                "linker_script_section": ".data",
+            },
+            translation_context,
+        ),
+    ]
+    return mappings
+
+
+def get_num_pagetable_pages(num_leaf_ptes):
+    # One leaf level page per 512 leaf PTEs with enough headroom for the
+    # upper levels and for the PTEs mapping the pagetables themselves.
+    return 16 + 2 * ((num_leaf_ptes + 511) // 512)
+
+
+def time_page_tables(translation_context, num_leaf_ptes):
+    translation_mode = translation_context.get_selected_mode_for_stage("s")
+    num_pagetable_pages = get_num_pagetable_pages(num_leaf_ptes)
+    mappings = create_mappings(translation_context, num_leaf_ptes, num_pagetable_pages)
+
+    start_time = time.perf_counter()
+    PageTables(translation_mode, num_pagetable_pages, mappings)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_leaf_ptes",
+        help="Numbers of 4K leaf PTEs to generate page tables for.",
+        nargs="+",
+        type=int,
+        default=[1000, 10000, 100000],
+    )
+    parser.add_argument(
+        "--translation_mode",
+        help="Translation mode of the page tables.",
+        type=str,
+        default="sv39",
+        choices=["sv39", "sv48"],
+    )
+    parser.add_argument(
+        "--max_slowdown",
+        help="Fail if the time per leaf PTE of the largest run exceeds the time per leaf PTE of the smallest run by this factor.",
+        type=float,
+        default=3.0,
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Verbose output.", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.basicConfig(format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG)
+    else:
+        log.basicConfig(format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO)
+
+    translation_context = TranslationContext(False, {"s": args.translation_mode})
+
+    # Build the smallest page tables once untimed so that one-time costs,
+    # such as importing numpy for the vectorized leaf PTE encoding, aren't
+    # counted in the time per leaf PTE of the smallest run.
+    time_page_tables(translation_context, min(args.num_leaf_ptes))
+
+    time_per_pte = {}
+    for num_leaf_ptes in sorted(args.num_leaf_ptes):
+        elapsed_time = time_page_tables(translation_context, num_leaf_ptes)
+        time_per_pte[num_leaf_ptes] = elapsed_time / num_leaf_ptes
+        log.info(
+            f"{num_leaf_ptes:>8} leaf PTEs: {elapsed_time:8.3f}s ({time_per_pte[num_leaf_ptes] * 1e6:.2f}us per leaf PTE)"
+        )
+
+    smallest_run = min(time_per_pte)
+    largest_run = max(time_per_pte)
+    slowdown = time_per_pte[largest_run] / time_per_pte[smallest_run]
+    log.info(f"Time per leaf PTE grew {slowdown:.2f}x from {smallest_run} to {largest_run} PTEs")
+
+    if slowdown > args.max_slowdown:
+        log.error(f"PageTables construction is not scaling linearly (limit: {args.max_slowdown}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
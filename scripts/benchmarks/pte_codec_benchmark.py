@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compares encoding and decoding PTEs with PteCodec against the per-field
+BitField arithmetic it replaces.
+"""
+
+import argparse
+import logging as log
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+from data_structures import BitField  # noqa
+from memory_management import PageTableAttributes, PteCodec  # noqa
+
+XWR = 0b011
+UMODE = 0b1
+PBMT = 0b01
+
+
+def encode_with_bitfield(attributes, pa):
+    pte_value = BitField.place_bits(0, 1, attributes.get_attribute("valid_bit"))
+    pte_value = BitField.place_bits(pte_value, XWR, attributes.get_attribute("xwr_bits"))
+    pte_value = BitField.place_bits(pte_value, UMODE, attributes.get_attribute("umode_bit"))
+    pte_value = BitField.place_bits(pte_value, 1, attributes.get_attribute("a_bit"))
+    pte_value = BitField.place_bits(pte_value, 1, attributes.get_attribute("d_bit"))
+    pte_value = BitField.place_bits(pte_value, PBMT, attributes.get_attribute("pbmt_bits"))
+    for pa_ppn_bits, pte_ppn_bits in zip(
+        attributes.get_attribute("pa_ppn_bits"), attributes.get_attribute("pte_ppn_bits")
+    ):
+        pte_value = BitField.place_bits(
+            pte_value, BitField.extract_bits(pa, pa_ppn_bits), pte_ppn_bits
+        )
+    return pte_value
+
+
+def decode_with_bitfield(attributes, pte_value):
+    pa = 0
+    for pa_ppn_bits, pte_ppn_bits in zip(
+        attributes.get_attribute("pa_ppn_bits"), attributes.get_attribute("pte_ppn_bits")
+    ):
+        pa = BitField.place_bits(pa, BitField.extract_bits(pte_value, pte_ppn_bits), pa_ppn_bits)
+    return (
+        BitField.extract_bits(pte_value, attributes.get_attribute("valid_bit")),
+        BitField.extract_bits(pte_value, attributes.get_attribute("xwr_bits")),
+        BitField.extract_bits(pte_value, attributes.get_attribute("umode_bit")),
+        BitField.extract_bits(pte_value, attributes.get_attribute("a_bit")),
+        BitField.extract_bits(pte_value, attributes.get_attribute("d_bit")),
+        BitField.extract_bits(pte_value, attributes.get_attribute("pbmt_bits")),
+        pa,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_ptes",
+        help="Number of PTEs to encode and decode per measurement.",
+        type=int,
+        default=100000,
+    )
+    parser.add_argument(
+        "--translation_mode",
+        help="Translation mode of the PTEs.",
+        type=str,
+        default="sv39",
+        choices=PageTableAttributes.mode_attributes.keys(),
+    )
+    parser.add_argument(
+        "--repeat", help="Number of measurements to take the best of.", type=int, default=5
+    )
+    args = parser.parse_args()
+
+    log.basicConfig(format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO)
+
+    attributes = PageTableAttributes(args.translation_mode)
+    pte_codec = PteCodec.get_codec(args.translation_mode)
+
+    page_pas = [0x80000000 + page_id * 0x1000 for page_id in range(args.num_ptes)]
+
+    bitfield_ptes = [encode_with_bitfield(attributes, pa) for pa in page_pas]
+    codec_ptes = [
+        pte_codec.encode(valid=1, xwr=XWR, umode=UMODE, a=1, d=1, pbmt=PBMT, pa=pa)
+        for pa in page_pas
+    ]
+    if bitfield_ptes != codec_ptes:
+        log.error("PteCodec and BitField encodings differ")
+        sys.exit(1)
+    if [decode_with_bitfield(attributes, pte) for pte in bitfield_ptes] != [
+        tuple(pte_codec.decode(pte)) for pte in codec_ptes
+    ]:
+        log.error("PteCodec and BitField decodings differ")
+        sys.exit(1)
+
+    benchmarks = {
+        "encode": (
+            lambda: [encode_with_bitfield(attributes, pa) for pa in page_pas],
+            lambda: [
+                pte_codec.encode(valid=1, xwr=XWR, umode=UMODE, a=1, d=1, pbmt=PBMT, pa=pa)
+                for pa in page_pas
+            ],
+        ),
+        "decode": (
+            lambda: [decode_with_bitfield(attributes, pte) for pte in bitfield_ptes],
+            lambda: [pte_codec.decode(pte) for pte in codec_ptes],
+        ),
+    }
+
+    for name, (bitfield_path, codec_path) in benchmarks.items():
+        bitfield_time = min(timeit.repeat(bitfield_path, number=1, repeat=args.repeat))
+        codec_time = min(timeit.repeat(codec_path, number=1, repeat=args.repeat))
+        log.info(
+            f"{name}: BitField {bitfield_time / args.num_ptes * 1e9:8.1f}ns per PTE, PteCodec {codec_time / args.num_ptes * 1e9:8.1f}ns per PTE ({bitfield_time / codec_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,9 @@ from typing import Dict
 
 import yaml
 from build_tools import DiagFactory, Meson
+from build_tools.duration_history import get_default_duration_history_file
 from build_tools.environment import get_environment_manager
+from utils.generated_sources_cache import get_default_cache_dir
 
 
 def main():
@@ -163,6 +165,57 @@ def main():
         type=str,
         default=None,
     )
+    parser.add_argument(
+        "--generated_sources_cache_dir",
+        help="Directory to cache the generated diag sources in across builds.",
+        required=False,
+        type=str,
+        default=get_default_cache_dir(),
+    )
+    parser.add_argument(
+        "--generated_sources_cache_max_size",
+        help="Maximum size of the generated sources cache in MiB.",
+        required=False,
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--disable_generated_sources_cache",
+        help="Always generate the diag sources instead of using the generated sources cache.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--profile_source_generation",
+        help="Record the wall time and peak memory of each phase of the diag source generation and add them to the summary.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--single_meson_project",
+        help="Build all the diags that share a configuration in one meson project instead of setting up a meson project per diag.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--profile_source_generation_cprofile",
+        help="With --profile_source_generation, also write cProfile stats for each diag.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--diag_duration_history_file",
+        help="SQLite file to record the compile and run durations of the diags in. Diags expected to take longest are started first.",
+        required=False,
+        type=str,
+        default=get_default_duration_history_file(),
+    )
+    parser.add_argument(
+        "--disable_diag_duration_history",
+        help="Don't record the diag durations and build the diags in manifest order.",
+        action="store_true",
+        default=False,
+    )
     parser.add_argument(
         "-v", "--verbose", help="Verbose output.", action="store_true", default=False
     )
@@ -174,6 +227,26 @@ def main():
         type=int,
         default=5,
     )
+    parser.add_argument(
+        "--jobserver_tokens",
+        help="Number of jobs that the meson compiles of all the diags run between them, shared through a jobserver. Each compile takes one of these, so at most this many diags compile at the same time. Defaults to --jobs. Needs ninja 1.13 or later.",
+        required=False,
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--disable_jobserver",
+        help="Don't share a jobserver between the meson compiles. Each meson compile runs as many jobs as there are CPUs.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--run_jobs",
+        help="Number of parallel diag runs. Defaults to --jobs. Diags are run as soon as they are compiled.",
+        required=False,
+        type=int,
+        default=None,
+    )
 
     final_target = env_args.environment if env_args.environment else env_args.target
     if final_target and "oswis" in final_target:
@@ -342,6 +415,10 @@ def main():
     if args.disable_diag_run is True:
         environment.run_target = None
 
+    jobserver_tokens = None
+    if not args.disable_jobserver:
+        jobserver_tokens = args.jobserver_tokens if args.jobserver_tokens is not None else args.jobs
+
     factory = DiagFactory(
         build_manifest_yaml=build_manifest_yaml,
         root_build_dir=args.diag_build_dir,
@@ -359,17 +436,28 @@ def main():
         oswis_diag_timeout=args.oswis_diag_timeout,
         oswis_timeout=args.oswis_timeout,
         oswis_firmware_tarball=args.oswis_firmware_tarball,
+        generated_sources_cache_dir=(
+            None if args.disable_generated_sources_cache else args.generated_sources_cache_dir
+        ),
+        generated_sources_cache_max_size=args.generated_sources_cache_max_size,
+        profile_source_generation=args.profile_source_generation,
+        profile_source_generation_cprofile=args.profile_source_generation_cprofile,
+        single_meson_project=args.single_meson_project,
+        run_jobs=args.run_jobs,
+        duration_history_file=(
+            None if args.disable_diag_duration_history else args.diag_duration_history_file
+        ),
+        jobserver_tokens=jobserver_tokens,
     )
 
     try:
-        factory.compile_all()
-
         if environment.run_target is None:
+            factory.compile_all()
             log.info(
                 f"Skipping diag run: environment '{environment.name}' has no run_target (build-only environment)"
             )
-        elif environment.run_target is not None:
-            factory.run_all()
+        else:
+            factory.compile_and_run_all()
 
     except Exception as exc:
         # Ensure we always print a summary before exiting
@@ -8,7 +8,7 @@ import os
 import random
 import shutil
 import time
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 import yaml
 from system import functions as system_functions  # noqa
@@ -116,6 +116,22 @@ class AssetAction(enum.IntEnum):
 
 
 class DiagBuildUnit:
+    # Meson options that don't affect the JumpStart runtime library.
+    diag_specific_meson_options = [
+        "diag_name",
+        "diag_sources",
+        "diag_attributes_yaml",
+        "diag_attribute_overrides",
+        "diag_generated_sources_dir",
+        "diag_generate_disassembly",
+        "generate_trace",
+        "spike_additional_arguments",
+        "qemu_additional_arguments",
+        "spike_timeout",
+        "jumpstart_runtime_library",
+        "diag_manifest",
+    ]
+
     def __init__(
         self,
         yaml_config: dict,
@@ -565,8 +581,75 @@ class DiagBuildUnit:
             base += self._fmt_duration(self.run_duration_s)
         return self._colorize_status_prefix(base) if color else base
 
-    def compile(self):
+    def prepare_source_generation(self) -> Optional[dict]:
+        """Point the meson build at diag sources generated ahead of the build.
+
+        Returns the generate_diag_sources() keyword arguments that generate this
+        diag's sources into <build_dir>/generated_sources, or None if the meson
+        build has to generate them itself.
+        """
+        meson_options = self.meson.get_meson_options()
+        if meson_options.get("rivos_internal_build", False) is True:
+            # The meson build picks the internal source attributes file.
+            return None
+
+        generated_sources_dir = os.path.join(self.build_dir, "generated_sources")
+        system_functions.create_empty_directory(generated_sources_dir)
+        self.meson.override_meson_options_from_dict(
+            {"diag_generated_sources_dir": generated_sources_dir}
+        )
+
+        return {
+            "jumpstart_source_attributes_yaml": os.path.join(
+                self.meson.jumpstart_dir, "src/public/jumpstart_public_source_attributes.yaml"
+            ),
+            "diag_attributes_yaml": self.diag_source.get_diag_attributes_yaml(),
+            "override_diag_attributes": meson_options.get("diag_attribute_overrides") or None,
+            "priv_modes_enabled": meson_options.get(
+                "riscv_priv_modes_enabled", ["mmode", "smode", "umode"]
+            ),
+            "output_assembly_file": os.path.join(generated_sources_dir, f"{self.name}.generated.S"),
+            "output_linker_script": os.path.join(
+                generated_sources_dir, f"{self.name}.linker_script.ld"
+            ),
+            "output_defines_file": os.path.join(generated_sources_dir, f"{self.name}.defines.h"),
+            "output_data_structures_file": os.path.join(
+                generated_sources_dir, f"{self.name}.data_structures.h"
+            ),
+        }
+
+    def mark_source_generation_failed(self, error: str) -> None:
+        self.compile_error = f"Source generation failed: {error}"
+        self.compile_state = self.CompileState.FAILED
+
+    def get_jumpstart_runtime_meson_options(self) -> dict:
+        """Return the meson options that the JumpStart runtime library is built with.
+
+        These are all of this diag's meson options except the ones that only
+        affect the diag's own sources or how it is run, so diags with the same
+        options can share one runtime library.
+        """
+        return {
+            option: value
+            for option, value in self.meson.get_meson_options().items()
+            if option not in self.diag_specific_meson_options
+        }
+
+    def use_jumpstart_runtime_library(self, runtime_library: str) -> None:
+        """Link this diag against a JumpStart runtime library built ahead of the build."""
+        self.meson.override_meson_options_from_dict({"jumpstart_runtime_library": runtime_library})
+
+    def mark_jumpstart_runtime_build_failed(self, error: str) -> None:
+        self.compile_error = f"JumpStart runtime library build failed: {error}"
+        self.compile_state = self.CompileState.FAILED
+
+    def compile(self, extra_env: Optional[Dict[str, str]] = None):
+        """Build the diag. extra_env is added to the environment of meson compile."""
         start_time = time.perf_counter()
+        if self.compile_state == self.CompileState.FAILED:
+            # The diag sources or the JumpStart runtime library built ahead
+            # of the build failed.
+            return
         if self.meson is None:
             self.compile_error = f"Meson object does not exist for diag: {self.name}"
             self.compile_duration_s = time.perf_counter() - start_time
@@ -578,7 +661,7 @@ class DiagBuildUnit:
 
             self.meson.introspect()
 
-            compiled_assets = self.meson.compile()
+            compiled_assets = self.meson.compile(extra_env)
             for asset_type, asset_path in compiled_assets.items():
                 self.add_build_asset(asset_type, asset_path)
             self.compile_error = None
@@ -628,38 +711,116 @@ class DiagBuildUnit:
             self.run_error = str(exc)
         finally:
             self.run_duration_s = time.perf_counter() - start_time
-            # Normalize run_state based on expected_fail, return code, and error
-            try:
-                if self.expected_fail is True:
-                    # Expected to fail:
-                    if self.run_return_code is not None and self.run_return_code != 0:
-                        # This is the expected behavior
-                        self.run_state = self.RunState.EXPECTED_FAIL
-                        self.run_error = None
-                    elif self.run_return_code == 0:
-                        # Unexpected pass
-                        self.run_state = self.RunState.FAILED
-                        self.run_error = "Diag run passed but was expected to fail."
-                    else:
-                        # No return code; treat as failure unless error text indicates otherwise
-                        self.run_state = (
-                            self.RunState.EXPECTED_FAIL
-                            if self.run_error is None
-                            else self.RunState.FAILED
-                        )
+            self._finalize_run_state()
+
+    def _finalize_run_state(self) -> None:
+        # Normalize run_state based on expected_fail, return code, and error
+        try:
+            if self.expected_fail is True:
+                # Expected to fail:
+                if self.run_return_code is not None and self.run_return_code != 0:
+                    # This is the expected behavior
+                    self.run_state = self.RunState.EXPECTED_FAIL
+                    self.run_error = None
+                elif self.run_return_code == 0:
+                    # Unexpected pass
+                    self.run_state = self.RunState.FAILED
+                    self.run_error = "Diag run passed but was expected to fail."
+                else:
+                    # No return code; treat as failure unless error text indicates otherwise
+                    self.run_state = (
+                        self.RunState.EXPECTED_FAIL
+                        if self.run_error is None
+                        else self.RunState.FAILED
+                    )
+            else:
+                # Not expected to fail:
+                if self.run_error is None and (
+                    self.run_return_code is None or self.run_return_code == 0
+                ):
+                    self.run_state = self.RunState.PASS
                 else:
-                    # Not expected to fail:
-                    if self.run_error is None and (
-                        self.run_return_code is None or self.run_return_code == 0
-                    ):
-                        self.run_state = self.RunState.PASS
-                    else:
-                        self.run_state = self.RunState.FAILED
-            except Exception:
-                # Conservative fallback
-                if self.run_error is not None:
                     self.run_state = self.RunState.FAILED
-                # else keep whatever was set earlier
+        except Exception:
+            # Conservative fallback
+            if self.run_error is not None:
+                self.run_state = self.RunState.FAILED
+            # else keep whatever was set earlier
+
+    def get_diag_manifest_entry(self) -> dict:
+        """Return the fields that describe this diag in a diag manifest.
+
+        Only the diag specific meson options are part of the entry. The other
+        options are shared by all the diags built by the manifest's meson
+        project.
+        """
+        meson_options = self.meson.get_meson_options()
+        return {
+            "name": self.name,
+            "sources": list(meson_options.get("diag_sources") or []),
+            "attributes_yaml": meson_options.get("diag_attributes_yaml") or "",
+            "attribute_overrides": list(meson_options.get("diag_attribute_overrides") or []),
+            "generated_sources_dir": meson_options.get("diag_generated_sources_dir") or "",
+            "spike_arguments": list(meson_options.get("spike_additional_arguments") or []),
+            # Overrides from the command line are strings.
+            "generate_disassembly": str(
+                meson_options.get("diag_generate_disassembly", False)
+            ).lower()
+            == "true",
+            "generate_trace": str(meson_options.get("generate_trace", False)).lower() == "true",
+            "timeout": int(meson_options.get("spike_timeout", 30)),
+        }
+
+    def apply_diag_manifest_compile_result(
+        self, meson_builddir: str, compile_duration_s: float
+    ) -> None:
+        """Pick up this diag's outputs from the meson project that built all the diags of a manifest."""
+        if self.compile_state == self.CompileState.FAILED:
+            # The diag sources generated ahead of the build failed.
+            return
+
+        self.compile_duration_s = compile_duration_s
+        diag_elf = os.path.join(meson_builddir, self.name + ".elf")
+        diag_disasm = os.path.join(meson_builddir, self.name + ".dis")
+        if not os.path.exists(diag_elf):
+            self.compile_error = f"Compile failed. Check: {meson_builddir}"
+            self.compile_state = self.CompileState.FAILED
+            return
+
+        self.add_build_asset("elf", diag_elf)
+        if os.path.exists(diag_disasm):
+            self.add_build_asset("disasm", diag_disasm)
+        self.compile_error = None
+        self.current_state = self.state.COMPILED
+        self.compile_state = self.CompileState.PASS
+
+    def apply_meson_test_result(self, test_result: Optional[dict], meson_builddir: str) -> None:
+        """Apply the result of this diag's test from the meson test log of a diag manifest build."""
+        if self.compile_state != self.CompileState.PASS:
+            # Do not run if compile failed
+            return
+
+        if test_result is None:
+            self.run_error = f"No meson test result for diag. Check: {meson_builddir}"
+            self.run_state = self.RunState.FAILED
+            return
+
+        self.run_duration_s = test_result.get("duration")
+        self.run_return_code = test_result.get("returncode")
+        self.run_error = None
+        if test_result.get("result") != "OK":
+            self.run_error = f"Run failed ({test_result.get('result')}). Check: {meson_builddir}"
+
+        trace_file = os.path.join(meson_builddir, f"{self.name}.itrace")
+        if self.get_diag_manifest_entry()["generate_trace"]:
+            if self.run_error is None and not os.path.exists(trace_file):
+                self.run_error = f"Run passed but trace file not created. Check: {meson_builddir}"
+            elif os.path.exists(trace_file):
+                self.add_build_asset("trace", trace_file)
+
+        if self.run_error is None:
+            self.current_state = self.state.RUN
+        self._finalize_run_state()
 
     def apply_batch_outcome_from_junit_status(self, junit_status: Optional[str]) -> None:
         """Apply batch-run outcome to this unit using a junit testcase status string.
@@ -2,18 +2,28 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import contextlib
+import copy
 import glob
+import hashlib
+import json
 import logging as log
 import os
 import random
 import sys
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Tuple
 
 import yaml
+from generate_diag_sources import generate_diag_sources_for_batch  # noqa
 from system import functions as system_functions  # noqa
+from utils.generated_sources_cache import GeneratedSourcesCache  # noqa
 
 from .diag import DiagBuildUnit
+from .duration_history import DurationHistory
+from .jobserver import Jobserver
+from .meson import Meson, get_meson_test_name, write_diag_manifest
 
 
 class DiagFactoryError(Exception):
@@ -53,6 +63,14 @@ class DiagFactory:
         oswis_diag_timeout: int = None,
         oswis_timeout: int = None,
         oswis_firmware_tarball: str = None,
+        generated_sources_cache_dir: Optional[str] = None,
+        generated_sources_cache_max_size: int = 1024,
+        profile_source_generation: bool = False,
+        profile_source_generation_cprofile: bool = False,
+        single_meson_project: bool = False,
+        run_jobs: Optional[int] = None,
+        duration_history_file: Optional[str] = None,
+        jobserver_tokens: Optional[int] = None,
     ) -> None:
         self.build_manifest_yaml = build_manifest_yaml
         self.root_build_dir = os.path.abspath(root_build_dir)
@@ -67,6 +85,12 @@ class DiagFactory:
             self.jobs = max(1, int(jobs))
         except Exception:
             self.jobs = 1
+        # Diag runs have their own concurrency limit, by default the same as
+        # compiles.
+        try:
+            self.run_jobs = self.jobs if run_jobs is None else max(1, int(run_jobs))
+        except Exception:
+            self.run_jobs = self.jobs
         self.global_overrides: Dict[str, any] = {}
         self.cli_meson_option_overrides = cli_meson_option_overrides or []
         self.cli_diag_attribute_overrides = cli_diag_attribute_overrides or []
@@ -83,6 +107,51 @@ class DiagFactory:
         self.oswis_timeout = oswis_timeout
         self.oswis_firmware_tarball = oswis_firmware_tarball
 
+        # Content-addressed cache of generated sources that outlives the build
+        # root. Disabled if no cache directory is given.
+        self.generated_sources_cache: Optional[GeneratedSourcesCache] = None
+        if generated_sources_cache_dir is not None:
+            self.generated_sources_cache = GeneratedSourcesCache(
+                generated_sources_cache_dir, generated_sources_cache_max_size * 1024 * 1024
+            )
+
+        self.profile_source_generation = bool(profile_source_generation)
+        self.profile_source_generation_cprofile = bool(profile_source_generation_cprofile)
+        # Source generation profile of each diag when profiling is enabled
+        self._source_generation_profiles: Dict[str, dict] = {}
+        self._source_generation_profile_path: Optional[str] = None
+
+        # Compile and run durations of earlier builds used to start the
+        # longest diags first. Disabled if no history file is given.
+        self.duration_history: Optional[DurationHistory] = None
+        if duration_history_file is not None:
+            try:
+                self.duration_history = DurationHistory(duration_history_file)
+            except Exception as exc:
+                log.warning(f"Not using the diag duration history {duration_history_file}: {exc}")
+        # Configuration hash of each diag's durations. Taken before the diag
+        # is built since meson introspection adds the default meson options.
+        self._duration_config_hashes: Dict[str, str] = {}
+
+        # Jobserver shared by all the meson compiles so that the ninjas of the
+        # diags compiled in parallel run at most jobserver_tokens jobs between
+        # them instead of one job per core each. Disabled if None.
+        self.jobserver: Optional[Jobserver] = None
+        if jobserver_tokens is not None:
+            self.jobserver = Jobserver(jobserver_tokens)
+            # Each meson compile holds a token for its first job.
+            if jobserver_tokens < self.jobs:
+                log.warning(
+                    f"At most {jobserver_tokens} diag(s) will compile at the same time: each compile holds one of the {jobserver_tokens} jobserver token(s) and jobs is {self.jobs}"
+                )
+
+        # Build all the diags that share a configuration in one meson project
+        # instead of one meson project per diag.
+        self.single_meson_project = bool(single_meson_project)
+        # Meson project and units of each configuration in single meson
+        # project mode
+        self._meson_projects: Dict[str, Tuple[Meson, List[DiagBuildUnit]]] = {}
+
         loaded = self.build_manifest_yaml or {}
 
         # Validate the provided YAML manifest strictly before proceeding
@@ -272,13 +341,19 @@ class DiagFactory:
         max_workers: int,
         tasks: Dict[str, Tuple],
         runner_fn,
+        phases: Optional[List[str]] = None,
     ) -> Dict[str, DiagBuildUnit]:
         """Execute tasks concurrently and return a mapping of diag name to unit.
 
         - tasks: mapping of diag_name -> tuple where the first element is the DiagBuildUnit
                  followed by any extra args needed by runner_fn.
         - runner_fn: callable invoked as runner_fn(name, *task_args)
+        - phases: phases ("compile", "run") run by runner_fn. Tasks are submitted
+                 longest expected duration of these phases first.
         """
+        if phases is not None:
+            tasks = self._order_longest_first(tasks, phases)
+
         results: Dict[str, DiagBuildUnit] = {}
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_task = {}
@@ -297,6 +372,61 @@ class DiagFactory:
                 results[diag_name] = unit
         return results
 
+    def get_expected_duration(self, unit: DiagBuildUnit, phases: List[str]) -> Optional[float]:
+        """Return the expected duration of the phases of a unit from the duration history."""
+        if self.duration_history is None:
+            return None
+        config_hash = self._duration_config_hashes[unit.name]
+        expected_durations = [
+            self.duration_history.get_expected_duration(unit.name, config_hash, phase)
+            for phase in phases
+        ]
+        if all(expected_duration is None for expected_duration in expected_durations):
+            return None
+        return sum(expected_duration or 0 for expected_duration in expected_durations)
+
+    def _order_longest_first(self, tasks: Dict[str, Tuple], phases: List[str]) -> Dict[str, Tuple]:
+        """Order tasks longest expected duration first (LPT).
+
+        Starting the longest diags first keeps a few long diags from being
+        started last and running on their own at the end of the build. Tasks
+        keep their manifest order if nothing is known about their durations.
+        """
+        if self.duration_history is None:
+            return tasks
+
+        expected_durations = {
+            diag_name: self.get_expected_duration(task_args[0], phases)
+            for diag_name, task_args in tasks.items()
+        }
+        if all(expected_duration is None for expected_duration in expected_durations.values()):
+            return tasks
+
+        ordered_diag_names = sorted(
+            tasks, key=lambda diag_name: expected_durations[diag_name] or 0, reverse=True
+        )
+        log.debug(
+            "Expected durations: "
+            + ", ".join(
+                f"{diag_name}: {expected_durations[diag_name]}" for diag_name in ordered_diag_names
+            )
+        )
+        return {diag_name: tasks[diag_name] for diag_name in ordered_diag_names}
+
+    def record_durations(self, phases: List[str]) -> None:
+        """Store the durations of the given phases of all the units in the duration history."""
+        if self.duration_history is None:
+            return
+
+        records = []
+        for unit in self._diag_units.values():
+            config_hash = self._duration_config_hashes[unit.name]
+            if "compile" in phases and unit.compile_passed() and unit.compile_duration_s:
+                records.append((unit.name, config_hash, "compile", unit.compile_duration_s))
+            if "run" in phases and unit.run_state != unit.RunState.PENDING and unit.run_duration_s:
+                records.append((unit.name, config_hash, "run", unit.run_duration_s))
+        self.duration_history.record(records)
+
     def _normalize_to_kv_list(self, value) -> List[str]:
         """Normalize override structures into a list of "k=v" strings.
 
@@ -468,26 +598,317 @@ class DiagFactory:
 
         return diag_build_dir, unit
 
-    def compile_all(self) -> Dict[str, DiagBuildUnit]:
-        def _do_compile(name: str, unit: DiagBuildUnit, build_dir: str) -> None:
-            log.info(f"Compiling '{unit.diag_source.get_original_path()}'")
-            log.debug(f"Build directory: {build_dir}")
+    def generate_sources_all(self) -> None:
+        """Generate the sources of all the prepared diags in a single batch.
+
+        The shared JumpStart source attributes are parsed once and the diags are
+        spread over a pool of `jobs` processes instead of meson running the
+        source generator once per diag. Diags whose generation fails are
+        marked as compile failures.
+
+        With a generated sources cache, diags whose inputs haven't changed since
+        an earlier build have their sources copied from the cache instead.
+
+        With profiling enabled, each diag's profile is written next to its
+        generated sources and all of them are collected in
+        source_generation_profile.json in the build root.
+        """
+        batch: Dict[str, dict] = {}
+        for diag_name, unit in self._diag_units.items():
+            batch_entry = unit.prepare_source_generation()
+            if batch_entry is not None:
+                batch[diag_name] = batch_entry
+
+        if len(batch) == 0:
+            return
+
+        start_time = time.perf_counter()
+        errors, profiles = generate_diag_sources_for_batch(
+            batch,
+            self.jobs,
+            self.generated_sources_cache,
+            profile=self.profile_source_generation,
+            cprofile=self.profile_source_generation_cprofile,
+        )
+        log.info(
+            f"Generated the sources of {len(batch)} diag(s) in {time.perf_counter() - start_time:.2f}s"
+        )
+        if self.generated_sources_cache is not None:
+            cache_stats = self.generated_sources_cache.get_stats()
+            log.info(
+                f"Generated sources cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)"
+            )
+
+        for diag_name, error in errors.items():
+            log.error(f"Source generation failed for diag '{diag_name}': {error}")
+            self._diag_units[diag_name].mark_source_generation_failed(error)
+
+        if self.profile_source_generation:
+            self._source_generation_profiles = profiles
+            self.write_source_generation_profile()
+
+    def write_source_generation_profile(self, output_path: Optional[str] = None) -> str:
+        """Write the source generation profiles of all the diags to disk and return the path."""
+        if output_path is None:
+            output_path = os.path.join(self.root_build_dir, "source_generation_profile.json")
+        with open(output_path, "w") as f:
+            json.dump(self._source_generation_profiles, f, indent=2)
+            f.write("\n")
+        self._source_generation_profile_path = output_path
+        log.debug(f"Wrote source generation profile: {output_path}")
+        return output_path
+
+    def format_source_generation_profile(self) -> List[str]:
+        """Format the per diag source generation profiles for the summary.
+
+        Each diag is listed with its generation wall time, peak memory and
+        slowest top level phase, slowest diag first.
+        """
+        lines = [f"Source generation profile: {self._source_generation_profile_path}"]
+        profiles = sorted(
+            self._source_generation_profiles.items(),
+            key=lambda item: item[1]["wall_time_in_seconds"],
+            reverse=True,
+        )
+        for diag_name, profile in profiles:
+            top_level_phases = [phase for phase in profile["phases"] if "/" not in phase["name"]]
+            line = (
+                f"  {diag_name}: {profile['wall_time_in_seconds']:.2f}s, "
+                f"{profile['peak_memory_in_bytes'] / (1024 * 1024):.1f} MiB peak"
+            )
+            if len(top_level_phases) > 0:
+                slowest_phase = max(
+                    top_level_phases, key=lambda phase: phase["wall_time_in_seconds"]
+                )
+                line += f" (slowest: {slowest_phase['name']} {slowest_phase['wall_time_in_seconds']:.2f}s)"
+            lines.append(line)
+        total_wall_time = sum(
+            profile["wall_time_in_seconds"] for profile in self._source_generation_profiles.values()
+        )
+        lines.append(
+            f"  Total: {total_wall_time:.2f}s across {len(self._source_generation_profiles)} diag(s)"
+        )
+        return lines
+
+    def get_jumpstart_runtime_config_hash(self, unit: DiagBuildUnit) -> str:
+        """Return the hash of everything the unit's JumpStart runtime library depends on."""
+        runtime_config = {
+            "toolchain": self.toolchain,
+            "meson_options": unit.get_jumpstart_runtime_meson_options(),
+        }
+        return hashlib.sha256(json.dumps(runtime_config, sort_keys=True).encode()).hexdigest()
+
+    def build_jumpstart_runtimes_all(self) -> None:
+        """Build the JumpStart runtime library once per configuration.
+
+        The parts of the JumpStart runtime that don't depend on the diag
+        attributes only have to be compiled once for all the prepared diags
+        that are built with the same toolchain and runtime meson options
+        (buildtype, riscv_priv_modes_enabled, mcmodel, diag_custom_defines,
+        ...). Each distinct configuration is built in
+        jumpstart_runtime/<config hash> in the build root and its diags link
+        against the library instead of compiling the runtime themselves.
+        Diags whose runtime library fails to build are marked as compile
+        failures.
+        """
+        units_by_config_hash: Dict[str, List[DiagBuildUnit]] = {}
+        for unit in self._diag_units.values():
+            if unit.compile_state == unit.CompileState.FAILED:
+                # Source generation failed.
+                continue
+            config_hash = self.get_jumpstart_runtime_config_hash(unit)
+            units_by_config_hash.setdefault(config_hash, []).append(unit)
+
+        if len(units_by_config_hash) == 0:
+            return
+
+        def _build_runtime(config_hash: str, unit: DiagBuildUnit) -> str:
+            runtime_meson_builddir = os.path.join(
+                self.root_build_dir, "jumpstart_runtime", config_hash[:16], "meson_builddir"
+            )
+            system_functions.create_empty_directory(runtime_meson_builddir)
+            runtime_meson = Meson(
+                self.toolchain,
+                self.jumpstart_dir,
+                "jumpstart_runtime",
+                [],
+                "",
+                runtime_meson_builddir,
+            )
+            runtime_meson.override_meson_options_from_dict(
+                copy.deepcopy(unit.get_jumpstart_runtime_meson_options())
+            )
+            runtime_meson.override_meson_options_from_dict({"jumpstart_runtime_only": True})
+            runtime_meson.setup()
+            with self._jobserver_job():
+                return runtime_meson.compile_jumpstart_runtime_library(
+                    self._get_jobserver_environment()
+                )
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {
+                executor.submit(_build_runtime, config_hash, units[0]): config_hash
+                for config_hash, units in units_by_config_hash.items()
+            }
+            for future in as_completed(futures):
+                config_hash = futures[future]
+                try:
+                    runtime_library = future.result()
+                except Exception as exc:
+                    log.error(f"JumpStart runtime library build failed: {exc}")
+                    for unit in units_by_config_hash[config_hash]:
+                        unit.mark_jumpstart_runtime_build_failed(f"{type(exc).__name__}: {exc}")
+                    continue
+                for unit in units_by_config_hash[config_hash]:
+                    unit.use_jumpstart_runtime_library(runtime_library)
+
+        log.info(
+            f"Built {len(units_by_config_hash)} JumpStart runtime library(s) for {sum(len(units) for units in units_by_config_hash.values())} diag(s) in {time.perf_counter() - start_time:.2f}s"
+        )
+
+    def _compile_all_single_meson_project(self) -> None:
+        """Build the prepared diags with one meson project per configuration.
+
+        Diags that share the toolchain and the meson options other than the
+        diag specific ones are listed in a diag manifest and built by a
+        single meson project in meson_project/<config hash> in the build root.
+        meson setup runs once per project and a single ninja schedules the
+        compiles of all its diags. Each diag's compile time is the sum of the
+        ninja steps that built its outputs.
+        """
+        for unit in self._diag_units.values():
+            if unit.compile_state == unit.CompileState.FAILED:
+                # Source generation failed.
+                continue
+            config_hash = self.get_jumpstart_runtime_config_hash(unit)
+            if config_hash not in self._meson_projects:
+                project_dir = os.path.join(self.root_build_dir, "meson_project", config_hash[:16])
+                meson_builddir = os.path.join(project_dir, "meson_builddir")
+                system_functions.create_empty_directory(meson_builddir)
+                meson = Meson(
+                    self.toolchain,
+                    self.jumpstart_dir,
+                    f"meson_project_{config_hash[:16]}",
+                    [],
+                    "",
+                    meson_builddir,
+                )
+                meson.override_meson_options_from_dict(
+                    copy.deepcopy(unit.get_jumpstart_runtime_meson_options())
+                )
+                meson.override_meson_options_from_dict(
+                    {"diag_manifest": os.path.join(project_dir, "diag_manifest.txt")}
+                )
+                self._meson_projects[config_hash] = (meson, [])
+            self._meson_projects[config_hash][1].append(unit)
+
+        for meson, units in self._meson_projects.values():
+            log.info(f"Compiling {len(units)} diag(s) in {meson.meson_builddir}")
+            write_diag_manifest(
+                meson.get_meson_options()["diag_manifest"],
+                [unit.get_diag_manifest_entry() for unit in units],
+            )
+
             try:
-                unit.compile()
+                meson.setup()
             except Exception as exc:
-                # Capture unexpected exceptions as compile_error
-                unit.compile_error = f"{type(exc).__name__}: {exc}"
-                unit.compile_state = unit.CompileState.FAILED
+                for unit in units:
+                    unit.compile_error = f"{type(exc).__name__}: {exc}"
+                    unit.compile_state = unit.CompileState.FAILED
+                continue
+
+            if self.jobserver is None:
+                meson.compile_diag_manifest(self.jobs)
+            else:
+                with self._jobserver_job():
+                    meson.compile_diag_manifest(None, self._get_jobserver_environment())
+
+            step_durations = meson.get_ninja_step_durations()
+            for unit in units:
+                compile_duration_s = sum(
+                    duration
+                    for output, duration in step_durations.items()
+                    if output.startswith(f"{unit.name}.")
+                )
+                try:
+                    unit.apply_diag_manifest_compile_result(
+                        meson.meson_builddir, compile_duration_s
+                    )
+                except Exception as exc:
+                    unit.compile_error = f"{type(exc).__name__}: {exc}"
+                    unit.compile_state = unit.CompileState.FAILED
+
+    def _run_all_single_meson_project(self, jobs: int) -> None:
+        """Run the tests of each meson project and map their results back to the diags."""
+        for meson, units in self._meson_projects.values():
+            if not any(unit.compile_passed() for unit in units):
+                continue
+            log.info(f"Running {len(units)} diag(s) in {meson.meson_builddir}")
+            test_results = meson.test_diag_manifest(jobs)
+            for unit in units:
+                try:
+                    unit.apply_meson_test_result(
+                        test_results.get(get_meson_test_name(unit.name)), meson.meson_builddir
+                    )
+                except Exception as exc:
+                    unit.run_error = f"{type(exc).__name__}: {exc}"
+                    unit.run_state = unit.RunState.FAILED
+
+    def _compile_unit(self, name: str, unit: DiagBuildUnit, build_dir: str) -> None:
+        log.info(f"Compiling '{unit.diag_source.get_original_path()}'")
+        log.debug(f"Build directory: {build_dir}")
+        try:
+            with self._jobserver_job():
+                unit.compile(self._get_jobserver_environment())
+        except Exception as exc:
+            # Capture unexpected exceptions as compile_error
+            unit.compile_error = f"{type(exc).__name__}: {exc}"
+            unit.compile_state = unit.CompileState.FAILED
+
+    def _running_jobserver(self):
+        """Return a context in which the jobserver, if any, is running."""
+        if self.jobserver is None:
+            return contextlib.nullcontext()
+        return self.jobserver
+
+    def _jobserver_job(self):
+        """Return a context that holds a jobserver token, if there is a jobserver."""
+        if self.jobserver is None:
+            return contextlib.nullcontext()
+        return self.jobserver.job()
+
+    def _get_jobserver_environment(self) -> Optional[Dict[str, str]]:
+        if self.jobserver is None:
+            return None
+        return self.jobserver.get_environment()
+
+    def _run_unit(self, name: str, unit: DiagBuildUnit) -> None:
+        log.info(f"Running diag '{unit.diag_source.get_original_path()}'")
+        try:
+            unit.run()
+        except Exception as exc:
+            unit.run_error = f"{type(exc).__name__}: {exc}"
+            unit.run_state = unit.RunState.FAILED
+
+    def _prepare_all_units(self) -> Dict[str, Tuple]:
+        """Prepare a unit for each diag and generate their sources.
 
-        # Build task map: name -> (unit, build_dir)
+        Returns the compile task map: name -> (unit, build_dir).
+        """
         tasks: Dict[str, Tuple] = {}
         for diag_name, config in self.diagnostics.items():
             diag_build_dir, unit = self._prepare_unit(diag_name, config)
             self._diag_units[diag_name] = unit
             tasks[diag_name] = (unit, diag_build_dir)
+            self._duration_config_hashes[diag_name] = self.get_jumpstart_runtime_config_hash(unit)
+
+        self.generate_sources_all()
 
-        self._execute_parallel(self.jobs, tasks, _do_compile)
+        return tasks
 
+    def _finish_compile_all(self) -> None:
+        """Generate the artifacts that need all the diags to be compiled."""
         for name, unit in self._diag_units.items():
             log.debug(f"Diag built details: {unit}")
 
@@ -499,7 +920,7 @@ class DiagFactory:
         if not self.skip_write_manifest:
             self.write_run_manifest()
 
-        # After building all units (and generating any artifacts), raise if any compile failed
+    def _raise_on_compile_failures(self) -> None:
         compile_failures = [
             unit.diag_source.get_original_path()
             for name, unit in self._diag_units.items()
@@ -509,6 +930,33 @@ class DiagFactory:
             failure_list = "\n  ".join(compile_failures)
             raise DiagFactoryError(f"One or more diagnostics failed to compile:\n  {failure_list}")
 
+    def _raise_on_run_failures(self) -> None:
+        run_failures = [
+            unit.diag_source.get_original_path()
+            for name, unit in self._diag_units.items()
+            if unit.compile_passed() and not unit.run_passed()
+        ]
+        if run_failures:
+            failure_list = "\n  ".join(run_failures)
+            raise DiagFactoryError(f"One or more diagnostics failed to run:\n  {failure_list}")
+
+    def compile_all(self) -> Dict[str, DiagBuildUnit]:
+        tasks = self._prepare_all_units()
+
+        with self._running_jobserver():
+            if self.single_meson_project:
+                self._compile_all_single_meson_project()
+            else:
+                self.build_jumpstart_runtimes_all()
+
+                self._execute_parallel(self.jobs, tasks, self._compile_unit, ["compile"])
+
+        self._finish_compile_all()
+        self.record_durations(["compile"])
+
+        # After building all units (and generating any artifacts), raise if any compile failed
+        self._raise_on_compile_failures()
+
     def run_all(self) -> Dict[str, DiagBuildUnit]:
         if not self._diag_units:
             raise DiagFactoryError("run_all() called before compile_all().")
@@ -524,30 +972,105 @@ class DiagFactory:
         elif self.environment.run_target == "oswis":
             # Handles non-batch mode cases for oswis target.
             self._run_all_oswis()
+        elif self.single_meson_project:
+            effective_jobs = self.run_jobs if self.environment.run_target == "spike" else 1
+            self._run_all_single_meson_project(effective_jobs)
         else:
             # Non-batch mode: run per-diag via DiagBuildUnit.run()
-            effective_jobs = self.jobs if self.environment.run_target == "spike" else 1
-
-            def _do_run(name: str, unit: DiagBuildUnit) -> None:
-                log.info(f"Running diag '{unit.diag_source.get_original_path()}'")
-                try:
-                    unit.run()
-                except Exception as exc:
-                    unit.run_error = f"{type(exc).__name__}: {exc}"
-                    unit.run_state = unit.RunState.FAILED
+            effective_jobs = self.run_jobs if self.environment.run_target == "spike" else 1
 
             run_tasks: Dict[str, Tuple] = {name: (unit,) for name, unit in self._diag_units.items()}
-            self._execute_parallel(effective_jobs, run_tasks, _do_run)
+            self._execute_parallel(effective_jobs, run_tasks, self._run_unit, ["run"])
+
+        self.record_durations(["run"])
 
         # After running all units, raise if any run failed
-        run_failures = [
-            unit.diag_source.get_original_path()
-            for name, unit in self._diag_units.items()
-            if unit.compile_passed() and not unit.run_passed()
-        ]
-        if run_failures:
-            failure_list = "\n  ".join(run_failures)
-            raise DiagFactoryError(f"One or more diagnostics failed to run:\n  {failure_list}")
+        self._raise_on_run_failures()
+
+    def can_pipeline_compile_and_run(self) -> bool:
+        """Return True if each diag can be run as soon as it is compiled.
+
+        Batch mode, OSWIS and single meson project builds run all the diags
+        together once they are all compiled.
+        """
+        return (
+            self.environment.run_target == "spike"
+            and not self.batch_mode
+            and not self.single_meson_project
+        )
+
+    def compile_and_run_all(self) -> Dict[str, DiagBuildUnit]:
+        """Compile and run all the diags, running each diag as soon as it compiles.
+
+        Compiles use up to `jobs` slots and runs up to `run_jobs` slots, so
+        the runs of the diags that compiled first overlap with the compiles
+        of the rest instead of waiting for the slowest compile. The summary
+        and run manifest are the same as with compile_all() followed by
+        run_all(). Falls back to that when the runs can't be pipelined.
+
+        As compile_all() raises before run_all() runs anything, no run is
+        started once a diag fails to compile: the runs that haven't started
+        are cancelled and their diags are left PENDING in the summary. Only
+        the runs that started before the failing compile ended complete.
+        """
+        if not self.can_pipeline_compile_and_run():
+            self.compile_all()
+            self.run_all()
+            return
+
+        tasks = self._prepare_all_units()
+
+        # A diag's run can only start once it has compiled so order the
+        # compiles by the expected duration of both.
+        tasks = self._order_longest_first(tasks, ["compile", "run"])
+
+        with self._running_jobserver():
+            self.build_jumpstart_runtimes_all()
+
+            with ThreadPoolExecutor(
+                max_workers=self.jobs, thread_name_prefix="compile"
+            ) as compile_executor, ThreadPoolExecutor(
+                max_workers=self.run_jobs, thread_name_prefix="run"
+            ) as run_executor:
+                compile_futures = {
+                    compile_executor.submit(self._compile_unit, diag_name, *task_args): task_args[0]
+                    for diag_name, task_args in tasks.items()
+                }
+                run_futures = []
+                compile_failed = False
+                for compile_future in as_completed(compile_futures):
+                    unit = compile_futures[compile_future]
+                    try:
+                        compile_future.result()
+                    except Exception:
+                        # Any exception is already recorded on the unit
+                        pass
+                    if not unit.compile_passed():
+                        if not compile_failed:
+                            compile_failed = True
+                            num_cancelled_runs = sum(
+                                run_future.cancel() for run_future in run_futures
+                            )
+                            log.warning(
+                                f"Not running any more diags since '{unit.diag_source.get_original_path()}' failed to compile ({num_cancelled_runs} queued run(s) cancelled)"
+                            )
+                    elif not compile_failed:
+                        run_futures.append(run_executor.submit(self._run_unit, unit.name, unit))
+
+                for run_future in as_completed(run_futures):
+                    if run_future.cancelled():
+                        continue
+                    try:
+                        run_future.result()
+                    except Exception:
+                        # Any exception is already recorded on the unit
+                        pass
+
+        self._finish_compile_all()
+        self.record_durations(["compile", "run"])
+
+        self._raise_on_compile_failures()
+        self._raise_on_run_failures()
 
     def summarize(self) -> str:
         # Build pretty table; compute widths from plain text, add ANSI coloring for PASS/FAILED/EXPECTED_FAIL labels
@@ -772,6 +1295,18 @@ class DiagFactory:
         table_lines.extend(
             ["", f"Diagnostics built: {built_count}", f"Diagnostics run: {run_count}"]
         )
+        if self.generated_sources_cache is not None:
+            cache_stats = self.generated_sources_cache.get_stats()
+            table_lines.append(
+                f"Generated sources cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)"
+            )
+        if self.jobserver is not None:
+            jobserver_stats = self.jobserver.get_stats()
+            table_lines.append(
+                f"Jobserver tokens: {jobserver_stats['tokens']}, peak in use: {jobserver_stats['peak_tokens_in_use']}, average in use: {jobserver_stats['average_tokens_in_use']:.1f}"
+            )
+        if self._source_generation_profiles:
+            table_lines.extend(["", *self.format_source_generation_profile()])
 
         # Note: Per-diag artifact section removed; artifacts are shown inline in the table
 
@@ -0,0 +1,126 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import logging as log
+import os
+import sqlite3
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def get_default_duration_history_file() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "jumpstart", "diag_durations.sqlite")
+
+
+class DurationHistory:
+    """Compile and run durations of diags recorded by earlier builds.
+
+    Durations are stored in a SQLite database, keyed by diag name,
+    configuration hash and phase ("compile" or "run"), and hold the duration
+    of the most recent build. They are used to start the longest diags first.
+    """
+
+    phases = ["compile", "run"]
+
+    def __init__(self, history_file: str) -> None:
+        self.history_file = os.path.abspath(history_file)
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+
+        # (diag name, config hash) -> duration in seconds, per phase
+        self.durations: Dict[str, Dict[Tuple[str, str], float]] = {
+            phase: {} for phase in self.phases
+        }
+        # Median durations used to estimate the diags that haven't been built
+        # with a configuration, per phase. Computed on first use and dropped
+        # when new durations are recorded.
+        self._medians: Dict[str, Tuple[Dict[str, float], Dict[str, float], Optional[float]]] = {}
+
+        with self._connect() as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "diag_name TEXT NOT NULL, "
+                "config_hash TEXT NOT NULL, "
+                "phase TEXT NOT NULL, "
+                "duration_s REAL NOT NULL, "
+                "recorded_at REAL NOT NULL, "
+                "PRIMARY KEY (diag_name, config_hash, phase))"
+            )
+            for diag_name, config_hash, phase, duration_s in connection.execute(
+                "SELECT diag_name, config_hash, phase, duration_s FROM durations"
+            ):
+                if phase in self.durations:
+                    self.durations[phase][(diag_name, config_hash)] = duration_s
+
+    def _connect(self):
+        # Concurrent builds sharing the history wait for each other's writes.
+        # The connection is closed on exit and each "with connection" block
+        # is a transaction.
+        return contextlib.closing(sqlite3.connect(self.history_file, timeout=30))
+
+    def record(self, records: List[Tuple[str, str, str, float]]) -> None:
+        """Store (diag name, config hash, phase, duration in seconds) records."""
+        if len(records) == 0:
+            return
+
+        recorded_at = time.time()
+        try:
+            with self._connect() as connection, connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO durations "
+                    "(diag_name, config_hash, phase, duration_s, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [record + (recorded_at,) for record in records],
+                )
+        except sqlite3.Error as exc:
+            # Losing the history only affects the order of later builds.
+            log.warning(f"Failed to record diag durations in {self.history_file}: {exc}")
+            return
+
+        for diag_name, config_hash, phase, duration_s in records:
+            self.durations[phase][(diag_name, config_hash)] = duration_s
+        self._medians = {}
+
+    def _get_medians(
+        self, phase: str
+    ) -> Tuple[Dict[str, float], Dict[str, float], Optional[float]]:
+        """Return the median durations of a phase per diag, per config hash and of all diags."""
+        if phase not in self._medians:
+            durations_per_diag: Dict[str, List[float]] = {}
+            durations_per_config: Dict[str, List[float]] = {}
+            for (diag_name, config_hash), duration_s in self.durations[phase].items():
+                durations_per_diag.setdefault(diag_name, []).append(duration_s)
+                durations_per_config.setdefault(config_hash, []).append(duration_s)
+            self._medians[phase] = (
+                {key: statistics.median(values) for key, values in durations_per_diag.items()},
+                {key: statistics.median(values) for key, values in durations_per_config.items()},
+                (
+                    statistics.median(self.durations[phase].values())
+                    if self.durations[phase]
+                    else None
+                ),
+            )
+        return self._medians[phase]
+
+    def get_expected_duration(
+        self, diag_name: str, config_hash: str, phase: str
+    ) -> Optional[float]:
+        """Return the expected duration of a phase of a diag or None if nothing is known.
+
+        A diag that hasn't been built with this configuration is estimated
+        from its durations with other configurations, then from the other
+        diags built with this configuration and finally from all the diags.
+        """
+        durations = self.durations[phase]
+        if (diag_name, config_hash) in durations:
+            return durations[(diag_name, config_hash)]
+
+        median_per_diag, median_per_config, median = self._get_medians(phase)
+        if diag_name in median_per_diag:
+            return median_per_diag[diag_name]
+        if config_hash in median_per_config:
+            return median_per_config[config_hash]
+        return median
@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import array
+import contextlib
+import fcntl
+import logging as log
+import os
+import shutil
+import tempfile
+import termios
+import threading
+from typing import Dict, Optional
+
+
+class Jobserver:
+    """GNU make style jobserver that limits the jobs of all the builds it is passed to.
+
+    The tokens are bytes in a named pipe that is passed to the builds in
+    MAKEFLAGS with --jobserver-auth=fifo:<path>. ninja 1.13 and later takes a
+    token from the pipe for each job it runs after its first and puts it back
+    when the job ends. Older ninja versions ignore the jobserver.
+
+    As in make, each build started under the jobserver holds a token for its
+    first job: start the build in a job() block, which holds a token until
+    the build ends. Unlike make, the jobserver's owner doesn't run jobs
+    itself so it has no implicit token: all num_tokens tokens are in the
+    pipe and the builds run at most num_tokens jobs between them.
+
+    Use it as a context manager: the pipe exists between __enter__ and
+    __exit__, and the token usage sampled in between is kept for the summary.
+    """
+
+    token = b"+"
+
+    # Seconds between samples of the number of tokens in use.
+    sample_interval_s = 0.1
+
+    def __init__(self, num_tokens: int) -> None:
+        if num_tokens < 1:
+            raise ValueError(f"A jobserver needs at least 1 token, got {num_tokens}")
+        self.num_tokens = num_tokens
+
+        self.fifo_dir: Optional[str] = None
+        self.fifo: Optional[str] = None
+        self._fd: Optional[int] = None
+
+        self._stop_sampling = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.peak_tokens_in_use = 0
+        self._tokens_in_use_total = 0
+        self._num_samples = 0
+
+    def __enter__(self) -> "Jobserver":
+        self.fifo_dir = tempfile.mkdtemp(prefix="jumpstart_jobserver.")
+        self.fifo = os.path.join(self.fifo_dir, "fifo")
+        os.mkfifo(self.fifo, 0o600)
+        # Opening the pipe for both reading and writing doesn't block waiting
+        # for the other end and keeps the pipe open while no build has it open.
+        self._fd = os.open(self.fifo, os.O_RDWR)
+        os.write(self._fd, self.token * self.num_tokens)
+
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_tokens_in_use, name="jobserver", daemon=True
+        )
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop_sampling.set()
+        self._sampler.join()
+
+        # Builds that were killed can't return their tokens.
+        missing_tokens = self.get_tokens_in_use()
+        if missing_tokens > 0:
+            log.warning(f"{missing_tokens} jobserver token(s) were not returned")
+
+        os.close(self._fd)
+        self._fd = None
+        shutil.rmtree(self.fifo_dir, ignore_errors=True)
+        self.fifo_dir = None
+        self.fifo = None
+
+    def get_environment(self) -> Dict[str, str]:
+        """Return the environment variables that pass the jobserver to a build."""
+        return {"MAKEFLAGS": f"-j{self.num_tokens} --jobserver-auth=fifo:{self.fifo}"}
+
+    def acquire(self) -> bytes:
+        """Wait for a token and return it."""
+        # Every token is in the pipe, including the ones returned by this
+        # process, so a thread waiting here is woken up by any release.
+        return os.read(self._fd, 1)
+
+    def release(self, token: bytes) -> None:
+        """Return a token taken with acquire()."""
+        os.write(self._fd, token)
+
+    @contextlib.contextmanager
+    def job(self):
+        """Hold a token for the duration of the block."""
+        token = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def get_tokens_in_use(self) -> int:
+        # FIONREAD returns the number of tokens left in the pipe.
+        tokens_in_pipe = array.array("i", [0])
+        fcntl.ioctl(self._fd, termios.FIONREAD, tokens_in_pipe)
+        return self.num_tokens - tokens_in_pipe[0]
+
+    def _sample_tokens_in_use(self) -> None:
+        while not self._stop_sampling.wait(self.sample_interval_s):
+            tokens_in_use = self.get_tokens_in_use()
+            self.peak_tokens_in_use = max(self.peak_tokens_in_use, tokens_in_use)
+            self._tokens_in_use_total += tokens_in_use
+            self._num_samples += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "tokens": self.num_tokens,
+            "peak_tokens_in_use": self.peak_tokens_in_use,
+            "average_tokens_in_use": (
+                self._tokens_in_use_total / self._num_samples if self._num_samples > 0 else 0
+            ),
+        }
@@ -8,7 +8,7 @@ import os
 import pprint
 import subprocess
 import sys
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from data_structures import DictUtils  # noqa
@@ -33,6 +33,40 @@ def quote_if_needed(x):
     return f"'{x_str}'"
 
 
+def get_meson_test_name(diag_name: str) -> str:
+    """Return the name of the meson test that runs a diag."""
+    return f"🧪 {diag_name}"
+
+
+def write_diag_manifest(manifest_file: str, diag_entries: List[Dict[str, Any]]) -> None:
+    """Write the diag manifest read by meson.build when the diag_manifest option is set.
+
+    Each diag entry maps the diag fields read by meson.build (name, sources,
+    attributes_yaml, ...) to a string, a bool, an int or a list of strings.
+    Every field value is written on its own "<field>\t<value>" line.
+    """
+    lines = []
+    for diag_entry in diag_entries:
+        lines.append(f"name\t{diag_entry['name']}")
+        for field, value in diag_entry.items():
+            if field == "name":
+                continue
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                if isinstance(value, bool):
+                    value = str(value).lower()
+                value = str(value)
+                if "\t" in value or "\n" in value:
+                    raise ValueError(
+                        f"Diag manifest value for '{field}' of diag '{diag_entry['name']}' contains a tab or a newline: {value!r}"
+                    )
+                lines.append(f"{field}\t{value}")
+        lines.append("end")
+
+    with open(manifest_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
 class Meson:
     supported_toolchains: List[str] = ["gcc"]
 
@@ -155,11 +189,13 @@ class Meson:
             log.error(error_msg)
             raise MesonBuildError(error_msg, return_code)
 
-    def compile(self):
+    def compile(self, extra_env: Optional[Dict[str, str]] = None):
         meson_compile_command = ["meson", "compile", "-v", "-C", self.meson_builddir]
         log.debug(f"meson compile: {self.diag_name}")
         log.debug(" ".join(meson_compile_command))
-        return_code = system_functions.run_command(meson_compile_command, self.jumpstart_dir)
+        return_code = system_functions.run_command(
+            meson_compile_command, self.jumpstart_dir, extra_env=extra_env
+        )
 
         diag_elf = os.path.join(self.meson_builddir, self.diag_name + ".elf")
         diag_disasm = os.path.join(self.meson_builddir, self.diag_name + ".dis")
@@ -181,6 +217,95 @@ class Meson:
             compiled_assets["elf"] = diag_elf
         return compiled_assets
 
+    def compile_jumpstart_runtime_library(self, extra_env: Optional[Dict[str, str]] = None) -> str:
+        """Build the JumpStart runtime library of a jumpstart_runtime_only build and return its path."""
+        meson_compile_command = ["meson", "compile", "-v", "-C", self.meson_builddir]
+        log.debug(f"meson compile: {self.diag_name}")
+        log.debug(" ".join(meson_compile_command))
+        return_code = system_functions.run_command(
+            meson_compile_command, self.jumpstart_dir, extra_env=extra_env
+        )
+
+        if return_code != 0:
+            error_msg = f"JumpStart runtime library compile failed. Check: {self.meson_builddir}"
+            log.error(error_msg)
+            raise MesonBuildError(error_msg, return_code)
+
+        runtime_library = os.path.join(self.meson_builddir, "libjumpstart_runtime.a")
+        if not os.path.exists(runtime_library):
+            error_msg = f"JumpStart runtime library not created by meson compile. Check: {self.meson_builddir}"
+            raise MesonBuildError(error_msg)
+
+        return runtime_library
+
+    def compile_diag_manifest(
+        self, num_processes: Optional[int], extra_env: Optional[Dict[str, str]] = None
+    ) -> int:
+        """Build all the diags of a diag_manifest build and return the meson compile return code.
+
+        ninja keeps going after a failure so that one broken diag doesn't stop
+        the others from being built. ninja picks the number of parallel jobs if
+        num_processes is None, which lets a jobserver passed in extra_env
+        limit them.
+        """
+        meson_compile_command = ["meson", "compile", "-v", "-C", self.meson_builddir]
+        if num_processes is not None:
+            meson_compile_command.extend(["-j", str(num_processes)])
+        meson_compile_command.append("--ninja-args=-k0")
+        log.debug(f"meson compile: {self.diag_name}")
+        log.debug(" ".join(meson_compile_command))
+        return system_functions.run_command(
+            meson_compile_command, self.jumpstart_dir, extra_env=extra_env
+        )
+
+    def get_ninja_step_durations(self) -> Dict[str, float]:
+        """Return the duration in seconds of each output built by ninja in the build directory."""
+        step_durations: Dict[str, float] = {}
+        ninja_log = os.path.join(self.meson_builddir, ".ninja_log")
+        if not os.path.exists(ninja_log):
+            return step_durations
+
+        with open(ninja_log) as f:
+            for line in f:
+                # Entries are "<start ms>\t<end ms>\t<mtime>\t<output>\t<command hash>".
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 4:
+                    continue
+                step_durations[fields[3]] = (int(fields[1]) - int(fields[0])) / 1000
+        return step_durations
+
+    def test_diag_manifest(self, num_processes: int) -> Dict[str, dict]:
+        """Run the tests of a diag_manifest build and return the result of each test by test name.
+
+        The results are read from the meson test log and have the result,
+        returncode and duration of each test.
+        """
+        meson_test_command = [
+            "meson",
+            "test",
+            "-C",
+            self.meson_builddir,
+            "--num-processes",
+            str(num_processes),
+        ]
+        log.debug(f"meson test: {self.diag_name}")
+        log.debug(" ".join(meson_test_command))
+        system_functions.run_command(meson_test_command, self.jumpstart_dir)
+
+        test_results: Dict[str, dict] = {}
+        test_log = os.path.join(self.meson_builddir, "meson-logs", "testlog.json")
+        if not os.path.exists(test_log):
+            return test_results
+        with open(test_log) as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+                test_result = json.loads(line)
+                test_results[test_result["name"]] = test_result
+        return test_results
+
     def test(self):
         meson_test_command = ["meson", "test", "-v", "-C", self.meson_builddir]
         log.debug(f"meson test: {self.diag_name}")
@@ -7,10 +7,18 @@
 # Generates the diag source files based on the diag attributes file.
 
 import argparse
+import copy
+import csv
+import functools
+import glob
+import io
+import json
 import logging as log
 import math
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 
 import public.functions as public_functions
@@ -18,15 +26,22 @@ import yaml
 from data_structures import BitField, CStruct, DictUtils, ListUtils
 from memory_management import (
     AddressType,
+    FreeRangeAllocator,
     LinkerScript,
+    MemoryMapIndex,
     MemoryMapping,
     PageSize,
     PageTableAttributes,
     PageTables,
+    PteCodec,
+    TranslationContext,
     TranslationMode,
     TranslationStage,
 )
-from utils.napot_utils import align_to_napot_size, get_next_napot_size
+from utils.file_utils import write_file_atomically
+from utils.generated_sources_cache import GeneratedSourcesCache, hash_files
+from utils.napot_utils import get_next_napot_size
+from utils.phase_profiler import PhaseProfiler
 
 try:
     import rivos_internal.functions as rivos_internal_functions
@@ -59,6 +74,21 @@ def get_memop_of_size(memory_op_type, size_in_bytes):
         raise Exception(f"Invalid size: {size_in_bytes} bytes")
 
 
+@functools.lru_cache(maxsize=None)
+def load_jumpstart_source_attributes(jumpstart_source_attributes_yaml):
+    # Parses the JumpStart source attributes and the C structs described in
+    # them. The result is cached so generating the sources of several diags
+    # in one process only parses them once. Callers must not modify it.
+    with open(jumpstart_source_attributes_yaml) as f:
+        jumpstart_source_attributes = yaml.safe_load(f)
+
+    c_structs = []
+    for struct_name, struct_data in jumpstart_source_attributes["c_structs"].items():
+        c_structs.append(CStruct(struct_name, struct_data["fields"]))
+
+    return jumpstart_source_attributes, c_structs
+
+
 class SourceGenerator:
     def __init__(
         self,
@@ -66,25 +96,47 @@ class SourceGenerator:
         diag_attributes_yaml,
         override_diag_attributes,
         priv_modes_enabled,
+        profiler=None,
     ):
         self.linker_script = None
 
+        self.profiler = profiler if profiler is not None else PhaseProfiler(enabled=False)
+
         self.priv_modes_enabled = None
 
-        self.process_source_attributes(jumpstart_source_attributes_yaml)
+        # Page tables pulled into the assembly file with .incbin when
+        # generate_binary_pagetables is set.
+        self.binary_pagetables = bytearray()
+
+        self.jumpstart_source_attributes_yaml = jumpstart_source_attributes_yaml
+        self.diag_attributes_yaml = None
+
+        with self.profiler.phase("process_source_attributes"):
+            self.process_source_attributes(jumpstart_source_attributes_yaml)
 
         self.priv_modes_enabled = ListUtils.intersection(
             self.jumpstart_source_attributes["priv_modes_supported"],
             priv_modes_enabled,
         )
 
-        self.process_diag_attributes(diag_attributes_yaml, override_diag_attributes)
+        if diag_attributes_yaml is None:
+            # Only the JumpStart runtime defines and data structures, which
+            # don't depend on the diag attributes, can be generated.
+            return
+
+        with self.profiler.phase("process_diag_attributes"):
+            self.process_diag_attributes(diag_attributes_yaml, override_diag_attributes)
 
-        self.process_memory_map()
+        with self.profiler.phase("process_memory_map"):
+            self.process_memory_map()
 
     def process_source_attributes(self, jumpstart_source_attributes_yaml):
-        with open(jumpstart_source_attributes_yaml) as f:
-            self.jumpstart_source_attributes = yaml.safe_load(f)
+        jumpstart_source_attributes, self.c_structs = load_jumpstart_source_attributes(
+            jumpstart_source_attributes_yaml
+        )
+        # The diag attributes are overridden in place so every SourceGenerator
+        # needs its own copy of the shared attributes.
+        self.jumpstart_source_attributes = copy.deepcopy(jumpstart_source_attributes)
 
         rivos_internal_lib_dir = f"{os.path.dirname(os.path.realpath(__file__))}/rivos_internal"
 
@@ -104,9 +156,6 @@ class SourceGenerator:
                 f"rivos_internal/ exists but rivos_internal_build is set to False in {jumpstart_source_attributes_yaml}"
             )
 
-        # Parse C structs once and store them for later use
-        self.c_structs = self._parse_c_structs()
-
     def process_diag_attributes(self, diag_attributes_yaml, override_diag_attributes):
         self.diag_attributes_yaml = diag_attributes_yaml
         with open(diag_attributes_yaml) as f:
@@ -133,10 +182,6 @@ class SourceGenerator:
                 cmd_line_diag_attribute_override_dict,
             )
 
-        TranslationStage.set_virtualization_enabled(
-            self.jumpstart_source_attributes["diag_attributes"]["enable_virtualization"]
-        )
-
         self.jumpstart_source_attributes["diag_attributes"]["active_cpu_mask"] = int(
             self.jumpstart_source_attributes["diag_attributes"]["active_cpu_mask"], 2
         )
@@ -152,48 +197,133 @@ class SourceGenerator:
 
         self.sanity_check_diag_attributes()
 
-        for stage in TranslationStage.get_enabled_stages():
-            TranslationStage.set_selected_mode_for_stage(
-                stage,
-                self.jumpstart_source_attributes["diag_attributes"][
+        # The translation state is kept per SourceGenerator so that diags
+        # with different translation settings can be generated in the same
+        # process.
+        virtualization_enabled = self.jumpstart_source_attributes["diag_attributes"][
+            "enable_virtualization"
+        ]
+        self.translation_context = TranslationContext(
+            virtualization_enabled,
+            {
+                stage: self.jumpstart_source_attributes["diag_attributes"][
                     f"{TranslationStage.get_atp_register(stage)}_mode"
-                ],
+                ]
+                for stage in TranslationStage.get_stages(virtualization_enabled)
+            },
+        )
+
+    def get_address_allocators(self, stage, pma_memory_type):
+        # Returns the (source, destination) FreeRangeAllocators for the
+        # mappings without addresses in this stage. They start out with the
+        # ranges used by the memory map built so far and by the diag mappings
+        # that have addresses, whether or not they have been added yet.
+        if (stage, pma_memory_type) in self.address_allocators:
+            return self.address_allocators[(stage, pma_memory_type)]
+
+        source_address_type = TranslationStage.get_translates_from(stage)
+        dest_address_type = TranslationStage.get_translates_to(stage)
+
+        mappings = []
+        for target_mmu in MemoryMapping.get_supported_targets():
+            mappings.extend(self.memory_map[target_mmu][stage])
+        for mapping_dict in self.jumpstart_source_attributes["diag_attributes"]["mappings"]:
+            if self.has_no_addresses(mapping_dict):
+                continue
+            mapping = MemoryMapping(
+                mapping_dict, self.translation_context, self.max_num_cpus_supported
+            )
+            if mapping.get_field("translation_stage") == stage:
+                mappings.append(mapping)
+
+        used_source_ranges = []
+        used_dest_ranges = []
+        for mapping in mappings:
+            mapping_size = mapping.get_field("page_size") * mapping.get_field("num_pages")
+            if mapping.get_field(source_address_type) is not None:
+                used_source_ranges.append(
+                    (
+                        mapping.get_field(source_address_type),
+                        mapping.get_field(source_address_type) + mapping_size,
+                    )
+                )
+
+            if self.jumpstart_source_attributes["rivos_internal_build"] is True:
+                mapping_size = rivos_internal_functions.get_previous_mapping_size(
+                    mapping, pma_memory_type
+                )
+            used_dest_ranges.append(
+                (
+                    mapping.get_field(dest_address_type),
+                    mapping.get_field(dest_address_type) + mapping_size,
+                )
             )
 
+        self.address_allocators[(stage, pma_memory_type)] = (
+            FreeRangeAllocator(used_source_ranges),
+            FreeRangeAllocator(
+                used_dest_ranges,
+                self.jumpstart_source_attributes["diag_attributes"]["elf_start_address"],
+            ),
+        )
+        return self.address_allocators[(stage, pma_memory_type)]
+
     def assign_addresses_to_mapping_for_stage(self, mapping_dict, stage):
         if "page_size" not in mapping_dict:
             raise Exception(f"page_size is not specified for mapping: {mapping_dict}")
         if "pma_memory_type" not in mapping_dict:
             raise Exception(f"pma_memory_type is not specified for mapping: {mapping_dict}")
 
-        # We want to find the next available physical address for the mapping.
-        # All the MMUs share the same physical address space so we need to find
-        # the next available address that is not already used by another mapping.
-        next_available_address = 0
-        for target_mmu in MemoryMapping.get_supported_targets():
-            if len(self.memory_map[target_mmu][stage]) == 0:
-                continue
-            temp_address = self.get_next_available_dest_addr_after_last_mapping(
-                target_mmu, stage, mapping_dict["page_size"], mapping_dict["pma_memory_type"]
-            )
-            if temp_address > next_available_address:
-                next_available_address = temp_address
+        # Place the mapping in the smallest gap in the physical address space
+        # that fits it. All the MMUs share the same physical address space so
+        # the gaps are between the mappings of all the MMUs.
+        if mapping_dict.get("num_pages_per_cpu") is not None:
+            num_pages = mapping_dict["num_pages_per_cpu"] * self.max_num_cpus_supported
+        else:
+            num_pages = mapping_dict["num_pages"]
+        mapping_size = num_pages * mapping_dict["page_size"]
+        alignment = mapping_dict["page_size"]
+        min_address = max_address = None
 
         if (
             self.jumpstart_source_attributes["diag_attributes"]["start_test_in_mmode"] is True
             and mapping_dict.get("linker_script_section") is not None
             and ".text" in mapping_dict["linker_script_section"].split(",")
         ):
-            # Calculate the total size of the region
-            region_size = mapping_dict["page_size"] * mapping_dict["num_pages"]
+            # Align the address to the NAPOT size that will cover this region.
+            alignment = get_next_napot_size(mapping_size)
+
+        if mapping_dict.get("linker_script_section") is not None:
+            # Sections have to stay within the ELF address range.
+            min_address = self.jumpstart_source_attributes["diag_attributes"]["elf_start_address"]
+            max_address = self.jumpstart_source_attributes["diag_attributes"]["elf_end_address"]
 
-            # Calculate the NAPOT size that will cover this region
-            napot_size = get_next_napot_size(region_size)
+        source_address_allocator, dest_address_allocator = self.get_address_allocators(
+            stage, mapping_dict["pma_memory_type"]
+        )
+        needs_source_address = (
+            self.jumpstart_source_attributes["diag_attributes"]["satp_mode"] != "bare"
+        )
+
+        # The mapping gets the same source and destination address so the
+        # range has to be free in both address spaces.
+        next_available_address = dest_address_allocator.find_best_fit(
+            mapping_size,
+            alignment,
+            min_address,
+            max_address,
+            source_address_allocator if needs_source_address else None,
+        )
+        if next_available_address is None:
+            raise ValueError(
+                f"Unable to find a free address range of size {hex(mapping_size)} for mapping: {mapping_dict}"
+            )
 
-            # Align the address to the NAPOT size
-            next_available_address = align_to_napot_size(next_available_address, napot_size)
+        for allocators in self.address_allocators.values():
+            for allocator in allocators:
+                allocator.mark_used(next_available_address, next_available_address + mapping_size)
 
-        if self.jumpstart_source_attributes["diag_attributes"]["satp_mode"] != "bare":
+        if needs_source_address:
             mapping_dict[TranslationStage.get_translates_from(stage)] = next_available_address
         mapping_dict[TranslationStage.get_translates_to(stage)] = next_available_address
 
@@ -242,6 +372,10 @@ class SourceGenerator:
         )
 
     def add_diag_sections_to_mappings(self):
+        # FreeRangeAllocators for the mappings without addresses, keyed by
+        # (stage, pma_memory_type).
+        self.address_allocators = {}
+
         for mapping_dict in self.sort_diag_mappings():
             if self.has_no_addresses(mapping_dict):
                 if (
@@ -251,27 +385,115 @@ class SourceGenerator:
                     raise ValueError(
                         f"The logic to assign addresses to mappings with no addresses specified in diags that enable virtualization is not implemented yet. Failed on mapping: {mapping_dict}"
                     )
+                # Work on a copy as the memory map may be created more than
+                # once when sizing the pagetables.
                 mapping_dict = self.assign_addresses_to_mapping_for_stage(
-                    mapping_dict, TranslationStage.get_enabled_stages()[0]
+                    mapping_dict.copy(), self.translation_context.get_enabled_stages()[0]
                 )
 
-            for target_mmu in MemoryMapping(mapping_dict, self.max_num_cpus_supported).get_field(
-                "target_mmu"
-            ):
-                # We need a per stage memory mapping object.
-                mapping = MemoryMapping(mapping_dict, self.max_num_cpus_supported)
+            diag_mapping = MemoryMapping(
+                mapping_dict, self.translation_context, self.max_num_cpus_supported
+            )
+            for target_mmu in diag_mapping.get_field("target_mmu"):
+                # We need a per MMU memory mapping object.
+                mapping = diag_mapping.replace(target_mmu=[target_mmu])
 
                 stage = mapping.get_field("translation_stage")
-                mapping.set_field("target_mmu", [target_mmu])
 
                 self.memory_map[target_mmu][stage].append(mapping)
 
     def process_memory_map(self):
+        max_num_pagetable_pages_per_stage = self.jumpstart_source_attributes["diag_attributes"][
+            "max_num_pagetable_pages_per_stage"
+        ]
+        if max_num_pagetable_pages_per_stage == "auto":
+            with self.profiler.phase("size_pagetables"):
+                self.size_pagetables()
+        else:
+            if (
+                isinstance(max_num_pagetable_pages_per_stage, bool)
+                or not isinstance(max_num_pagetable_pages_per_stage, int)
+                or max_num_pagetable_pages_per_stage <= 0
+            ):
+                raise ValueError(
+                    f"Invalid max_num_pagetable_pages_per_stage: {max_num_pagetable_pages_per_stage}. Expected a positive integer or auto."
+                )
+            self.num_pagetable_pages_per_stage = {
+                stage: max_num_pagetable_pages_per_stage
+                for stage in self.translation_context.get_enabled_stages()
+            }
+            self.create_memory_map()
+
+        self.memory_map_index = {
+            target_mmu: MemoryMapIndex(self.memory_map[target_mmu])
+            for target_mmu in self.memory_map.keys()
+        }
+
+        self.sanity_check_memory_map()
+
+        with self.profiler.phase("create_page_tables"):
+            self.create_page_tables_data()
+
+    def size_pagetables(self):
+        # The pagetables are placed before the diag mappings without
+        # addresses and are mapped by their own PTEs so the number of
+        # pagetable pages changes the memory map that they have to cover.
+        # Grow the pagetable regions until they hold the pagetables of the
+        # memory map they are part of.
+        self.num_pagetable_pages_per_stage = {}
+        for stage in self.translation_context.get_enabled_stages():
+            translation_mode = self.translation_context.get_selected_mode_for_stage(stage)
+            if translation_mode == "bare":
+                continue
+            self.num_pagetable_pages_per_stage[stage] = (
+                PageTableAttributes.mode_attributes[translation_mode]["pagetable_sizes"][0]
+                // PageSize.SIZE_4K
+            )
+
+        while True:
+            self.create_memory_map()
+
+            num_pagetable_pages_required = self.get_num_pagetable_pages_required_per_stage()
+            if all(
+                num_pagetable_pages_required[stage] <= self.num_pagetable_pages_per_stage[stage]
+                for stage in num_pagetable_pages_required
+            ):
+                break
+
+            for stage, num_pages in num_pagetable_pages_required.items():
+                self.num_pagetable_pages_per_stage[stage] = max(
+                    self.num_pagetable_pages_per_stage[stage], num_pages
+                )
+
+        log.debug(f"Number of pagetable pages per stage: {self.num_pagetable_pages_per_stage}")
+
+    def get_num_pagetable_pages_required_per_stage(self):
+        num_pagetable_pages_required = {}
+        for target_mmu in self.memory_map.keys():
+            for stage in self.memory_map[target_mmu].keys():
+                translation_mode = self.translation_context.get_selected_mode_for_stage(stage)
+                if translation_mode == "bare":
+                    continue
+
+                num_pages = PageTables.get_num_pagetable_pages_required(
+                    translation_mode,
+                    self.memory_map[target_mmu][stage],
+                    self.jumpstart_source_attributes["diag_attributes"][
+                        "enable_superpage_promotion"
+                    ],
+                )
+                num_pagetable_pages_required[stage] = max(
+                    num_pagetable_pages_required.get(stage, 0), num_pages
+                )
+
+        return num_pagetable_pages_required
+
+    def create_memory_map(self):
         self.memory_map = {}
 
         for supported_mmu in MemoryMapping.get_supported_targets():
             self.memory_map[supported_mmu] = {}
-            for stage in TranslationStage.get_enabled_stages():
+            for stage in self.translation_context.get_enabled_stages():
                 self.memory_map[supported_mmu][stage] = []
 
         self.add_jumpstart_sections_to_mappings()
@@ -292,10 +514,6 @@ class SourceGenerator:
                 self.memory_map["cpu"], self.jumpstart_source_attributes
             )
 
-        self.sanity_check_memory_map()
-
-        self.create_page_tables_data()
-
     def create_page_tables_data(self):
         self.page_tables = {}
         for target_mmu in MemoryMapping.get_supported_targets():
@@ -306,22 +524,25 @@ class SourceGenerator:
 
             self.page_tables[target_mmu] = {}
 
-            for stage in TranslationStage.get_enabled_stages():
-                translation_mode = TranslationStage.get_selected_mode_for_stage(stage)
+            for stage in self.translation_context.get_enabled_stages():
+                translation_mode = self.translation_context.get_selected_mode_for_stage(stage)
                 if translation_mode == "bare":
                     # No pagetable mappings for the bare mode.
                     continue
 
                 self.page_tables[target_mmu][stage] = PageTables(
                     translation_mode,
+                    self.num_pagetable_pages_per_stage[stage],
+                    self.memory_map[target_mmu][stage],
                     self.jumpstart_source_attributes["diag_attributes"][
-                        "max_num_pagetable_pages_per_stage"
+                        "enable_superpage_promotion"
                     ],
-                    self.memory_map[target_mmu][stage],
                 )
 
     def sanity_check_memory_map(self):
-        public_functions.sanity_check_memory_map(self.memory_map["cpu"])
+        public_functions.sanity_check_memory_map(
+            self.memory_map["cpu"], self.memory_map_index["cpu"]
+        )
 
         if self.jumpstart_source_attributes["rivos_internal_build"] is True:
             rivos_internal_functions.sanity_check_memory_map(
@@ -335,9 +556,6 @@ class SourceGenerator:
 
         common_attributes = {
             "page_size": PageSize.SIZE_4K,
-            "num_pages": self.jumpstart_source_attributes["diag_attributes"][
-                "max_num_pagetable_pages_per_stage"
-            ],
             "umode": "0b0",
             "pma_memory_type": "wb",
         }
@@ -357,13 +575,14 @@ class SourceGenerator:
 
             per_stage_pagetable_mappings = {}
 
-            for stage in TranslationStage.get_enabled_stages():
-                translation_mode = TranslationStage.get_selected_mode_for_stage(stage)
+            for stage in self.translation_context.get_enabled_stages():
+                translation_mode = self.translation_context.get_selected_mode_for_stage(stage)
                 if translation_mode == "bare":
                     # No pagetable mappings for the bare mode.
                     continue
 
                 section_mapping = common_attributes.copy()
+                section_mapping["num_pages"] = self.num_pagetable_pages_per_stage[stage]
                 source_address_type = TranslationStage.get_translates_from(stage)
                 dest_address_type = TranslationStage.get_translates_to(stage)
 
@@ -388,16 +607,16 @@ class SourceGenerator:
                 section_mapping["target_mmu"] = [target_mmu]
 
                 per_stage_pagetable_mappings[stage] = MemoryMapping(
-                    section_mapping, self.max_num_cpus_supported
+                    section_mapping, self.translation_context, self.max_num_cpus_supported
                 )
 
                 self.memory_map[target_mmu][stage].insert(
                     len(self.memory_map[target_mmu][stage]), per_stage_pagetable_mappings[stage]
                 )
 
-                start_address += common_attributes["num_pages"] * common_attributes["page_size"]
+                start_address += section_mapping["num_pages"] * section_mapping["page_size"]
 
-            if "g" in TranslationStage.get_enabled_stages():
+            if "g" in self.translation_context.get_enabled_stages():
                 vs_stage_memory_mapping = per_stage_pagetable_mappings["vs"].copy()
 
                 vs_stage_memory_mapping.set_field("translation_stage", "g")
@@ -422,24 +641,26 @@ class SourceGenerator:
 
             # Adds G-stage pagetable memory region into hs stage memory map to
             # allow HS-mode to access G-stage pagetables.
-            if target_mmu == "cpu" and "g" in TranslationStage.get_enabled_stages():
-                mapping = per_stage_pagetable_mappings["g"].copy()
-                mapping.set_field("translation_stage", "hs")
-                mapping.set_field("va", mapping.get_field("gpa"))
-                mapping.set_field("pa", mapping.get_field("spa"))
-                mapping.set_field("gpa", None)
-                mapping.set_field("spa", None)
+            if target_mmu == "cpu" and "g" in self.translation_context.get_enabled_stages():
+                g_stage_mapping = per_stage_pagetable_mappings["g"]
+                mapping = g_stage_mapping.replace(
+                    translation_stage="hs",
+                    va=g_stage_mapping.get_field("gpa"),
+                    pa=g_stage_mapping.get_field("spa"),
+                    gpa=None,
+                    spa=None,
+                )
                 self.memory_map[target_mmu]["hs"].insert(
                     len(self.memory_map[target_mmu]["hs"]), mapping
                 )
 
             # Adds VS-stage pagetable memory region into hs stage memory map to
             # allow HS-mode to access VS-stage pagetables.
-            if target_mmu == "cpu" and "vs" in TranslationStage.get_enabled_stages():
-                mapping = per_stage_pagetable_mappings["vs"].copy()
-                mapping.set_field("translation_stage", "hs")
-                mapping.set_field("pa", mapping.get_field("gpa"))
-                mapping.set_field("gpa", None)
+            if target_mmu == "cpu" and "vs" in self.translation_context.get_enabled_stages():
+                vs_stage_mapping = per_stage_pagetable_mappings["vs"]
+                mapping = vs_stage_mapping.replace(
+                    translation_stage="hs", pa=vs_stage_mapping.get_field("gpa"), gpa=None
+                )
                 self.memory_map[target_mmu]["hs"].insert(
                     len(self.memory_map[target_mmu]["hs"]), mapping
                 )
@@ -448,7 +669,7 @@ class SourceGenerator:
         target_mmu = "cpu"
         pagetables_start_address = 0
 
-        for stage in TranslationStage.get_enabled_stages():
+        for stage in self.translation_context.get_enabled_stages():
             if self.jumpstart_source_attributes["rivos_internal_build"] is True:
                 self.memory_map[target_mmu][stage].extend(
                     rivos_internal_functions.get_additional_mappings(
@@ -472,7 +693,9 @@ class SourceGenerator:
         self.add_pagetable_mappings(pagetables_start_address)
 
     def sanity_check_diag_attributes(self):
-        for stage in TranslationStage.get_enabled_stages():
+        for stage in TranslationStage.get_stages(
+            self.jumpstart_source_attributes["diag_attributes"]["enable_virtualization"]
+        ):
             atp_register = TranslationStage.get_atp_register(stage)
             assert f"{atp_register}_mode" in self.jumpstart_source_attributes["diag_attributes"]
             assert TranslationMode.is_valid_mode(
@@ -546,7 +769,7 @@ class SourceGenerator:
             section_mapping["target_mmu"] = [cpu_mmu]
             section_mapping["translation_stage"] = stage
 
-            if TranslationStage.get_selected_mode_for_stage(stage) == "bare":
+            if self.translation_context.get_selected_mode_for_stage(stage) == "bare":
                 section_mapping["no_pte_allocation"] = True
                 section_mapping.pop("xwr", None)
                 section_mapping.pop("umode", None)
@@ -617,10 +840,17 @@ class SourceGenerator:
 
             self.memory_map[cpu_mmu][stage].insert(
                 len(self.memory_map[cpu_mmu][stage]),
-                MemoryMapping(section_mapping, self.max_num_cpus_supported),
+                MemoryMapping(
+                    section_mapping, self.translation_context, self.max_num_cpus_supported
+                ),
             )
 
     def generate_linker_script(self, output_linker_script):
+        with self.profiler.phase("create_linker_script"):
+            self.create_linker_script()
+        write_file_atomically(output_linker_script, "".join(self.linker_script.generate()))
+
+    def create_linker_script(self):
         self.linker_script = LinkerScript(
             entry_label=self.jumpstart_source_attributes["diag_attributes"]["diag_entry_label"],
             elf_address_range=(
@@ -628,104 +858,146 @@ class SourceGenerator:
                 self.jumpstart_source_attributes["diag_attributes"]["elf_end_address"],
             ),
             mappings=self.memory_map["cpu"],
+            translation_context=self.translation_context,
             attributes_file=self.diag_attributes_yaml,
         )
-        self.linker_script.generate(output_linker_script)
 
     def generate_defines_file(self, output_defines_file):
-        with open(output_defines_file, "w") as file_descriptor:
-            file_descriptor.write(
-                f"// This file is auto-generated by {sys.argv[0]} from {self.diag_attributes_yaml}\n"
-            )
+        write_file_atomically(output_defines_file, "".join(self.generate_defines()))
 
-            file_descriptor.write("\n// Jumpstart Attributes defines\n\n")
-            for define_name in self.jumpstart_source_attributes["defines"]:
-                file_descriptor.write(f"#ifndef {define_name}\n")
-                define_value = self.jumpstart_source_attributes["defines"][define_name]
-                # Write all integers as hexadecimal for consistency and C/Assembly compatibility
-                if isinstance(define_value, int):
-                    file_descriptor.write(f"#define {define_name} 0x{define_value:x}\n")
-                else:
-                    file_descriptor.write(f"#define {define_name} {define_value}\n")
-                file_descriptor.write("#endif\n")
-            file_descriptor.write("\n")
+    def generate_defines(self):
+        yield (
+            f"// This file is auto-generated by {os.path.basename(sys.argv[0])} from {self.diag_attributes_yaml}\n"
+        )
+
+        yield from self.generate_jumpstart_attributes_defines()
+
+        yield f"#define MAX_NUM_CPUS_SUPPORTED {self.max_num_cpus_supported}\n\n"
+
+        yield from self.generate_priv_modes_defines()
+
+        yield from self.generate_syscall_numbers_defines()
+
+        yield "\n// Diag Attributes defines\n\n"
+        # Perform some transformations so that we can print them as defines.
+        diag_attributes = self.jumpstart_source_attributes["diag_attributes"].copy()
 
-            file_descriptor.write(
-                f"#define MAX_NUM_CPUS_SUPPORTED {self.max_num_cpus_supported}\n\n"
+        if diag_attributes["max_num_pagetable_pages_per_stage"] == "auto":
+            # Define the largest number of pagetable pages reserved for a
+            # stage so that diags can keep using it.
+            diag_attributes["max_num_pagetable_pages_per_stage"] = max(
+                self.num_pagetable_pages_per_stage.values(), default=0
             )
 
-            for mod in self.priv_modes_enabled:
-                file_descriptor.write(f"#define {mod.upper()}_MODE_ENABLED 1\n")
+        for stage in self.translation_context.get_enabled_stages():
+            atp_register = TranslationStage.get_atp_register(stage)
+            diag_attributes[f"{atp_register}_mode"] = TranslationMode.get_encoding(
+                self.translation_context.get_selected_mode_for_stage(stage)
+            )
 
-            file_descriptor.write("\n// Jumpstart Syscall Numbers defines\n\n")
-            current_syscall_number = 0
-            for syscall_name in self.jumpstart_source_attributes["syscall_numbers"]:
-                file_descriptor.write(f"#define {syscall_name} {current_syscall_number}\n")
-                current_syscall_number += 1
+        for attribute in diag_attributes:
+            if isinstance(diag_attributes[attribute], bool):
+                yield f"#ifndef {attribute.upper()}\n"
+                yield f"#define {attribute.upper()} {int(diag_attributes[attribute])}\n"
+                yield "#endif\n"
+            elif isinstance(diag_attributes[attribute], int):
+                yield f"#ifndef {attribute.upper()}\n"
+                yield f"#define {attribute.upper()} {hex(diag_attributes[attribute])}\n"
+                yield "#endif\n"
+
+        # Generate stack-related defines
+        yield from self.generate_stack_defines()
+
+        # Generate register context save/restore defines
+        yield from self.generate_reg_context_save_restore_defines()
+
+        # Generate C structs defines
+        yield from self.generate_cstructs_defines()
+
+        yield from self.generate_rivos_internal_defines()
+
+    def generate_runtime_defines_file(self, output_runtime_defines_file):
+        write_file_atomically(output_runtime_defines_file, "".join(self.generate_runtime_defines()))
+
+    def generate_runtime_defines(self):
+        # The subset of the defines that only depends on the JumpStart source
+        # attributes and the enabled privilege modes. The parts of the
+        # JumpStart runtime built once and shared by all the diags of a build
+        # are compiled with these instead of a diag's defines.
+        yield (
+            f"// This file is auto-generated by {os.path.basename(sys.argv[0])} from {self.jumpstart_source_attributes_yaml}\n"
+        )
 
-            file_descriptor.write("\n// Diag Attributes defines\n\n")
-            # Perform some transformations so that we can print them as defines.
-            diag_attributes = self.jumpstart_source_attributes["diag_attributes"].copy()
+        yield from self.generate_jumpstart_attributes_defines()
 
-            for stage in TranslationStage.get_enabled_stages():
-                atp_register = TranslationStage.get_atp_register(stage)
-                diag_attributes[f"{atp_register}_mode"] = TranslationMode.get_encoding(
-                    TranslationStage.get_selected_mode_for_stage(stage)
-                )
+        yield from self.generate_priv_modes_defines()
 
-            for attribute in diag_attributes:
-                if isinstance(diag_attributes[attribute], bool):
-                    file_descriptor.write(f"#ifndef {attribute.upper()}\n")
-                    file_descriptor.write(
-                        f"#define {attribute.upper()} {int(diag_attributes[attribute])}\n"
-                    )
-                    file_descriptor.write("#endif\n")
-                elif isinstance(diag_attributes[attribute], int):
-                    file_descriptor.write(f"#ifndef {attribute.upper()}\n")
-                    file_descriptor.write(
-                        f"#define {attribute.upper()} {hex(diag_attributes[attribute])}\n"
-                    )
-                    file_descriptor.write("#endif\n")
+        yield from self.generate_syscall_numbers_defines()
 
-            # Generate stack-related defines
-            self.generate_stack_defines(file_descriptor)
+        yield "\n"
 
-            # Generate register context save/restore defines
-            self.generate_reg_context_save_restore_defines(file_descriptor)
+        yield from self.generate_reg_context_save_restore_defines()
 
-            # Generate C structs defines
-            self.generate_cstructs_defines(file_descriptor)
+        yield from self.generate_cstructs_defines()
 
-            # Generate rivos internal defines if this is a rivos internal build
-            if self.jumpstart_source_attributes["rivos_internal_build"] is True:
-                rivos_internal_functions.add_rivos_internal_defines(
-                    file_descriptor, self.jumpstart_source_attributes
-                )
+        yield from self.generate_rivos_internal_defines()
 
-            file_descriptor.close()
+    def generate_jumpstart_attributes_defines(self):
+        yield "\n// Jumpstart Attributes defines\n\n"
+        for define_name in self.jumpstart_source_attributes["defines"]:
+            yield f"#ifndef {define_name}\n"
+            define_value = self.jumpstart_source_attributes["defines"][define_name]
+            # Write all integers as hexadecimal for consistency and C/Assembly compatibility
+            if isinstance(define_value, int):
+                yield f"#define {define_name} 0x{define_value:x}\n"
+            else:
+                yield f"#define {define_name} {define_value}\n"
+            yield "#endif\n"
+        yield "\n"
+
+    def generate_priv_modes_defines(self):
+        for mod in self.priv_modes_enabled:
+            yield f"#define {mod.upper()}_MODE_ENABLED 1\n"
+
+    def generate_syscall_numbers_defines(self):
+        yield "\n// Jumpstart Syscall Numbers defines\n\n"
+        current_syscall_number = 0
+        for syscall_name in self.jumpstart_source_attributes["syscall_numbers"]:
+            yield f"#define {syscall_name} {current_syscall_number}\n"
+            current_syscall_number += 1
+
+    def generate_rivos_internal_defines(self):
+        # Generate rivos internal defines if this is a rivos internal build
+        if self.jumpstart_source_attributes["rivos_internal_build"] is True:
+            rivos_internal_defines = io.StringIO()
+            rivos_internal_functions.add_rivos_internal_defines(
+                rivos_internal_defines, self.jumpstart_source_attributes
+            )
+            yield rivos_internal_defines.getvalue()
 
     def generate_data_structures_file(self, output_data_structures_file):
-        with open(output_data_structures_file, "w") as file_descriptor:
-            file_descriptor.write(
-                f"// This file is auto-generated by {sys.argv[0]} from {self.diag_attributes_yaml}\n"
-            )
-            file_descriptor.write("#pragma once\n\n")
+        write_file_atomically(output_data_structures_file, "".join(self.generate_data_structures()))
 
-            # Only include these headers in C code.
-            file_descriptor.write("#if !defined(__ASSEMBLER__) && !defined(__ASSEMBLY__)\n\n")
+    def generate_data_structures(self):
+        # The data structures don't depend on the diag attributes so they are
+        # also generated for the JumpStart runtime.
+        generated_from = self.diag_attributes_yaml
+        if generated_from is None:
+            generated_from = self.jumpstart_source_attributes_yaml
+        yield f"// This file is auto-generated by {os.path.basename(sys.argv[0])} from {generated_from}\n"
+        yield "#pragma once\n\n"
 
-            file_descriptor.write("\n\n")
-            file_descriptor.write("#include <inttypes.h>\n")
-            file_descriptor.write("#include <stddef.h>\n\n")
+        # Only include these headers in C code.
+        yield "#if !defined(__ASSEMBLER__) && !defined(__ASSEMBLY__)\n\n"
 
-            # Generate C struct definitions
-            self.generate_cstructs_data_structures(file_descriptor)
+        yield "\n\n"
+        yield "#include <inttypes.h>\n"
+        yield "#include <stddef.h>\n\n"
 
-            file_descriptor.write(
-                "#endif /* !defined(__ASSEMBLER__) && !defined(__ASSEMBLY__) */\n\n"
-            )
+        # Generate C struct definitions
+        yield from self.generate_cstructs_data_structures()
 
-            file_descriptor.close()
+        yield "#endif /* !defined(__ASSEMBLER__) && !defined(__ASSEMBLY__) */\n\n"
 
     def find_memory_mapping_by_linker_section(self, linker_script_section, target_mmu=None):
         """Find a MemoryMapping object by its linker_script_section name.
@@ -740,15 +1012,16 @@ class SourceGenerator:
         target_mmus_to_search = [target_mmu] if target_mmu is not None else self.memory_map.keys()
 
         for mmu in target_mmus_to_search:
-            if mmu not in self.memory_map:
+            if mmu not in self.memory_map_index:
                 continue
-            for stage in self.memory_map[mmu].keys():
-                for mapping in self.memory_map[mmu][stage]:
-                    if mapping.get_field("linker_script_section") == linker_script_section:
-                        return mapping
+            mapping = self.memory_map_index[mmu].find_mapping_by_linker_section(
+                linker_script_section
+            )
+            if mapping is not None:
+                return mapping
         return None
 
-    def generate_stack_defines(self, file_descriptor):
+    def generate_stack_defines(self):
         # This is a bit of a mess. Both mmode and smode share the same stack.
         # We've named this stack "privileged" so we need to map the stack
         # name to the mode.
@@ -774,15 +1047,35 @@ class SourceGenerator:
             assert num_pages_for_stack % self.max_num_cpus_supported == 0
             num_pages_per_cpu_for_stack = int(num_pages_for_stack / self.max_num_cpus_supported)
 
-            file_descriptor.write(
+            yield (
                 f"#define NUM_PAGES_PER_CPU_FOR_{stack_type.upper()}_STACK {num_pages_per_cpu_for_stack}\n\n"
             )
 
-            file_descriptor.write(
-                f"#define {stack_type.upper()}_STACK_PAGE_SIZE {stack_page_size}\n\n"
-            )
-
-    def generate_stack(self, file_descriptor):
+            yield f"#define {stack_type.upper()}_STACK_PAGE_SIZE {stack_page_size}\n\n"
+
+    def generate_per_cpu_labels_macro(self):
+        # <name>_cpu_<cpu id> labels are computed by the assembler from the
+        # start of the per cpu region and the size of each cpu's area so that
+        # the generated assembly doesn't grow with the number of cpus.
+        # .altmacro is needed to expand the cpu id counter with %.
+        yield ".altmacro\n"
+        yield ".macro jumpstart_per_cpu_label name, stride, cpu_id\n"
+        yield ".global \\name\\()_cpu_\\cpu_id\n"
+        yield ".set \\name\\()_cpu_\\cpu_id, \\name + (\\cpu_id * \\stride)\n"
+        yield ".endm\n"
+        yield ".noaltmacro\n\n"
+
+    def generate_per_cpu_labels(self, name, stride):
+        # Defines name_cpu_<cpu id> = name + cpu id * stride for every cpu.
+        yield ".altmacro\n"
+        yield ".set .Ljumpstart_cpu_id, 0\n"
+        yield f".rept {self.max_num_cpus_supported}\n"
+        yield f"  jumpstart_per_cpu_label {name}, {stride}, %.Ljumpstart_cpu_id\n"
+        yield "  .set .Ljumpstart_cpu_id, .Ljumpstart_cpu_id + 1\n"
+        yield ".endr\n"
+        yield ".noaltmacro\n"
+
+    def generate_stack(self):
         # This is a bit of a mess. Both mmode and smode share the same stack.
         # We've named this stack "privileged" so we need to map the stack
         # name to the mode.
@@ -808,25 +1101,24 @@ class SourceGenerator:
             assert num_pages_for_stack % self.max_num_cpus_supported == 0
             num_pages_per_cpu_for_stack = int(num_pages_for_stack / self.max_num_cpus_supported)
 
-            file_descriptor.write(f'.section .jumpstart.cpu.stack.{stack_type}, "aw"\n')
+            yield f'.section .jumpstart.cpu.stack.{stack_type}, "aw"\n'
             # Calculate alignment based on page size (log2 of page size)
             alignment = stack_page_size.bit_length() - 1
-            file_descriptor.write(f".align {alignment}\n")
-            file_descriptor.write(f".global {stack_type}_stack_top\n")
-            file_descriptor.write(f"{stack_type}_stack_top:\n")
-            for i in range(self.max_num_cpus_supported):
-                file_descriptor.write(f".global {stack_type}_stack_top_cpu_{i}\n")
-                file_descriptor.write(f"{stack_type}_stack_top_cpu_{i}:\n")
-                file_descriptor.write(f"  .zero {num_pages_per_cpu_for_stack * stack_page_size}\n")
-            file_descriptor.write(f".global {stack_type}_stack_bottom\n")
-            file_descriptor.write(f"{stack_type}_stack_bottom:\n\n")
-
-    def generate_cpu_sync_functions(self, file_descriptor):
+            yield f".align {alignment}\n"
+            yield f".global {stack_type}_stack_top\n"
+            yield f"{stack_type}_stack_top:\n"
+            stack_size_per_cpu = num_pages_per_cpu_for_stack * stack_page_size
+            yield f"  .zero {self.max_num_cpus_supported * stack_size_per_cpu}\n"
+            yield from self.generate_per_cpu_labels(f"{stack_type}_stack_top", stack_size_per_cpu)
+            yield f".global {stack_type}_stack_bottom\n"
+            yield f"{stack_type}_stack_bottom:\n\n"
+
+    def generate_cpu_sync_functions(self):
         active_cpu_mask = self.jumpstart_source_attributes["diag_attributes"]["active_cpu_mask"]
 
         modes = ListUtils.intersection(["mmode", "smode"], self.priv_modes_enabled)
         for mode in modes:
-            file_descriptor.write(
+            yield (
                 f"""
 .section .jumpstart.cpu.text.{mode}, "ax"
 # Inputs:
@@ -914,244 +1206,369 @@ sync_all_cpus_from_{mode}:
 """
             )
 
-    def generate_smode_fail_functions(self, file_descriptor):
+    def generate_smode_fail_functions(self):
         if "smode" in self.priv_modes_enabled:
-            file_descriptor.write('.section .jumpstart.cpu.text.smode, "ax"\n\n')
-            file_descriptor.write(".global jumpstart_smode_fail\n")
-            file_descriptor.write("jumpstart_smode_fail:\n")
+            yield '.section .jumpstart.cpu.text.smode, "ax"\n\n'
+            yield ".global jumpstart_smode_fail\n"
+            yield "jumpstart_smode_fail:\n"
 
             if "mmode" in self.priv_modes_enabled:
                 # use jumpstart mmode env call
-                file_descriptor.write("  li  a0, DIAG_FAILED\n")
-                file_descriptor.write("  j exit_from_smode\n")
+                yield "  li  a0, DIAG_FAILED\n"
+                yield "  j exit_from_smode\n"
             else:
                 # We expect to be running in sbi_firmware_boot mode.
                 # Use sbi call to request mmode fw to shutdown system.
-                file_descriptor.write("  li  a0, 0\n")
-                file_descriptor.write("  li  a1, DIAG_FAILED\n")
-                file_descriptor.write("  jal sbi_system_reset\n")
+                yield "  li  a0, 0\n"
+                yield "  li  a1, DIAG_FAILED\n"
+                yield "  jal sbi_system_reset\n"
 
-    def generate_mmu_functions(self, file_descriptor):
+    def generate_mmu_functions(self):
         modes = ListUtils.intersection(["mmode", "smode"], self.priv_modes_enabled)
         for mode in modes:
-            file_descriptor.write(f'.section .jumpstart.cpu.text.{mode}, "ax"\n\n')
-            file_descriptor.write(f".global setup_mmu_from_{mode}\n")
-            file_descriptor.write(f"setup_mmu_from_{mode}:\n\n")
-            for stage in TranslationStage.get_enabled_stages():
+            yield f'.section .jumpstart.cpu.text.{mode}, "ax"\n\n'
+            yield f".global setup_mmu_from_{mode}\n"
+            yield f"setup_mmu_from_{mode}:\n\n"
+            for stage in self.translation_context.get_enabled_stages():
                 atp_register = TranslationStage.get_atp_register(stage)
-                file_descriptor.write(f"    li   t0, {atp_register.upper()}_MODE\n")
-                file_descriptor.write(f"    slli  t0, t0, {atp_register.upper()}64_MODE_SHIFT\n")
+                yield f"    li   t0, {atp_register.upper()}_MODE\n"
+                yield f"    slli  t0, t0, {atp_register.upper()}64_MODE_SHIFT\n"
                 if stage in self.page_tables["cpu"]:
-                    file_descriptor.write(
-                        f"    la t1, {self.page_tables['cpu'][stage].get_asm_label()}\n"
-                    )
-                    file_descriptor.write("    srai t1, t1, PAGE_OFFSET\n")
-                    file_descriptor.write("    add  t0, t1, t0\n")
+                    yield f"    la t1, {self.page_tables['cpu'][stage].get_asm_label()}\n"
+                    yield "    srai t1, t1, PAGE_OFFSET\n"
+                    yield "    add  t0, t1, t0\n"
                 else:
-                    assert TranslationStage.get_selected_mode_for_stage(stage) == "bare"
-                file_descriptor.write(f"    csrw  {atp_register}, t0\n")
+                    assert self.translation_context.get_selected_mode_for_stage(stage) == "bare"
+                yield f"    csrw  {atp_register}, t0\n"
 
-            file_descriptor.write("    sfence.vma\n")
+            yield "    sfence.vma\n"
             if self.jumpstart_source_attributes["diag_attributes"]["enable_virtualization"] is True:
                 # This is for the hgatp update.
-                file_descriptor.write("    hfence.gvma\n")
-            file_descriptor.write("    ret\n")
+                yield "    hfence.gvma\n"
+            yield "    ret\n"
+
+    @staticmethod
+    def get_binary_pagetables_file(output_assembly_file):
+        # The page tables of all the stages are in one file next to the
+        # assembly file so that the build can declare it as an output.
+        return f"{os.path.splitext(output_assembly_file)[0]}.pagetables.bin"
+
+    def generate_page_tables_listing(self, page_tables):
+        pte_size_in_bytes = page_tables.get_attribute("pte_size_in_bytes")
+        pte_directive = f".{pte_size_in_bytes}byte"
+        # Don't format the log message for every PTE unless it's logged.
+        log_ptes = log.getLogger().isEnabledFor(log.DEBUG)
+        last_filled_address = None
+        # get_ptes() returns the PTEs in address order.
+        for address, pte_value in page_tables.get_ptes():
+            if last_filled_address is not None and address != (
+                last_filled_address + pte_size_in_bytes
+            ):
+                yield f".skip {hex(address - (last_filled_address + pte_size_in_bytes))}\n"
+            if log_ptes:
+                log.debug(f"Writing [{hex(address)}] = {hex(pte_value)}")
+            yield f"\n# [{address:#x}]\n{pte_directive} {pte_value:#x}\n"
+
+            last_filled_address = address
 
-    def generate_page_tables(self, file_descriptor):
+    def generate_page_tables_listing_file(self, output_pagetables_listing_file):
+        write_file_atomically(
+            output_pagetables_listing_file, "".join(self.generate_page_tables_listings())
+        )
+
+    def generate_page_tables_listings(self):
+        yield f"# This file is auto-generated by {os.path.basename(sys.argv[0])} from {self.diag_attributes_yaml}\n"
+
+        for target_mmu in MemoryMapping.get_supported_targets():
+            if target_mmu not in self.page_tables:
+                continue
+
+            for stage in self.translation_context.get_enabled_stages():
+                if stage not in self.page_tables[target_mmu]:
+                    continue
+
+                yield (
+                    f"\n# {target_mmu} MMU: {stage} Stage: {self.page_tables[target_mmu][stage].get_asm_label()}\n"
+                )
+                yield from self.generate_page_tables_listing(self.page_tables[target_mmu][stage])
+
+    def get_page_tables_map(self):
+        # Returns the coalesced ranges that the generated page tables map for
+        # each target MMU and stage. For virtualization diags the VS and G
+        # stage ranges are also composed into VA -> SPA ranges.
+        page_tables_map = []
         for target_mmu in MemoryMapping.get_supported_targets():
             if target_mmu not in self.page_tables:
                 continue
 
-            for stage in TranslationStage.get_enabled_stages():
+            mapped_ranges = {}
+            for stage in self.translation_context.get_enabled_stages():
                 if stage not in self.page_tables[target_mmu]:
                     continue
 
-                file_descriptor.write(
-                    f'.section .jumpstart.{target_mmu}.rodata.{stage}_stage.pagetables, "a"\n\n'
+                mapped_ranges[stage] = self.page_tables[target_mmu][stage].get_mapped_ranges()
+                page_tables_map.extend(
+                    (
+                        target_mmu,
+                        stage,
+                        TranslationStage.get_translates_from(stage),
+                        TranslationStage.get_translates_to(stage),
+                        mapped_range,
+                    )
+                    for mapped_range in mapped_ranges[stage]
                 )
 
-                file_descriptor.write(
-                    f".global {self.page_tables[target_mmu][stage].get_asm_label()}\n"
+            if "vs" in mapped_ranges and "g" in mapped_ranges:
+                page_tables_map.extend(
+                    (
+                        target_mmu,
+                        "vs+g",
+                        TranslationStage.get_translates_from("vs"),
+                        TranslationStage.get_translates_to("g"),
+                        mapped_range,
+                    )
+                    for mapped_range in PageTables.compose_mapped_ranges(
+                        mapped_ranges["vs"], mapped_ranges["g"]
+                    )
                 )
-                file_descriptor.write(f"{self.page_tables[target_mmu][stage].get_asm_label()}:\n\n")
 
-                file_descriptor.write("/* Memory mappings in this page table:\n")
+        return [
+            {
+                "target_mmu": target_mmu,
+                "stage": stage,
+                "source_address_type": source_address_type,
+                "source_address": hex(mapped_range["source_address"]),
+                "source_end_address": hex(mapped_range["source_address"] + mapped_range["size"]),
+                "dest_address_type": dest_address_type,
+                "dest_address": hex(mapped_range["dest_address"]),
+                "dest_end_address": hex(mapped_range["dest_address"] + mapped_range["size"]),
+                "size": hex(mapped_range["size"]),
+                "xwr": f"0b{mapped_range['xwr']:03b}",
+                "umode": f"0b{mapped_range['umode']}",
+                "pbmt_mode": mapped_range["pbmt_mode"],
+                "page_size": hex(mapped_range["page_size"]),
+            }
+            for target_mmu, stage, source_address_type, dest_address_type, mapped_range in (
+                page_tables_map
+            )
+        ]
+
+    def generate_page_tables_map_file(self, output_pagetables_map_file, output_format):
+        page_tables_map = self.get_page_tables_map()
+
+        page_tables_map_buffer = io.StringIO(newline="")
+        if output_format == "csv":
+            writer = csv.DictWriter(
+                page_tables_map_buffer,
+                fieldnames=[
+                    "target_mmu",
+                    "stage",
+                    "source_address_type",
+                    "source_address",
+                    "source_end_address",
+                    "dest_address_type",
+                    "dest_address",
+                    "dest_end_address",
+                    "size",
+                    "xwr",
+                    "umode",
+                    "pbmt_mode",
+                    "page_size",
+                ],
+            )
+            writer.writeheader()
+            writer.writerows(page_tables_map)
+        else:
+            json.dump(page_tables_map, page_tables_map_buffer, indent=2)
+            page_tables_map_buffer.write("\n")
+
+        write_file_atomically(output_pagetables_map_file, page_tables_map_buffer.getvalue())
+
+    def generate_page_tables(self, output_assembly_file):
+        self.binary_pagetables = bytearray()
+        for target_mmu in MemoryMapping.get_supported_targets():
+            if target_mmu not in self.page_tables:
+                continue
+
+            for stage in self.translation_context.get_enabled_stages():
+                if stage not in self.page_tables[target_mmu]:
+                    continue
+
+                yield f'.section .jumpstart.{target_mmu}.rodata.{stage}_stage.pagetables, "a"\n\n'
+
+                yield f".global {self.page_tables[target_mmu][stage].get_asm_label()}\n"
+                yield f"{self.page_tables[target_mmu][stage].get_asm_label()}:\n\n"
+
+                yield "/* Memory mappings in this page table:\n"
                 for mapping in self.page_tables[target_mmu][stage].get_mappings():
                     if not mapping.is_bare_mapping():
-                        file_descriptor.write(f"{mapping}\n")
-                file_descriptor.write("*/\n")
+                        yield f"{mapping}\n"
+                yield "*/\n"
 
-                pte_size_in_bytes = self.page_tables[target_mmu][stage].get_attribute(
-                    "pte_size_in_bytes"
-                )
-                last_filled_address = None
-                for address in list(
-                    sorted(self.page_tables[target_mmu][stage].get_pte_addresses())
+                if (
+                    self.jumpstart_source_attributes["diag_attributes"][
+                        "generate_binary_pagetables"
+                    ]
+                    is True
                 ):
-                    if last_filled_address is not None and address != (
-                        last_filled_address + pte_size_in_bytes
-                    ):
-                        file_descriptor.write(
-                            f".skip {hex(address - (last_filled_address + pte_size_in_bytes))}\n"
-                        )
-                    log.debug(
-                        f"Writing [{hex(address)}] = {hex(self.page_tables[target_mmu][stage].get_pte(address))}"
+                    pte_region = self.page_tables[target_mmu][stage].get_pte_region_as_bytes()
+                    # The file is named relative to the assembly file, whose
+                    # directory the build puts on the assembler's include
+                    # path, so the generated sources can be moved.
+                    binary_pagetables_file = os.path.basename(
+                        self.get_binary_pagetables_file(output_assembly_file)
                     )
-                    file_descriptor.write(f"\n# [{hex(address)}]\n")
-                    file_descriptor.write(
-                        f".{pte_size_in_bytes}byte {hex(self.page_tables[target_mmu][stage].get_pte(address))}\n"
+                    yield f'\n.incbin "{binary_pagetables_file}", {len(self.binary_pagetables):#x}, {len(pte_region):#x}\n'
+                    self.binary_pagetables.extend(pte_region)
+                else:
+                    yield from self.generate_page_tables_listing(
+                        self.page_tables[target_mmu][stage]
                     )
 
-                    last_filled_address = address
-
     def generate_assembly_file(self, output_assembly_file):
-        with open(output_assembly_file, "w") as file:
-            file.write(
-                f"# This file is auto-generated by {sys.argv[0]} from {self.diag_attributes_yaml}\n"
-            )
+        assembly = "".join(self.generate_assembly(output_assembly_file))
+        # The binary page tables file is written even if it is empty as the
+        # build declares it as an output of the source generator.
+        write_file_atomically(
+            self.get_binary_pagetables_file(output_assembly_file), bytes(self.binary_pagetables)
+        )
+        write_file_atomically(output_assembly_file, assembly)
 
-            file.write("\n\n")
-            file.write('#include "cpu_bits.h"\n\n')
+    def generate_assembly(self, output_assembly_file):
+        yield f"# This file is auto-generated by {os.path.basename(sys.argv[0])} from {self.diag_attributes_yaml}\n"
 
-            self.generate_mmu_functions(file)
+        yield "\n\n"
+        yield '#include "cpu_bits.h"\n\n'
 
-            self.generate_smode_fail_functions(file)
+        yield from self.generate_per_cpu_labels_macro()
 
-            self.generate_cpu_sync_functions(file)
+        yield from self.generate_mmu_functions()
 
-            self.generate_stack(file)
+        yield from self.generate_smode_fail_functions()
 
-            self.generate_thread_attributes_code(file)
+        yield from self.generate_cpu_sync_functions()
 
-            self.generate_reg_context_save_restore_assembly(file)
+        yield from self.generate_stack()
 
-            self.generate_cstructs_assembly(file)
+        yield from self.generate_thread_attributes_code()
 
-            if self.jumpstart_source_attributes["rivos_internal_build"] is True:
-                rivos_internal_functions.generate_rivos_internal_mmu_functions(
-                    file, self.priv_modes_enabled
-                )
+        yield from self.generate_reg_context_save_restore_assembly()
+
+        yield from self.generate_cstructs_assembly()
 
-            self.generate_page_tables(file)
+        if self.jumpstart_source_attributes["rivos_internal_build"] is True:
+            rivos_internal_mmu_functions = io.StringIO()
+            rivos_internal_functions.generate_rivos_internal_mmu_functions(
+                rivos_internal_mmu_functions, self.priv_modes_enabled
+            )
+            yield rivos_internal_mmu_functions.getvalue()
 
-            file.close()
+        yield from self.generate_page_tables(output_assembly_file)
 
-    def generate_thread_attributes_code(self, file_descriptor):
-        self.generate_thread_attributes_getter_functions(file_descriptor)
+    def generate_thread_attributes_code(self):
+        yield from self.generate_thread_attributes_getter_functions()
 
         modes = ListUtils.intersection(["smode", "mmode"], self.priv_modes_enabled)
         mode_encodings = {"smode": "PRV_S", "mmode": "PRV_M"}
         for mode in modes:
-            file_descriptor.write(f'.section .jumpstart.cpu.text.{mode}.init, "ax"\n')
-            file_descriptor.write("# Inputs:\n")
-            file_descriptor.write("#   a0: cpu id\n")
-            file_descriptor.write("#   a1: physical cpu id\n")
-            file_descriptor.write(f".global setup_thread_attributes_from_{mode}\n")
-            file_descriptor.write(f"setup_thread_attributes_from_{mode}:\n")
-            file_descriptor.write("  li t1, MAX_NUM_CPUS_SUPPORTED\n")
-            file_descriptor.write(f"  bgeu a0, t1, jumpstart_{mode}_fail\n")
-            file_descriptor.write("\n")
+            yield f'.section .jumpstart.cpu.text.{mode}.init, "ax"\n'
+            yield "# Inputs:\n"
+            yield "#   a0: cpu id\n"
+            yield "#   a1: physical cpu id\n"
+            yield f".global setup_thread_attributes_from_{mode}\n"
+            yield f"setup_thread_attributes_from_{mode}:\n"
+            yield "  li t1, MAX_NUM_CPUS_SUPPORTED\n"
+            yield f"  bgeu a0, t1, jumpstart_{mode}_fail\n"
+            yield "\n"
             # Save input parameters and return address to stack
-            file_descriptor.write("  addi sp, sp, -24\n")
-            file_descriptor.write("  sd a0, 0(sp)    # Save cpu_id\n")
-            file_descriptor.write("  sd a1, 8(sp)    # Save physical_cpu_id\n")
-            file_descriptor.write("  sd ra, 16(sp)   # Save return address\n")
-            file_descriptor.write("\n")
+            yield "  addi sp, sp, -24\n"
+            yield "  sd a0, 0(sp)    # Save cpu_id\n"
+            yield "  sd a1, 8(sp)    # Save physical_cpu_id\n"
+            yield "  sd ra, 16(sp)   # Save return address\n"
+            yield "\n"
             # Call getter function to get thread attributes address for this cpu id
-            file_descriptor.write(f"  jal get_thread_attributes_for_cpu_id_from_{mode}\n")
-            file_descriptor.write("  mv tp, a0       # Move returned address to tp\n")
-            file_descriptor.write("\n")
+            yield f"  jal get_thread_attributes_for_cpu_id_from_{mode}\n"
+            yield "  mv tp, a0       # Move returned address to tp\n"
+            yield "\n"
             # Restore parameters from stack
-            file_descriptor.write("  ld ra, 16(sp)   # Restore return address\n")
-            file_descriptor.write("  ld a1, 8(sp)    # Restore physical_cpu_id\n")
-            file_descriptor.write("  ld a0, 0(sp)    # Restore cpu_id\n")
-            file_descriptor.write("  addi sp, sp, 24\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_CPU_ID(a0)\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_PHYSICAL_CPU_ID(a1)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  li t0, TRAP_OVERRIDE_ATTRIBUTES_STRUCT_SIZE_IN_BYTES\n")
-            file_descriptor.write("  mul t0, a0, t0\n")
-            file_descriptor.write("  la t1, trap_override_attributes_region\n")
-            file_descriptor.write("  add t0, t1, t0\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_TRAP_OVERRIDE_STRUCT_ADDRESS(t0)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write(
-                "  li t0, REG_CONTEXT_SAVE_REGION_SIZE_IN_BYTES * MAX_NUM_CONTEXT_SAVES\n"
-            )
-            file_descriptor.write("  mul t0, a0, t0\n")
-            file_descriptor.write("\n")
+            yield "  ld ra, 16(sp)   # Restore return address\n"
+            yield "  ld a1, 8(sp)    # Restore physical_cpu_id\n"
+            yield "  ld a0, 0(sp)    # Restore cpu_id\n"
+            yield "  addi sp, sp, 24\n"
+            yield "\n"
+            yield "  SET_THREAD_ATTRIBUTES_CPU_ID(a0)\n"
+            yield "  SET_THREAD_ATTRIBUTES_PHYSICAL_CPU_ID(a1)\n"
+            yield "\n"
+            yield "  li t0, TRAP_OVERRIDE_ATTRIBUTES_STRUCT_SIZE_IN_BYTES\n"
+            yield "  mul t0, a0, t0\n"
+            yield "  la t1, trap_override_attributes_region\n"
+            yield "  add t0, t1, t0\n"
+            yield "  SET_THREAD_ATTRIBUTES_TRAP_OVERRIDE_STRUCT_ADDRESS(t0)\n"
+            yield "\n"
+            yield "  li t0, REG_CONTEXT_SAVE_REGION_SIZE_IN_BYTES * MAX_NUM_CONTEXT_SAVES\n"
+            yield "  mul t0, a0, t0\n"
+            yield "\n"
             if "mmode" in modes:
-                file_descriptor.write("  la t1, mmode_reg_context_save_region\n")
-                file_descriptor.write("  add t1, t1, t0\n")
-                file_descriptor.write("  la t2, mmode_reg_context_save_region_end\n")
-                file_descriptor.write(f"  bgeu t1, t2, jumpstart_{mode}_fail\n")
-                file_descriptor.write(
-                    "  SET_THREAD_ATTRIBUTES_MMODE_REG_CONTEXT_SAVE_REGION_ADDRESS(t1)\n"
-                )
-                file_descriptor.write("  li t1, MAX_NUM_CONTEXT_SAVES\n")
-                file_descriptor.write(
-                    "  SET_THREAD_ATTRIBUTES_NUM_CONTEXT_SAVES_REMAINING_IN_MMODE(t1)\n"
-                )
-                file_descriptor.write("\n")
-
-                file_descriptor.write("  csrr t1, marchid\n")
-                file_descriptor.write("  SET_THREAD_ATTRIBUTES_MARCHID(t1)\n")
-                file_descriptor.write("  csrr t1, mimpid\n")
-                file_descriptor.write("  SET_THREAD_ATTRIBUTES_MIMPID(t1)\n")
-                file_descriptor.write("\n")
+                yield "  la t1, mmode_reg_context_save_region\n"
+                yield "  add t1, t1, t0\n"
+                yield "  la t2, mmode_reg_context_save_region_end\n"
+                yield f"  bgeu t1, t2, jumpstart_{mode}_fail\n"
+                yield "  SET_THREAD_ATTRIBUTES_MMODE_REG_CONTEXT_SAVE_REGION_ADDRESS(t1)\n"
+                yield "  li t1, MAX_NUM_CONTEXT_SAVES\n"
+                yield "  SET_THREAD_ATTRIBUTES_NUM_CONTEXT_SAVES_REMAINING_IN_MMODE(t1)\n"
+                yield "\n"
+
+                yield "  csrr t1, marchid\n"
+                yield "  SET_THREAD_ATTRIBUTES_MARCHID(t1)\n"
+                yield "  csrr t1, mimpid\n"
+                yield "  SET_THREAD_ATTRIBUTES_MIMPID(t1)\n"
+                yield "\n"
 
             if "smode" in modes:
-                file_descriptor.write("  la t1, smode_reg_context_save_region\n")
-                file_descriptor.write("  add t1, t1, t0\n")
-                file_descriptor.write("  la t2, smode_reg_context_save_region_end\n")
-                file_descriptor.write(f"  bgeu t1, t2, jumpstart_{mode}_fail\n")
-                file_descriptor.write(
-                    "  SET_THREAD_ATTRIBUTES_SMODE_REG_CONTEXT_SAVE_REGION_ADDRESS(t1)\n"
-                )
-
-            file_descriptor.write("  li t1, MAX_NUM_CONTEXT_SAVES\n")
-            file_descriptor.write(
-                "  SET_THREAD_ATTRIBUTES_NUM_CONTEXT_SAVES_REMAINING_IN_SMODE(t1)\n"
-            )
-            file_descriptor.write("\n")
-            file_descriptor.write("  li  t0, 0\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_SMODE_SETUP_DONE(t0)\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_VSMODE_SETUP_DONE(t0)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_CURRENT_V_BIT(t0)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write(f"  li  t0, {mode_encodings[mode]}\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_CURRENT_MODE(t0)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  li  t0, THREAD_ATTRIBUTES_BOOKEND_MAGIC_NUMBER_VALUE\n")
-            file_descriptor.write("  SET_THREAD_ATTRIBUTES_BOOKEND_MAGIC_NUMBER(t0)\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  ret\n")
-
-    def generate_thread_attributes_getter_functions(self, file_descriptor):
+                yield "  la t1, smode_reg_context_save_region\n"
+                yield "  add t1, t1, t0\n"
+                yield "  la t2, smode_reg_context_save_region_end\n"
+                yield f"  bgeu t1, t2, jumpstart_{mode}_fail\n"
+                yield "  SET_THREAD_ATTRIBUTES_SMODE_REG_CONTEXT_SAVE_REGION_ADDRESS(t1)\n"
+
+            yield "  li t1, MAX_NUM_CONTEXT_SAVES\n"
+            yield "  SET_THREAD_ATTRIBUTES_NUM_CONTEXT_SAVES_REMAINING_IN_SMODE(t1)\n"
+            yield "\n"
+            yield "  li  t0, 0\n"
+            yield "  SET_THREAD_ATTRIBUTES_SMODE_SETUP_DONE(t0)\n"
+            yield "  SET_THREAD_ATTRIBUTES_VSMODE_SETUP_DONE(t0)\n"
+            yield "\n"
+            yield "  SET_THREAD_ATTRIBUTES_CURRENT_V_BIT(t0)\n"
+            yield "\n"
+            yield f"  li  t0, {mode_encodings[mode]}\n"
+            yield "  SET_THREAD_ATTRIBUTES_CURRENT_MODE(t0)\n"
+            yield "\n"
+            yield "  li  t0, THREAD_ATTRIBUTES_BOOKEND_MAGIC_NUMBER_VALUE\n"
+            yield "  SET_THREAD_ATTRIBUTES_BOOKEND_MAGIC_NUMBER(t0)\n"
+            yield "\n"
+            yield "  ret\n"
+
+    def generate_thread_attributes_getter_functions(self):
         """Generate functions to get thread attributes struct address for a given CPU ID."""
         modes = ListUtils.intersection(["smode", "mmode"], self.priv_modes_enabled)
         for mode in modes:
-            file_descriptor.write(f'.section .jumpstart.cpu.text.{mode}.init, "ax"\n')
-            file_descriptor.write("# Inputs:\n")
-            file_descriptor.write("#   a0: cpu id\n")
-            file_descriptor.write("# Outputs:\n")
-            file_descriptor.write(
-                "#   a0: address of thread attributes struct for the given cpu id\n"
-            )
-            file_descriptor.write(f".global get_thread_attributes_for_cpu_id_from_{mode}\n")
-            file_descriptor.write(f"get_thread_attributes_for_cpu_id_from_{mode}:\n")
-            file_descriptor.write("  li t1, MAX_NUM_CPUS_SUPPORTED\n")
-            file_descriptor.write(f"  bgeu a0, t1, jumpstart_{mode}_fail\n")
-            file_descriptor.write("\n")
-            file_descriptor.write("  li  t2, THREAD_ATTRIBUTES_STRUCT_SIZE_IN_BYTES\n")
-            file_descriptor.write("  mul t2, a0, t2\n")
-            file_descriptor.write("  la  t1, thread_attributes_region\n")
-            file_descriptor.write("  add a0, t1, t2\n")
-            file_descriptor.write("  ret\n\n")
-
-    def generate_reg_context_save_restore_defines(self, file_descriptor):
+            yield f'.section .jumpstart.cpu.text.{mode}.init, "ax"\n'
+            yield "# Inputs:\n"
+            yield "#   a0: cpu id\n"
+            yield "# Outputs:\n"
+            yield "#   a0: address of thread attributes struct for the given cpu id\n"
+            yield f".global get_thread_attributes_for_cpu_id_from_{mode}\n"
+            yield f"get_thread_attributes_for_cpu_id_from_{mode}:\n"
+            yield "  li t1, MAX_NUM_CPUS_SUPPORTED\n"
+            yield f"  bgeu a0, t1, jumpstart_{mode}_fail\n"
+            yield "\n"
+            yield "  li  t2, THREAD_ATTRIBUTES_STRUCT_SIZE_IN_BYTES\n"
+            yield "  mul t2, a0, t2\n"
+            yield "  la  t1, thread_attributes_region\n"
+            yield "  add a0, t1, t2\n"
+            yield "  ret\n\n"
+
+    def generate_reg_context_save_restore_defines(self):
         """Generate defines for register context save/restore functionality."""
         assert (
             self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
@@ -1170,41 +1587,37 @@ sync_all_cpus_from_{mode}:
                 "registers"
             ][reg_type]
             for reg_name in reg_names:
-                file_descriptor.write(
-                    f"#define {reg_name.upper()}_OFFSET_IN_SAVE_REGION ({num_registers} * 8)\n"
-                )
+                yield f"#define {reg_name.upper()}_OFFSET_IN_SAVE_REGION ({num_registers} * 8)\n"
                 num_registers += 1
 
         temp_reg_name = self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
             "temp_register"
         ]
 
-        file_descriptor.write(
-            f"\n#define REG_CONTEXT_SAVE_REGION_SIZE_IN_BYTES ({num_registers} * 8)\n"
-        )
-        file_descriptor.write(
+        yield f"\n#define REG_CONTEXT_SAVE_REGION_SIZE_IN_BYTES ({num_registers} * 8)\n"
+        yield (
             f"\n#define MAX_NUM_CONTEXT_SAVES {self.jumpstart_source_attributes['reg_context_to_save_across_exceptions']['max_num_context_saves']}\n"
         )
 
-        file_descriptor.write("\n#define SAVE_ALL_GPRS   ;")
+        yield "\n#define SAVE_ALL_GPRS   ;"
         for gpr_name in self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
             "registers"
         ]["gprs"]:
-            file_descriptor.write(
+            yield (
                 f"\\\n  sd {gpr_name}, {gpr_name.upper()}_OFFSET_IN_SAVE_REGION({temp_reg_name})   ;"
             )
-        file_descriptor.write("\n\n")
+        yield "\n\n"
 
-        file_descriptor.write("\n#define RESTORE_ALL_GPRS   ;")
+        yield "\n#define RESTORE_ALL_GPRS   ;"
         for gpr_name in self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
             "registers"
         ]["gprs"]:
-            file_descriptor.write(
+            yield (
                 f"\\\n  ld {gpr_name}, {gpr_name.upper()}_OFFSET_IN_SAVE_REGION({temp_reg_name})   ;"
             )
-        file_descriptor.write("\n\n")
+        yield "\n\n"
 
-    def generate_reg_context_save_restore_assembly(self, file_descriptor):
+    def generate_reg_context_save_restore_assembly(self):
         """Generate assembly code for register context save/restore regions."""
         num_registers = 0
         for reg_type in self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
@@ -1216,122 +1629,110 @@ sync_all_cpus_from_{mode}:
             for reg_name in reg_names:
                 num_registers += 1
 
-        file_descriptor.write('\n\n.section .jumpstart.cpu.data.privileged, "a"\n')
+        yield '\n\n.section .jumpstart.cpu.data.privileged, "a"\n'
         modes = ListUtils.intersection(["mmode", "smode"], self.priv_modes_enabled)
-        file_descriptor.write(
+        yield (
             f"\n# {modes} context saved registers:\n# {self.jumpstart_source_attributes['reg_context_to_save_across_exceptions']['registers']}\n"
         )
+        max_num_context_saves = self.jumpstart_source_attributes[
+            "reg_context_to_save_across_exceptions"
+        ]["max_num_context_saves"]
         for mode in modes:
-            file_descriptor.write(f".global {mode}_reg_context_save_region\n")
-            file_descriptor.write(f"{mode}_reg_context_save_region:\n")
-            for i in range(self.max_num_cpus_supported):
-                file_descriptor.write(
-                    f"  # {mode} context save area for cpu {i}'s {num_registers} registers. {self.jumpstart_source_attributes['reg_context_to_save_across_exceptions']['max_num_context_saves']} nested contexts supported.\n"
-                )
-                for i in range(
-                    self.jumpstart_source_attributes["reg_context_to_save_across_exceptions"][
-                        "max_num_context_saves"
-                    ]
-                ):
-                    f"  # Context {i}\n"
-                    file_descriptor.write(f"  .zero {num_registers * 8}\n\n")
-            file_descriptor.write(f".global {mode}_reg_context_save_region_end\n")
-            file_descriptor.write(f"{mode}_reg_context_save_region_end:\n\n")
+            yield f".global {mode}_reg_context_save_region\n"
+            yield f"{mode}_reg_context_save_region:\n"
+            # The save areas are indexed by cpu id at runtime so a single
+            # .zero covers all the cpus.
+            yield (
+                f"  # {mode} context save areas for {self.max_num_cpus_supported} cpus. Each cpu has {max_num_context_saves} nested contexts of {num_registers} registers.\n"
+            )
+            yield f"  .zero {self.max_num_cpus_supported * max_num_context_saves * num_registers * 8}\n\n"
+            yield f".global {mode}_reg_context_save_region_end\n"
+            yield f"{mode}_reg_context_save_region_end:\n\n"
 
-    def generate_cstructs_defines(self, file_descriptor):
+    def generate_cstructs_defines(self):
         """Generate #define statements for struct sizes and field counts."""
         for c_struct in self.c_structs:
             # Generate defines for array field counts
             for field in c_struct.fields:
                 if field.num_elements > 1:
-                    file_descriptor.write(
-                        f"#define NUM_{field.name.upper()} {field.num_elements}\n"
-                    )
+                    yield f"#define NUM_{field.name.upper()} {field.num_elements}\n"
 
             # Generate struct size define
-            file_descriptor.write(
+            yield (
                 f"#define {c_struct.name.upper()}_STRUCT_SIZE_IN_BYTES {c_struct.size_in_bytes}\n\n"
             )
 
             # Generate field offset defines and getter/setter macros for thread_attributes
             if c_struct.name == "thread_attributes":
                 for field in c_struct.fields:
-                    file_descriptor.write(
+                    yield (
                         f"#define {c_struct.name.upper()}_{field.name.upper()}_OFFSET {field.offset}\n"
                     )
-                    file_descriptor.write(
+                    yield (
                         f"#define GET_{c_struct.name.upper()}_{field.name.upper()}(dest_reg) {get_memop_of_size(MemoryOp.LOAD, field.size_in_bytes)}   dest_reg, {c_struct.name.upper()}_{field.name.upper()}_OFFSET(tp);\n"
                     )
-                    file_descriptor.write(
+                    yield (
                         f"#define SET_{c_struct.name.upper()}_{field.name.upper()}(dest_reg) {get_memop_of_size(MemoryOp.STORE, field.size_in_bytes)}   dest_reg, {c_struct.name.upper()}_{field.name.upper()}_OFFSET(tp);\n\n"
                     )
 
-    def generate_cstructs_data_structures(self, file_descriptor):
+    def generate_cstructs_data_structures(self):
         """Generate C struct definitions."""
         for c_struct in self.c_structs:
-            file_descriptor.write(f"struct {c_struct.name} {{\n")
+            yield f"struct {c_struct.name} {{\n"
             for field in c_struct.fields:
                 if field.num_elements > 1:
-                    file_descriptor.write(
-                        f"    {field.field_type} {field.name}[NUM_{field.name.upper()}];\n"
-                    )
+                    yield f"    {field.field_type} {field.name}[NUM_{field.name.upper()}];\n"
                 else:
-                    file_descriptor.write(f"    {field.field_type} {field.name};\n")
-            file_descriptor.write(f"}} __attribute__((aligned({c_struct.alignment})));\n\n")
+                    yield f"    {field.field_type} {field.name};\n"
+            yield f"}} __attribute__((aligned({c_struct.alignment})));\n\n"
 
             # Generate offsetof assertions for compile-time verification
-            self._generate_offsetof_assertions(c_struct, file_descriptor)
+            yield from self._generate_offsetof_assertions(c_struct)
 
-    def _generate_offsetof_assertions(self, c_struct, file_descriptor):
+    def _generate_offsetof_assertions(self, c_struct):
         """Generate _Static_assert statements using offsetof() for compile-time verification."""
         for field in c_struct.fields:
-            file_descriptor.write(
+            yield (
                 f"_Static_assert(offsetof(struct {c_struct.name}, {field.name}) == {field.offset}, "
                 f'"{c_struct.name}.{field.name} offset mismatch");\n'
             )
 
         # Generate size assertion
-        file_descriptor.write(
+        yield (
             f"_Static_assert(sizeof(struct {c_struct.name}) == {c_struct.name.upper()}_STRUCT_SIZE_IN_BYTES, "
             f'"{c_struct.name} size mismatch");\n\n'
         )
 
-    def generate_cstructs_assembly(self, file_descriptor):
+    def generate_cstructs_assembly(self):
         """Generate assembly code for struct regions and getter/setter functions."""
         for c_struct in self.c_structs:
             # Generate assembly regions
-            file_descriptor.write('.section .jumpstart.cpu.c_structs.mmode, "aw"\n\n')
-            file_descriptor.write(f".global {c_struct.name}_region\n")
-            file_descriptor.write(f"{c_struct.name}_region:\n")
-            for i in range(self.max_num_cpus_supported):
-                file_descriptor.write(f".global {c_struct.name}_region_cpu_{i}\n")
-                file_descriptor.write(f"{c_struct.name}_region_cpu_{i}:\n")
-                file_descriptor.write(f"  .zero {c_struct.size_in_bytes}\n")
-            file_descriptor.write(f".global {c_struct.name}_region_end\n")
-            file_descriptor.write(f"{c_struct.name}_region_end:\n\n")
+            yield '.section .jumpstart.cpu.c_structs.mmode, "aw"\n\n'
+            yield f".global {c_struct.name}_region\n"
+            yield f"{c_struct.name}_region:\n"
+            yield f"  .zero {self.max_num_cpus_supported * c_struct.size_in_bytes}\n"
+            yield from self.generate_per_cpu_labels(
+                f"{c_struct.name}_region", c_struct.size_in_bytes
+            )
+            yield f".global {c_struct.name}_region_end\n"
+            yield f"{c_struct.name}_region_end:\n\n"
 
             # Generate getter/setter functions for thread_attributes
             if c_struct.name == "thread_attributes":
                 modes = ListUtils.intersection(["smode", "mmode"], self.priv_modes_enabled)
                 for field in c_struct.fields:
                     for mode in modes:
-                        file_descriptor.write(f'.section .jumpstart.cpu.text.{mode}, "ax"\n')
+                        yield f'.section .jumpstart.cpu.text.{mode}, "ax"\n'
                         getter_method = f"get_{c_struct.name}_{field.name}_from_{mode}"
-                        file_descriptor.write(f".global {getter_method}\n")
-                        file_descriptor.write(f"{getter_method}:\n")
-                        file_descriptor.write(
-                            f"    GET_{c_struct.name.upper()}_{field.name.upper()}(a0)\n"
-                        )
-                        file_descriptor.write("    ret\n\n")
+                        yield f".global {getter_method}\n"
+                        yield f"{getter_method}:\n"
+                        yield f"    GET_{c_struct.name.upper()}_{field.name.upper()}(a0)\n"
+                        yield "    ret\n\n"
 
-                        file_descriptor.write(
-                            f".global set_{c_struct.name}_{field.name}_from_{mode}\n"
-                        )
-                        file_descriptor.write(f"set_{c_struct.name}_{field.name}_from_{mode}:\n")
-                        file_descriptor.write(
-                            f"    SET_{c_struct.name.upper()}_{field.name.upper()}(a0)\n"
-                        )
-                        file_descriptor.write("    ret\n\n")
+                        yield f".global set_{c_struct.name}_{field.name}_from_{mode}\n"
+                        yield f"set_{c_struct.name}_{field.name}_from_{mode}:\n"
+                        yield f"    SET_{c_struct.name.upper()}_{field.name.upper()}(a0)\n"
+                        yield "    ret\n\n"
 
         # Validate total size
         total_size_of_c_structs = sum(c_struct.size_in_bytes for c_struct in self.c_structs)
@@ -1355,111 +1756,419 @@ sync_all_cpus_from_{mode}:
                 f"Total size of C structs ({total_size_of_c_structs}) exceeds maximum size allocated for C structs {max_allowed_size_of_c_structs}"
             )
 
-    def _parse_c_structs(self):
-        """Parse C structs from YAML data into CStruct objects."""
-        c_structs = []
-        for struct_name, struct_data in self.jumpstart_source_attributes["c_structs"].items():
-            c_struct = CStruct(struct_name, struct_data["fields"])
-            c_structs.append(c_struct)
-        return c_structs
+    def translate(self, source_addresses):
+        # Translates each address through every enabled stage and returns a
+        # list with one entry per address that can be dumped as JSON. The
+        # walk cache is shared by all the addresses so the PTEs above the
+        # leaf level are only walked once per batch.
+        walk_cache = {}
+        translations = []
+        for source_address in source_addresses:
+            stage_translations = []
+            for target_mmu in MemoryMapping.get_supported_targets():
+                for stage in self.translation_context.get_enabled_stages():
+                    try:
+                        stage_translation = self.translate_stage(
+                            target_mmu, stage, source_address, walk_cache
+                        )
+                        log.info(
+                            f"{target_mmu} MMU: {stage} Stage: Translated {hex(source_address)} --> {stage_translation['dest_address']}"
+                        )
+                    except Exception as e:
+                        log.warning(
+                            f"{target_mmu} MMU: {stage} Stage: Translation of {hex(source_address)} FAILED: {e}"
+                        )
+                        stage_translation = {
+                            "target_mmu": target_mmu,
+                            "stage": stage,
+                            "source_address": hex(source_address),
+                            "error": str(e),
+                        }
+                    stage_translations.append(stage_translation)
+
+            translations.append(
+                {"address": hex(source_address), "translations": stage_translations}
+            )
+
+        return translations
 
-    def translate(self, source_address):
-        for target_mmu in MemoryMapping.get_supported_targets():
-            for stage in TranslationStage.get_enabled_stages():
-                try:
-                    self.translate_stage(target_mmu, stage, source_address)
-                    log.info(f"{target_mmu} MMU: {stage} Stage: Translation SUCCESS\n\n")
-                except Exception as e:
-                    log.warning(f"{target_mmu} MMU: {stage} Stage: Translation FAILED: {e}\n\n")
-
-    def translate_stage(self, target_mmu, stage, source_address):
-        translation_mode = TranslationStage.get_selected_mode_for_stage(stage)
-        log.info(
+    def translate_stage(self, target_mmu, stage, source_address, walk_cache=None):
+        # Walks the stage's page tables for source_address. walk_cache maps
+        # (target_mmu, stage, pte_address) to the already walked non-leaf
+        # PTEs and is filled in as a side effect.
+        if walk_cache is None:
+            walk_cache = {}
+
+        translation_mode = self.translation_context.get_selected_mode_for_stage(stage)
+        log.debug(
             f"{target_mmu} MMU: {stage} Stage: Translating Address {hex(source_address)}. Translation.translation_mode = {translation_mode}."
         )
 
-        attributes = PageTableAttributes(translation_mode)
+        if stage not in self.page_tables[target_mmu]:
+            raise ValueError(f"No page tables for {translation_mode} mode")
+
+        page_tables = self.page_tables[target_mmu][stage]
+        pte_codec = PteCodec.get_codec(translation_mode)
+        next_stage = TranslationStage.get_next_stage(stage)
+
+        ptes = []
 
         # Step 1
-        a = self.page_tables[target_mmu][stage].get_start_address()
+        a = page_tables.get_start_address()
 
         current_level = 0
-        pte_value = 0
 
         # Step 2
         while True:
-            log.info(
+            log.debug(
                 f"    {target_mmu} MMU: {stage} Stage: a = {hex(a)}; current_level = {current_level}"
             )
 
-            pte_address = a + BitField.extract_bits(
-                source_address, attributes.get_attribute("va_vpn_bits")[current_level]
-            ) * attributes.get_attribute("pte_size_in_bytes")
+            pte_address = (
+                a + pte_codec.get_vpn(source_address, current_level) * pte_codec.pte_size_in_bytes
+            )
+
+            cached_pte = walk_cache.get((target_mmu, stage, pte_address))
+            if cached_pte is not None:
+                log.debug(
+                    f"    {target_mmu} MMU: {stage} Stage: level{current_level} PTE: [{hex(pte_address)}] = {cached_pte['value']} (cached)"
+                )
+                ptes.append(cached_pte)
+                a = int(cached_pte["next_address"], 16)
+                current_level += 1
+                continue
+
+            pte = {"level": current_level, "address": hex(pte_address)}
 
-            if TranslationStage.get_next_stage(stage) is not None:
-                log.info(
+            if next_stage is not None:
+                log.debug(
                     f"    {target_mmu} MMU: {stage} Stage: PTE Address {hex(pte_address)} needs next stage translation."
                 )
-                self.translate_stage(
-                    target_mmu, TranslationStage.get_next_stage(stage), pte_address
+                pte["address_translation"] = self.translate_stage(
+                    target_mmu, next_stage, pte_address, walk_cache
                 )
 
-            pte_value = self.page_tables[target_mmu][stage].read_sparse_memory(pte_address)
+            pte_value = page_tables.read_sparse_memory(pte_address)
 
             if pte_value is None:
                 raise ValueError(f"Level {current_level} PTE at {hex(pte_address)} is not valid.")
 
-            log.info(
+            log.debug(
                 f"    {target_mmu} MMU: {stage} Stage: level{current_level} PTE: [{hex(pte_address)}] = {hex(pte_value)}"
             )
+            pte["value"] = hex(pte_value)
+
+            decoded_pte = pte_codec.decode(pte_value)
 
-            if BitField.extract_bits(pte_value, attributes.common_attributes["valid_bit"]) == 0:
+            if decoded_pte.valid == 0:
                 raise Exception(f"PTE at {hex(pte_address)} is not valid")
 
-            xwr = BitField.extract_bits(pte_value, attributes.common_attributes["xwr_bits"])
+            xwr = decoded_pte.xwr
             if (xwr & 0x3) == 0x2:
                 raise Exception(f"PTE at {hex(pte_address)} has R=0 and X=1")
 
-            a = 0
-            for ppn_id in range(len(attributes.get_attribute("pte_ppn_bits"))):
-                ppn_value = BitField.extract_bits(
-                    pte_value, attributes.get_attribute("pte_ppn_bits")[ppn_id]
-                )
-                a = BitField.place_bits(
-                    a, ppn_value, attributes.get_attribute("pa_ppn_bits")[ppn_id]
-                )
+            a = decoded_pte.pa
+
+            ptes.append(pte)
 
             if (xwr & 0x6) or (xwr & 0x1):
-                log.info(f"    {target_mmu} MMU: {stage} Stage: This is a Leaf PTE")
+                log.debug(f"    {target_mmu} MMU: {stage} Stage: This is a Leaf PTE")
                 break
             else:
-                if BitField.extract_bits(pte_value, attributes.common_attributes["a_bit"]) != 0:
-                    log.error("PTE has A=1 but is not a Leaf PTE")
-                    sys.exit(1)
-                elif BitField.extract_bits(pte_value, attributes.common_attributes["d_bit"]) != 0:
-                    raise Exception("PTE has D=1 but is not a Leaf PTE")
+                if decoded_pte.a != 0:
+                    raise Exception(f"PTE at {hex(pte_address)} has A=1 but is not a Leaf PTE")
+                elif decoded_pte.d != 0:
+                    raise Exception(f"PTE at {hex(pte_address)} has D=1 but is not a Leaf PTE")
+
+            pte["next_address"] = hex(a)
+            walk_cache[(target_mmu, stage, pte_address)] = pte
 
             current_level += 1
-            assert current_level < attributes.get_attribute("num_levels")
-            continue
+            assert current_level < pte_codec.num_levels
 
         dest_address = a
-        dest_address += BitField.extract_bits(
-            source_address, (attributes.get_attribute("va_vpn_bits")[current_level][1] - 1, 0)
-        )
+        dest_address += pte_codec.get_page_offset(source_address, current_level)
 
-        log.info(f"    {target_mmu} MMU: {stage} Stage: PTE value = {hex(pte_value)}")
-        log.info(
+        log.debug(
             f"{target_mmu} MMU: {stage} Stage: Translated {hex(source_address)} --> {hex(dest_address)}"
         )
 
-        return dest_address
+        return {
+            "target_mmu": target_mmu,
+            "stage": stage,
+            "translation_mode": translation_mode,
+            "source_address_type": TranslationStage.get_translates_from(stage),
+            "source_address": hex(source_address),
+            "dest_address_type": TranslationStage.get_translates_to(stage),
+            "dest_address": hex(dest_address),
+            "leaf_level": current_level,
+            "page_size": hex(1 << pte_codec.vpn_fields[current_level][0]),
+            "ptes": ptes,
+        }
+
+
+@functools.lru_cache
+def get_generator_version():
+    # Hash of the code that the generated sources depend on. Used to
+    # invalidate the cached sources whenever the generator changes.
+    source_files = [os.path.abspath(__file__)]
+    for package_name in [
+        "data_structures",
+        "memory_management",
+        "public",
+        "rivos_internal",
+        "utils",
+    ]:
+        package = sys.modules.get(package_name)
+        if package is None:
+            continue
+        for package_dir in package.__path__:
+            source_files.extend(
+                sorted(glob.glob(os.path.join(package_dir, "**", "*.py"), recursive=True))
+            )
+    return hash_files(source_files)
+
+
+def generate_diag_sources(
+    jumpstart_source_attributes_yaml,
+    diag_attributes_yaml,
+    override_diag_attributes,
+    priv_modes_enabled,
+    output_assembly_file=None,
+    output_linker_script=None,
+    output_defines_file=None,
+    output_data_structures_file=None,
+    cache=None,
+    profiler=None,
+):
+    # Returns the SourceGenerator or None if the outputs were restored from
+    # the cache.
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+
+    output_files = [
+        output_file
+        for output_file in [
+            output_linker_script,
+            output_assembly_file,
+            output_defines_file,
+            output_data_structures_file,
+        ]
+        if output_file is not None
+    ]
+    if output_assembly_file is not None:
+        output_files.append(SourceGenerator.get_binary_pagetables_file(output_assembly_file))
+
+    if cache is not None:
+        # The generated files only refer to each other relative to the
+        # directory they are generated in.
+        output_dir = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(output_file)) for output_file in output_files]
+        )
+
+        # DiagFactory overrides build_rng_seed with a new random seed for
+        # every diag it builds. The seed only ends up in the BUILD_RNG_SEED
+        # define so it is left out of the key and the define is rewritten
+        # in the restored defines file.
+        resolved_override_diag_attributes = DictUtils.create_dict(override_diag_attributes or [])
+        build_rng_seed = resolved_override_diag_attributes.get("build_rng_seed")
+        if isinstance(build_rng_seed, int):
+            resolved_override_diag_attributes["build_rng_seed"] = "overridden"
+        else:
+            build_rng_seed = None
+
+        cache_key = cache.get_key(
+            get_generator_version(),
+            [jumpstart_source_attributes_yaml, diag_attributes_yaml],
+            {
+                # The generated file headers name the generator and the
+                # diag attributes file.
+                "generator": os.path.basename(sys.argv[0]),
+                "diag_attributes_yaml": diag_attributes_yaml,
+                "override_diag_attributes": resolved_override_diag_attributes,
+                "priv_modes_enabled": priv_modes_enabled,
+            },
+            output_files,
+            output_dir,
+        )
+        with profiler.phase("restore_from_cache"):
+            restored = cache.restore(cache_key, output_dir)
+        if restored:
+            if build_rng_seed is not None and output_defines_file is not None:
+                set_build_rng_seed_define(output_defines_file, build_rng_seed)
+            log.debug(f"Restored the generated sources of {diag_attributes_yaml} from the cache")
+            return None
+
+    source_generator = SourceGenerator(
+        jumpstart_source_attributes_yaml,
+        diag_attributes_yaml,
+        override_diag_attributes,
+        priv_modes_enabled,
+        profiler,
+    )
+
+    if output_linker_script is not None:
+        with profiler.phase("generate_linker_script", output_linker_script):
+            source_generator.generate_linker_script(output_linker_script)
+    if output_assembly_file is not None:
+        with profiler.phase("generate_assembly_file", output_assembly_file):
+            source_generator.generate_assembly_file(output_assembly_file)
+    if output_defines_file is not None:
+        with profiler.phase("generate_defines_file", output_defines_file):
+            source_generator.generate_defines_file(output_defines_file)
+    if output_data_structures_file is not None:
+        with profiler.phase("generate_data_structures_file", output_data_structures_file):
+            source_generator.generate_data_structures_file(output_data_structures_file)
+
+    if cache is not None:
+        cache.store(cache_key, output_files, output_dir)
+
+    return source_generator
+
+
+def set_build_rng_seed_define(output_defines_file, build_rng_seed):
+    # Rewrites the BUILD_RNG_SEED define of a defines file restored from the
+    # cache, which has the seed of the build that generated it.
+    with open(output_defines_file) as f:
+        defines = f.read()
+    defines = re.sub(
+        r"^#define BUILD_RNG_SEED .*$",
+        lambda _: f"#define BUILD_RNG_SEED {hex(build_rng_seed)}",
+        defines,
+        count=1,
+        flags=re.MULTILINE,
+    )
+    write_file_atomically(output_defines_file, defines)
+
+
+def generate_runtime_sources(
+    jumpstart_source_attributes_yaml,
+    priv_modes_enabled,
+    output_runtime_defines_file=None,
+    output_data_structures_file=None,
+):
+    # Generates the defines and data structures that the parts of the
+    # JumpStart runtime that don't depend on the diag attributes are built
+    # with. They are the same for every diag built with the same source
+    # attributes and privilege modes.
+    source_generator = SourceGenerator(
+        jumpstart_source_attributes_yaml, None, None, priv_modes_enabled
+    )
+
+    if output_runtime_defines_file is not None:
+        source_generator.generate_runtime_defines_file(output_runtime_defines_file)
+    if output_data_structures_file is not None:
+        source_generator.generate_data_structures_file(output_data_structures_file)
+
+
+def get_profile_file_prefix(diag_attributes_yaml, output_dir):
+    # The profile is written next to the generated sources and named after
+    # the diag.
+    diag_name = os.path.basename(diag_attributes_yaml).split(".")[0]
+    return os.path.join(output_dir, f"{diag_name}.source_generation_profile")
+
+
+def generate_batch_entry(batch_entry, cache=None, profile=False, cprofile=False):
+    # Runs in a generate_diag_sources_for_batch() worker process. Errors are
+    # returned instead of raised so that one broken diag doesn't stop the
+    # rest of the batch. Returns (error, cache stats of this entry, profile).
+    hits, misses = (0, 0) if cache is None else (cache.hits, cache.misses)
+    profiler = PhaseProfiler(enabled=profile, cprofile=cprofile)
+    error = None
+    try:
+        generate_diag_sources(**batch_entry, cache=cache, profiler=profiler)
+    except (Exception, SystemExit) as exc:
+        log.debug(
+            f"Source generation failed for {batch_entry['diag_attributes_yaml']}", exc_info=True
+        )
+        error = f"{type(exc).__name__}: {exc}"
+
+    cache_stats = None
+    if cache is not None:
+        cache_stats = (cache.hits - hits, cache.misses - misses)
+
+    diag_profile = None
+    if profile is True:
+        profiler.write(
+            get_profile_file_prefix(
+                batch_entry["diag_attributes_yaml"],
+                os.path.dirname(os.path.abspath(batch_entry["output_assembly_file"])),
+            )
+        )
+        diag_profile = profiler.get_profile()
+
+    return error, cache_stats, diag_profile
+
+
+def load_all_jumpstart_source_attributes(jumpstart_source_attributes_yamls):
+    for jumpstart_source_attributes_yaml in jumpstart_source_attributes_yamls:
+        load_jumpstart_source_attributes(jumpstart_source_attributes_yaml)
+
+
+def generate_diag_sources_for_batch(
+    batch, num_processes, cache=None, profile=False, cprofile=False
+):
+    # Generates the sources of many diags with a pool of worker processes
+    # instead of one Python process per diag. batch maps each diag name to
+    # the keyword arguments of generate_diag_sources(). Returns a dict that
+    # maps the name of each diag whose generation failed to the error and,
+    # with profile set, a dict that maps each diag name to its profile.
+    # The hits and misses of the workers are added to the cache stats.
+    jumpstart_source_attributes_yamls = sorted(
+        {batch_entry["jumpstart_source_attributes_yaml"] for batch_entry in batch.values()}
+    )
+
+    # Workers forked from this process inherit the parsed attributes. The
+    # initializer parses them once per worker where workers are spawned.
+    load_all_jumpstart_source_attributes(jumpstart_source_attributes_yamls)
+
+    errors = {}
+    profiles = {}
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        initializer=load_all_jumpstart_source_attributes,
+        initargs=(jumpstart_source_attributes_yamls,),
+    ) as executor:
+        futures = {
+            diag_name: executor.submit(generate_batch_entry, batch_entry, cache, profile, cprofile)
+            for diag_name, batch_entry in batch.items()
+        }
+        for diag_name, future in futures.items():
+            error, cache_stats, diag_profile = future.result()
+            if error is not None:
+                errors[diag_name] = error
+            if diag_profile is not None:
+                profiles[diag_name] = diag_profile
+            if cache_stats is not None:
+                cache.hits += cache_stats[0]
+                cache.misses += cache_stats[1]
+
+    if cache is not None:
+        cache.evict()
+
+    return errors, profiles
+
+
+def read_addresses_file(addresses_file):
+    if addresses_file == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(addresses_file, "r") as file_descriptor:
+            lines = file_descriptor.readlines()
+
+    addresses = []
+    for line in lines:
+        addresses.extend(int(address, 0) for address in line.split("#", 1)[0].split())
+    return addresses
 
 
 def main():
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
-        "--diag_attributes_yaml", help="Diag Attributes YAML file", required=True, type=str
+        "--diag_attributes_yaml",
+        help="Diag Attributes YAML file. Only the JumpStart runtime files can be generated without it.",
+        required=False,
+        type=str,
     )
     parser.add_argument(
         "--override_diag_attributes",
@@ -1493,6 +2202,12 @@ def main():
         required=False,
         type=str,
     )
+    parser.add_argument(
+        "--output_runtime_defines_file",
+        help="Defines file to hold the defines that don't depend on the diag attributes. Used to build the JumpStart runtime library.",
+        required=False,
+        type=str,
+    )
     parser.add_argument(
         "--output_linker_script", help="Linker script to generate", required=False, type=str
     )
@@ -1502,48 +2217,199 @@ def main():
         required=False,
         type=str,
     )
+    parser.add_argument(
+        "--output_pagetables_listing_file",
+        help="File to write a human readable listing of the page table entries to.",
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--output_pagetables_map_file",
+        help="File to write the coalesced address ranges mapped by the generated page tables to.",
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--pagetables_map_format",
+        help="Format of the --output_pagetables_map_file file.",
+        required=False,
+        type=str,
+        default="json",
+        choices=["json", "csv"],
+    )
     parser.add_argument(
         "--translate",
-        help="Translate the address.",
+        help="Translate the addresses.",
         required=False,
+        nargs="+",
         type=lambda x: int(x, 0),
     )
+    parser.add_argument(
+        "--translate_addresses_file",
+        help="File with whitespace separated addresses to translate. Use - to read from stdin. Text after a # is ignored.",
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--output_translations_file",
+        help="JSON file to write the translations of the --translate and --translate_addresses_file addresses to. Use - to write to stdout.",
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--generated_sources_cache_dir",
+        help="Directory of the cache of generated sources. Sources are not cached if not specified.",
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--generated_sources_cache_max_size",
+        help="Maximum size of the cache of generated sources in MiB.",
+        required=False,
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Write the wall time and peak memory of each source generation phase and generated file to <diag>.source_generation_profile.json next to the generated files.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--profile_cprofile",
+        help="With --profile, also write cProfile stats to <diag>.source_generation_profile.cprofile.",
+        action="store_true",
+        default=False,
+    )
     parser.add_argument(
         "-v", "--verbose", help="Verbose output.", action="store_true", default=False
     )
     args = parser.parse_args()
 
     if args.verbose:
-        log.basicConfig(format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG)
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.DEBUG, force=True
+        )
     else:
-        log.basicConfig(format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO)
-
-    if os.path.exists(args.diag_attributes_yaml) is False:
-        raise Exception(f"Diag Attributes file {args.diag_attributes_yaml} not found")
+        log.basicConfig(
+            format="%(levelname)s: [%(threadName)s]: %(message)s", level=log.INFO, force=True
+        )
 
     if os.path.exists(args.jumpstart_source_attributes_yaml) is False:
         raise Exception(
             f"JumpStart Attributes file {args.jumpstart_source_attributes_yaml} not found"
         )
 
-    source_generator = SourceGenerator(
+    if args.diag_attributes_yaml is None:
+        diag_outputs = [
+            args.output_assembly_file,
+            args.output_linker_script,
+            args.output_defines_file,
+            args.output_pagetables_listing_file,
+            args.output_pagetables_map_file,
+            args.translate,
+            args.translate_addresses_file,
+        ]
+        if any(diag_output is not None for diag_output in diag_outputs):
+            raise Exception(
+                "--diag_attributes_yaml is required to generate anything other than the JumpStart runtime defines and data structures"
+            )
+
+        generate_runtime_sources(
+            args.jumpstart_source_attributes_yaml,
+            args.priv_modes_enabled,
+            output_runtime_defines_file=args.output_runtime_defines_file,
+            output_data_structures_file=args.output_data_structures_file,
+        )
+        return
+
+    if os.path.exists(args.diag_attributes_yaml) is False:
+        raise Exception(f"Diag Attributes file {args.diag_attributes_yaml} not found")
+
+    addresses_to_translate = []
+    if args.translate is not None:
+        addresses_to_translate.extend(args.translate)
+    if args.translate_addresses_file is not None:
+        addresses_to_translate.extend(read_addresses_file(args.translate_addresses_file))
+
+    profiler = PhaseProfiler(enabled=args.profile, cprofile=args.profile_cprofile)
+
+    # The page table listing, map and translations need the SourceGenerator
+    # so the cache is only used when just the sources are generated.
+    cache = None
+    if args.generated_sources_cache_dir is not None and (
+        args.output_pagetables_listing_file is None
+        and args.output_pagetables_map_file is None
+        and len(addresses_to_translate) == 0
+    ):
+        cache = GeneratedSourcesCache(
+            args.generated_sources_cache_dir, args.generated_sources_cache_max_size * 1024 * 1024
+        )
+
+    source_generator = generate_diag_sources(
         args.jumpstart_source_attributes_yaml,
         args.diag_attributes_yaml,
         args.override_diag_attributes,
         args.priv_modes_enabled,
+        output_assembly_file=args.output_assembly_file,
+        output_linker_script=args.output_linker_script,
+        output_defines_file=args.output_defines_file,
+        output_data_structures_file=args.output_data_structures_file,
+        cache=cache,
+        profiler=profiler,
     )
 
-    if args.output_linker_script is not None:
-        source_generator.generate_linker_script(args.output_linker_script)
-    if args.output_assembly_file is not None:
-        source_generator.generate_assembly_file(args.output_assembly_file)
-    if args.output_defines_file is not None:
-        source_generator.generate_defines_file(args.output_defines_file)
-    if args.output_data_structures_file is not None:
-        source_generator.generate_data_structures_file(args.output_data_structures_file)
+    if cache is not None:
+        cache.evict()
+        log.debug(f"Generated sources cache stats: {cache.get_stats()}")
 
-    if args.translate is not None:
-        source_generator.translate(args.translate)
+    if args.output_runtime_defines_file is not None:
+        generate_runtime_sources(
+            args.jumpstart_source_attributes_yaml,
+            args.priv_modes_enabled,
+            output_runtime_defines_file=args.output_runtime_defines_file,
+        )
+
+    if args.output_pagetables_listing_file is not None:
+        with profiler.phase(
+            "generate_page_tables_listing_file", args.output_pagetables_listing_file
+        ):
+            source_generator.generate_page_tables_listing_file(args.output_pagetables_listing_file)
+    if args.output_pagetables_map_file is not None:
+        with profiler.phase("generate_page_tables_map_file", args.output_pagetables_map_file):
+            source_generator.generate_page_tables_map_file(
+                args.output_pagetables_map_file, args.pagetables_map_format
+            )
+
+    if len(addresses_to_translate) > 0:
+        with profiler.phase("translate"):
+            translations = source_generator.translate(addresses_to_translate)
+        if args.output_translations_file == "-":
+            json.dump(translations, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        elif args.output_translations_file is not None:
+            with open(args.output_translations_file, "w") as file_descriptor:
+                json.dump(translations, file_descriptor, indent=2)
+                file_descriptor.write("\n")
+
+    if args.profile is True:
+        output_files = [
+            output_file
+            for output_file in [
+                args.output_assembly_file,
+                args.output_linker_script,
+                args.output_defines_file,
+                args.output_data_structures_file,
+                args.output_pagetables_listing_file,
+                args.output_pagetables_map_file,
+                args.output_translations_file,
+            ]
+            if output_file is not None and output_file != "-"
+        ]
+        output_dir = os.path.dirname(os.path.abspath(output_files[0])) if output_files else "."
+        profile_file_prefix = get_profile_file_prefix(args.diag_attributes_yaml, output_dir)
+        profiler.write(profile_file_prefix)
+        log.info(f"Wrote the source generation profile to {profile_file_prefix}.json")
 
 
 if __name__ == "__main__":
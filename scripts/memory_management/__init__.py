@@ -4,13 +4,17 @@
 
 # __init__.py
 
+from .free_range_allocator import FreeRangeAllocator
 from .linker_script import LinkerScript
+from .memory_map_index import AddressIntervals, MemoryMapIndex
 from .memory_mapping import MemoryMapping
 from .page_size import PageSize
 from .page_tables import (
     AddressType,
     PageTableAttributes,
     PageTables,
+    PteCodec,
+    TranslationContext,
     TranslationMode,
     TranslationStage,
 )
@@ -21,12 +25,17 @@ from .page_tables import (
 # the names in their public API using the __all__ attribute.
 
 __all__ = [
+    "AddressIntervals",
     "AddressType",
+    "FreeRangeAllocator",
     "LinkerScript",
     "PageSize",
+    "MemoryMapIndex",
     "MemoryMapping",
     "PageTables",
     "PageTableAttributes",
+    "PteCodec",
+    "TranslationContext",
     "TranslationMode",
     "TranslationStage",
 ]
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import bisect
+
+
+class FreeRangeAllocator:
+    # Tracks the used [start, end) ranges of an address space and places new
+    # ranges in the smallest free range that fits them (best fit).
+    #
+    # The free ranges are the gaps between the used ranges starting at
+    # start_address, and the unbounded range after the last used range.
+    # Addresses below start_address are never handed out. start_address
+    # defaults to the start of the lowest used range.
+    def __init__(self, used_ranges, start_address=None):
+        # Sorted, disjoint and non-adjacent used ranges.
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(used_ranges):
+            self.mark_used(start, end)
+
+        if start_address is None and len(self.starts) > 0:
+            start_address = self.starts[0]
+        self.start_address = start_address
+
+    def mark_used(self, start, end):
+        assert start < end
+
+        # Merge with all the used ranges that overlap or touch [start, end).
+        first_range_id = bisect.bisect_left(self.ends, start)
+        last_range_id = bisect.bisect_right(self.starts, end)
+        if first_range_id < last_range_id:
+            start = min(start, self.starts[first_range_id])
+            end = max(end, self.ends[last_range_id - 1])
+
+        self.starts[first_range_id:last_range_id] = [start]
+        self.ends[first_range_id:last_range_id] = [end]
+
+    def get_overlapping_range_end(self, start, end):
+        # Returns the end of the last used range that overlaps [start, end) or
+        # None if [start, end) is free.
+        last_range_id = bisect.bisect_left(self.starts, end) - 1
+        if last_range_id >= 0 and self.ends[last_range_id] > start:
+            return self.ends[last_range_id]
+        return None
+
+    def is_free(self, start, end):
+        return self.get_overlapping_range_end(start, end) is None
+
+    def get_free_ranges(self):
+        # Yields (start, end) for each free range in address order. The end of
+        # the last free range is None.
+        if self.start_address is None:
+            yield (0, None)
+            return
+
+        free_start = self.start_address
+        for start, end in zip(self.starts, self.ends):
+            if end <= free_start:
+                continue
+            if start > free_start:
+                yield (free_start, start)
+            free_start = end
+        yield (free_start, None)
+
+    def find_best_fit(self, size, alignment, min_address=None, max_address=None, also_free_in=None):
+        # Returns the lowest aligned address in the smallest free range that
+        # fits size bytes between min_address and max_address, or None. If
+        # also_free_in is another FreeRangeAllocator the range has to be free
+        # in it as well.
+        best_fit = None
+        for free_start, free_end in self.get_free_ranges():
+            if min_address is not None:
+                free_start = max(free_start, min_address)
+            if max_address is not None:
+                free_end = max_address if free_end is None else min(free_end, max_address)
+
+            address = free_start + (-free_start % alignment)
+            while free_end is None or address + size <= free_end:
+                overlapping_range_end = None
+                if also_free_in is not None:
+                    overlapping_range_end = also_free_in.get_overlapping_range_end(
+                        address, address + size
+                    )
+                if overlapping_range_end is None:
+                    break
+                address = overlapping_range_end + (-overlapping_range_end % alignment)
+            else:
+                continue
+
+            # Order by the size of the free range and then by address. The
+            # unbounded free range is only used when nothing else fits.
+            fit = (free_end is None, 0 if free_end is None else free_end - free_start, address)
+            if best_fit is None or fit < best_fit:
+                best_fit = fit
+
+        if best_fit is None:
+            return None
+        return best_fit[2]
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging as log
+import os
 import sys
 
 from .memory_mapping import MemoryMapping
@@ -68,7 +69,8 @@ class LinkerScriptSection:
             self.type = "(TYPE=SHT_PROGBITS)"
             self.padded = True
 
-        self.subsections = subsections
+        # Ordered set of the subsection names.
+        self.subsections = dict.fromkeys(subsections)
 
     def get_top_level_name(self):
         return self.top_level_name
@@ -92,7 +94,10 @@ class LinkerScriptSection:
         return self.type
 
     def get_subsections(self):
-        return self.subsections
+        return list(self.subsections)
+
+    def has_subsections(self, subsection_names):
+        return all(subsection in self.subsections for subsection in subsection_names)
 
     def is_padded(self):
         return self.padded
@@ -100,8 +105,7 @@ class LinkerScriptSection:
     def merge(self, other_section):
         # Add all the missing subsections from the other section to this section
         for subsection in other_section.get_subsections():
-            if subsection not in self.subsections:
-                self.subsections.append(subsection)
+            self.subsections.setdefault(subsection)
 
         if self.get_phys_start_address() > other_section.get_phys_start_address():
             self.phys_start_address = other_section.get_phys_start_address()
@@ -120,7 +124,9 @@ class LinkerScriptSection:
 
 
 class LinkerScript:
-    def __init__(self, entry_label, elf_address_range, mappings, attributes_file):
+    def __init__(
+        self, entry_label, elf_address_range, mappings, translation_context, attributes_file
+    ):
         self.entry_label = entry_label
         self.attributes_file = attributes_file
         self.elf_start_address, self.elf_end_address = elf_address_range
@@ -128,7 +134,7 @@ class LinkerScript:
         self.guard_sections = None
 
         mappings_with_linker_sections = []
-        for stage in TranslationStage.get_enabled_stages():
+        for stage in translation_context.get_enabled_stages():
             mappings_with_linker_sections.extend(
                 [
                     entry
@@ -138,6 +144,9 @@ class LinkerScript:
             )
 
         self.sections = []
+        # Maps each subsection name to the ordered set of sections that
+        # contain it.
+        self.sections_by_subsection = {}
         for entry in mappings_with_linker_sections:
             new_section = LinkerScriptSection(entry)
 
@@ -147,11 +156,15 @@ class LinkerScript:
 
             if len(existing_sections_with_matching_subsections) == 0:
                 self.sections.append(new_section)
+                self.add_to_subsection_index(new_section, new_section)
             elif len(existing_sections_with_matching_subsections) == 1:
                 log.debug(
                     f"Merging linker sections\n\t{existing_sections_with_matching_subsections[0]}\n\t{new_section}"
                 )
                 existing_sections_with_matching_subsections[0].merge(new_section)
+                self.add_to_subsection_index(
+                    existing_sections_with_matching_subsections[0], new_section
+                )
             else:
                 raise ValueError(
                     f"Section names in {new_section} are used in {len(existing_sections_with_matching_subsections)} other sections."
@@ -165,54 +178,38 @@ class LinkerScript:
         # immediately following it in the memory layout.
         # We will also need to generate the corresponding assembly code
         # for each guard section. Otherwise the linker will ignore the guard section.
+        # A guard section starts where the section before it ends so adding
+        # it right after that section keeps the list sorted and the overlap
+        # and ELF address range checks run in the same pass.
         self.guard_sections = []
-        for i in range(len(self.sections) - 1):
+        sections_with_guard_sections = []
+        for i in range(len(self.sections)):
+            self.add_checked_section(sections_with_guard_sections, self.sections[i])
+
             if (
-                self.sections[i].get_phys_end_address()
+                i < len(self.sections) - 1
+                and self.sections[i].get_phys_end_address()
                 < self.sections[i + 1].get_phys_start_address()
             ):
-                self.guard_sections.append(
-                    LinkerScriptSection(
-                        MemoryMapping(
-                            {
-                                "translation_stage": TranslationStage.get_enabled_stages()[
-                                    0
-                                ],  # any stage works. We just need a valid one.
-                                TranslationStage.get_translates_to(
-                                    TranslationStage.get_enabled_stages()[0]
-                                ): self.sections[i].get_phys_end_address(),
-                                "num_pages": 1,
-                                "page_size": PageSize.SIZE_4K,
-                                "linker_script_section": f".linker_guard_section_{len(self.guard_sections)}",
-                            }
-                        )
+                guard_section = LinkerScriptSection(
+                    MemoryMapping(
+                        {
+                            "translation_stage": translation_context.get_enabled_stages()[
+                                0
+                            ],  # any stage works. We just need a valid one.
+                            TranslationStage.get_translates_to(
+                                translation_context.get_enabled_stages()[0]
+                            ): self.sections[i].get_phys_end_address(),
+                            "num_pages": 1,
+                            "page_size": PageSize.SIZE_4K,
+                            "linker_script_section": f".linker_guard_section_{len(self.guard_sections)}",
+                        },
+                        translation_context,
                     )
                 )
-        self.sections.extend(self.guard_sections)
-        self.sections.sort(key=lambda x: x.get_phys_start_address())
-
-        # check for overlaps in the sections and that sections are within ELF address range
-        for i in range(len(self.sections)):
-            section_start = self.sections[i].get_phys_start_address()
-            section_end = section_start + self.sections[i].get_size()
-
-            # Check section is within allowed ELF address range if specified
-            if self.elf_start_address is not None or self.elf_end_address is not None:
-                if self.elf_start_address is not None and section_start < self.elf_start_address:
-                    raise ValueError(
-                        f"{self.sections[i]} is outside allowed ELF address range - start address {hex(section_start)} is less than elf_start_address {hex(self.elf_start_address)}"
-                    )
-                if self.elf_end_address is not None and section_end > self.elf_end_address:
-                    raise ValueError(
-                        f"{self.sections[i]} is outside allowed ELF address range - end address {hex(section_end)} is greater than elf_end_address {hex(self.elf_end_address)}"
-                    )
-
-            # Check for overlap with next section
-            if i < len(self.sections) - 1:
-                if section_end > self.sections[i + 1].get_phys_start_address():
-                    raise ValueError(
-                        f"Linker sections overlap:\n\t{self.sections[i]}\n\t{self.sections[i + 1]}"
-                    )
+                self.guard_sections.append(guard_section)
+                self.add_checked_section(sections_with_guard_sections, guard_section)
+        self.sections = sections_with_guard_sections
 
         self.program_headers = []
         for section in self.sections:
@@ -220,12 +217,43 @@ class LinkerScript:
 
         self.discard_sections = [".note", ".comment", ".eh_frame", ".eh_frame_hdr"]
 
+    def add_to_subsection_index(self, section, new_section):
+        for subsection in new_section.get_subsections():
+            self.sections_by_subsection.setdefault(subsection, {})[section] = None
+
     def find_sections_with_subsections(self, subsection_names):
-        matching_sections = []
-        for section in self.sections:
-            if set(subsection_names).issubset(set(section.get_subsections())):
-                matching_sections.append(section)
-        return matching_sections
+        # Only the sections that contain the first subsection can contain
+        # all of them.
+        return [
+            section
+            for section in self.sections_by_subsection.get(subsection_names[0], {})
+            if section.has_subsections(subsection_names)
+        ]
+
+    def add_checked_section(self, sorted_sections, section):
+        # Appends section to sorted_sections after checking that it is within
+        # the ELF address range and doesn't overlap the last section in
+        # sorted_sections.
+        section_start = section.get_phys_start_address()
+        section_end = section.get_phys_end_address()
+
+        # Check section is within allowed ELF address range if specified
+        if self.elf_start_address is not None and section_start < self.elf_start_address:
+            raise ValueError(
+                f"{section} is outside allowed ELF address range - start address {hex(section_start)} is less than elf_start_address {hex(self.elf_start_address)}"
+            )
+        if self.elf_end_address is not None and section_end > self.elf_end_address:
+            raise ValueError(
+                f"{section} is outside allowed ELF address range - end address {hex(section_end)} is greater than elf_end_address {hex(self.elf_end_address)}"
+            )
+
+        # Check for overlap with the previous section
+        if len(sorted_sections) > 0:
+            previous_section = sorted_sections[-1]
+            if previous_section.get_phys_end_address() > section_start:
+                raise ValueError(f"Linker sections overlap:\n\t{previous_section}\n\t{section}")
+
+        sorted_sections.append(section)
 
     def get_sections(self):
         return self.sections
@@ -245,63 +273,58 @@ class LinkerScript:
     def get_guard_sections(self):
         return self.guard_sections
 
-    def generate(self, output_linker_script):
-        file = open(output_linker_script, "w")
-        if file is None:
-            raise Exception(f"Unable to open {output_linker_script} for writing")
-
-        file.write(
-            f"/* This file is auto-generated by {sys.argv[0]} from {self.get_attributes_file()} */\n"
+    def generate(self):
+        # Yields the linker script in chunks for the caller to write out.
+        yield (
+            f"/* This file is auto-generated by {os.path.basename(sys.argv[0])} from {self.get_attributes_file()} */\n"
         )
-        file.write('OUTPUT_ARCH( "riscv" )\n')
-        file.write(f"ENTRY({self.get_entry_label()})\n\n")
+        yield 'OUTPUT_ARCH( "riscv" )\n'
+        yield f"ENTRY({self.get_entry_label()})\n\n"
 
         # Add MEMORY region definitions
-        file.write("MEMORY\n{\n")
+        yield "MEMORY\n{\n"
         for section in self.get_sections():
             memory_name = section.get_top_level_name().replace(".", "_").upper()
             start_addr = hex(section.get_virt_start_address())
             size = hex(section.get_size())
-            file.write(f"    {memory_name} (rwx) : ORIGIN = {start_addr}, LENGTH = {size}\n")
-        file.write("}\n\n")
+            yield f"    {memory_name} (rwx) : ORIGIN = {start_addr}, LENGTH = {size}\n"
+        yield "}\n\n"
 
-        file.write("SECTIONS\n{\n")
-        defined_sections = []
+        yield "SECTIONS\n{\n"
+        defined_sections = set()
 
         # The linker script lays out the diag in physical memory. The
         # mappings are already sorted by PA.
         for section in self.get_sections():
-            file.write(f"\n\n   /* {','.join(section.get_subsections())}:\n")
-            file.write(
+            yield f"\n\n   /* {','.join(section.get_subsections())}:\n"
+            yield (
                 f"       PA Range: {hex(section.get_phys_start_address())} - {hex(section.get_phys_end_address())}\n"
                 f"       VA Range: {hex(section.get_virt_start_address())} - {hex(section.get_virt_end_address())}\n"
             )
-            file.write("   */\n")
-            file.write(f"   . = {hex(section.get_virt_start_address())};\n")
+            yield "   */\n"
+            yield f"   . = {hex(section.get_virt_start_address())};\n"
 
             top_level_section_variable_name_prefix = (
                 section.get_top_level_name().replace(".", "_").upper()
             )
-            file.write(f"   {top_level_section_variable_name_prefix}_START = .;\n")
-            file.write(
+            yield f"   {top_level_section_variable_name_prefix}_START = .;\n"
+            yield (
                 f"   {section.get_top_level_name()} {section.get_type()} :  AT({hex(section.get_phys_start_address())}) {{\n"
             )
             for section_name in section.get_subsections():
                 assert section_name not in defined_sections
-                file.write(f"      *({section_name})\n")
-                defined_sections.append(section_name)
+                yield f"      *({section_name})\n"
+                defined_sections.add(section_name)
             if section.is_padded():
-                file.write("      BYTE(0)\n")
-            file.write(
+                yield "      BYTE(0)\n"
+            yield (
                 f"   }} > {top_level_section_variable_name_prefix} : {section.get_top_level_name()}\n"
             )
-            file.write(
-                f"   . = {hex(section.get_virt_start_address() + section.get_size() - 1)};\n"
-            )
-            file.write(f"  {top_level_section_variable_name_prefix}_END = .;\n")
+            yield f"   . = {hex(section.get_virt_start_address() + section.get_size() - 1)};\n"
+            yield f"  {top_level_section_variable_name_prefix}_END = .;\n"
 
-        file.write("\n\n/DISCARD/ : { *(" + " ".join(self.get_discard_sections()) + ") }\n")
-        file.write("\n}\n")
+        yield "\n\n/DISCARD/ : { *(" + " ".join(self.get_discard_sections()) + ") }\n"
+        yield "\n}\n"
 
         # Specify separate load segments in the program headers for the
         # different sections.
@@ -314,9 +337,7 @@ class LinkerScript:
         # Reference:
         # https://ftp.gnu.org/old-gnu/Manuals/ld-2.9.1/html_node/ld_23.html
         # https://rivosinc.slack.com/archives/C030C5A4BUZ/p1710366517457539
-        file.write("\nPHDRS\n{\n")
+        yield "\nPHDRS\n{\n"
         for program_header in self.get_program_headers():
-            file.write(f"  {program_header} PT_LOAD ;\n")
-        file.write("}\n")
-
-        file.close()
+            yield f"  {program_header} PT_LOAD ;\n"
+        yield "}\n"
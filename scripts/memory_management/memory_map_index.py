@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import bisect
+
+from .page_tables import AddressType, TranslationStage
+
+
+class AddressIntervals:
+    # Static interval index over the [start, end) address ranges of a list of
+    # mappings for one address type.
+    #
+    # The ranges are sorted by start address and max_ends[i] holds the
+    # index of the range with the largest end address among ranges[0..i].
+    # The ranges that start at or below an address are a prefix of the
+    # sorted list so overlap and containment queries are a binary search
+    # followed by a lookup in max_ends.
+    def __init__(self, address_type, mappings):
+        self.address_type = address_type
+
+        self.ranges = sorted(
+            (
+                (
+                    mapping.get_field(address_type),
+                    mapping.get_field(address_type)
+                    + mapping.get_field("page_size") * mapping.get_field("num_pages"),
+                    mapping,
+                )
+                for mapping in mappings
+                if mapping.get_field(address_type) is not None
+            ),
+            key=lambda x: x[0],
+        )
+        self.starts = [start for start, _, _ in self.ranges]
+
+        self.max_ends = []
+        for range_id, (_, end, _) in enumerate(self.ranges):
+            if len(self.max_ends) == 0 or end > self.ranges[self.max_ends[-1]][1]:
+                self.max_ends.append(range_id)
+            else:
+                self.max_ends.append(self.max_ends[-1])
+
+    def get_mappings(self):
+        # Returns the mappings sorted by start address.
+        return [mapping for _, _, mapping in self.ranges]
+
+    def find_overlapping_mapping(self, start, end):
+        # Returns a mapping that overlaps [start, end) or None.
+        last_range_id = bisect.bisect_left(self.starts, end) - 1
+        if last_range_id < 0:
+            return None
+
+        _, max_end, mapping = self.ranges[self.max_ends[last_range_id]]
+        if max_end > start:
+            return mapping
+        return None
+
+    def find_containing_mapping(self, start, end):
+        # Returns a mapping that fully contains [start, end) or None.
+        last_range_id = bisect.bisect_right(self.starts, start) - 1
+        if last_range_id < 0:
+            return None
+
+        _, max_end, mapping = self.ranges[self.max_ends[last_range_id]]
+        if max_end >= end:
+            return mapping
+        return None
+
+    def find_mapping_containing_address(self, address):
+        return self.find_containing_mapping(address, address + 1)
+
+    def find_overlapping_mappings(self):
+        # Returns the first pair of overlapping mappings or None. If any two
+        # ranges overlap then so do two ranges that are adjacent in start
+        # address order.
+        for (_, previous_end, previous_mapping), (start, _, mapping) in zip(
+            self.ranges, self.ranges[1:]
+        ):
+            if start < previous_end:
+                return (mapping, previous_mapping)
+        return None
+
+
+class MemoryMapIndex:
+    # Per stage and address type interval indices over one MMU's memory map.
+    # Alias mappings are kept in separate indices as their destination
+    # addresses are expected to overlap those of the non-alias mappings.
+    def __init__(self, memory_map):
+        self.intervals = {}
+        self.alias_intervals = {}
+        self.mappings_by_linker_script_section = {}
+
+        for stage, mappings in memory_map.items():
+            alias_mappings = [mapping for mapping in mappings if mapping.get_field("alias")]
+            non_alias_mappings = [mapping for mapping in mappings if not mapping.get_field("alias")]
+
+            for address_type in TranslationStage.get_address_types(stage):
+                assert AddressType.is_valid_address_type(address_type)
+                self.intervals[(stage, address_type)] = AddressIntervals(
+                    address_type, non_alias_mappings
+                )
+                self.alias_intervals[(stage, address_type)] = AddressIntervals(
+                    address_type, alias_mappings
+                )
+
+            for mapping in mappings:
+                linker_script_section = mapping.get_field("linker_script_section")
+                if linker_script_section is not None:
+                    # Keep the first mapping for a section, like a scan of
+                    # the memory map would.
+                    self.mappings_by_linker_script_section.setdefault(
+                        linker_script_section, mapping
+                    )
+
+    def get_intervals(self, stage, address_type, alias=False):
+        if alias is True:
+            return self.alias_intervals[(stage, address_type)]
+        return self.intervals[(stage, address_type)]
+
+    def find_mapping_by_linker_section(self, linker_script_section):
+        return self.mappings_by_linker_script_section.get(linker_script_section)
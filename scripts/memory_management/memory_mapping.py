@@ -2,8 +2,6 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-import copy
-
 from .page_size import PageSize
 from .page_tables import AddressType, TranslationStage
 
@@ -15,22 +13,30 @@ class TranslationStageNoAddressTypesError(ValueError):
 
 
 class MappingField:
+    # Describes a MemoryMapping field. A single instance of each field is
+    # shared by all the MemoryMapping objects, the values live in the
+    # MemoryMapping itself.
+    __slots__ = (
+        "name",
+        "field_type",
+        "input_yaml_type",
+        "allowed_values",
+        "default_value",
+        "required",
+    )
+
     def __init__(
         self, name, field_type, input_yaml_type, allowed_values, default_value, required
     ) -> None:
         self.name = name
         self.field_type = field_type
         self.input_yaml_type = input_yaml_type
-        self.allowed_values = allowed_values
+        self.allowed_values = tuple(allowed_values) if allowed_values is not None else None
         self.default_value = default_value
         self.required = required
-        self.value = default_value
 
     def __str__(self) -> str:
-        return f"MappingField(name={self.name}, value={self.value}, field_type={self.field_type}, input_yaml_type={self.input_yaml_type}, allowed_values={self.allowed_values}, default_value={self.default_value}, required={self.required})"
-
-    def get_value(self):
-        return self.value
+        return f"MappingField(name={self.name}, field_type={self.field_type}, input_yaml_type={self.input_yaml_type}, allowed_values={self.allowed_values}, default_value={self.default_value}, required={self.required})"
 
     def check_value(self, value):
         if self.allowed_values is not None:
@@ -43,42 +49,40 @@ class MappingField:
                     value in self.allowed_values
                 ), f"Invalid value for field {self.name}: {value}. Allowed values are: {self.allowed_values}"
 
-    def set_value_from_yaml(self, yaml_value):
+    def convert_from_yaml(self, yaml_value):
         assert isinstance(yaml_value, self.input_yaml_type)
 
         if self.input_yaml_type == self.field_type:
-            self.value = yaml_value
+            value = yaml_value
         elif self.input_yaml_type == str and self.field_type == int:
             if yaml_value.startswith("0x"):
-                self.value = int(yaml_value, 16)
+                value = int(yaml_value, 16)
             elif yaml_value.startswith("0b"):
-                self.value = int(yaml_value, 2)
+                value = int(yaml_value, 2)
             elif yaml_value.isnumeric():
-                self.value = int(yaml_value)
+                value = int(yaml_value)
             else:
                 raise ValueError(f"Invalid value for field {self.name}: {yaml_value}")
         else:
             raise ValueError(f"Unable to convert {yaml_value} to {self.field_type}")
 
-        self.check_value(self.value)
-
-    def set_value(self, value):
         self.check_value(value)
-        self.value = value
+        return value
 
 
 class MemoryMapping:
     supported_target_mmus = ["cpu"]
 
-    def __init__(self, mapping_dict, max_num_cpus_supported=None) -> None:
-        self.fields = {
-            "va": MappingField("va", int, int, None, None, False),
-            "gpa": MappingField("gpa", int, int, None, None, False),
-            "pa": MappingField("pa", int, int, None, None, False),
-            "spa": MappingField("spa", int, int, None, None, False),
-            "xwr": MappingField("xwr", int, str, [0, 1, 2, 3, 4, 5, 6, 7], None, False),
-            "umode": MappingField("umode", int, str, [0, 1], None, False),
-            "page_size": MappingField(
+    field_schema = {
+        field.name: field
+        for field in [
+            MappingField("va", int, int, None, None, False),
+            MappingField("gpa", int, int, None, None, False),
+            MappingField("pa", int, int, None, None, False),
+            MappingField("spa", int, int, None, None, False),
+            MappingField("xwr", int, str, [0, 1, 2, 3, 4, 5, 6, 7], None, False),
+            MappingField("umode", int, str, [0, 1], None, False),
+            MappingField(
                 "page_size",
                 int,
                 int,
@@ -86,39 +90,47 @@ class MemoryMapping:
                 None,
                 True,
             ),
-            "num_pages": MappingField("num_pages", int, int, None, None, False),
-            "num_pages_per_cpu": MappingField("num_pages_per_cpu", int, int, None, None, False),
-            "alias": MappingField("alias", bool, bool, None, False, False),
-            "pma_memory_type": MappingField(
-                "pma_memory_type", str, str, ["uc", "wc", "wb", None], "uc", False
-            ),
-            "pbmt_mode": MappingField("pbmt_mode", str, str, ["pma", "io", "nc"], "pma", False),
-            "linker_script_section": MappingField(
-                "linker_script_section", str, str, None, None, False
-            ),
-            "valid": MappingField("umode", int, str, [0, 1], 1, False),
-            "no_pte_allocation": MappingField("no_pte_allocation", bool, bool, None, None, False),
-            "translation_stage": MappingField(
+            MappingField("num_pages", int, int, None, None, False),
+            MappingField("num_pages_per_cpu", int, int, None, None, False),
+            MappingField("alias", bool, bool, None, False, False),
+            MappingField("pma_memory_type", str, str, ["uc", "wc", "wb", None], "uc", False),
+            MappingField("pbmt_mode", str, str, ["pma", "io", "nc"], "pma", False),
+            MappingField("linker_script_section", str, str, None, None, False),
+            MappingField("valid", int, str, [0, 1], 1, False),
+            MappingField("no_pte_allocation", bool, bool, None, None, False),
+            MappingField(
                 "translation_stage", str, str, list(TranslationStage.stages.keys()), None, False
             ),
-            "target_mmu": MappingField(
-                "target_mmu", list, list, self.supported_target_mmus, ["cpu"], False
-            ),
-            "alignment": MappingField("alignment", int, int, None, None, False),
-        }
-
-        assert set(self.fields.keys()).issuperset(
-            set(mapping_dict.keys())
-        ), f"Mapping contains invalid fields: {mapping_dict.keys()}. Only {self.fields.keys()} are allowed."
-
-        for field_name in self.fields.keys():
-            if field_name not in mapping_dict.keys():
-                if self.fields[field_name].required:
-                    raise ValueError(
-                        f"Field {field_name} is missing from the mapping: {mapping_dict}"
-                    )
-            else:
-                self.fields[field_name].set_value_from_yaml(mapping_dict[field_name])
+            MappingField("target_mmu", list, list, supported_target_mmus, ["cpu"], False),
+            MappingField("alignment", int, int, None, None, False),
+        ]
+    }
+    # Position of each field's value in MemoryMapping.values.
+    field_index = {field_name: index for index, field_name in enumerate(field_schema)}
+    default_values = tuple(field.default_value for field in field_schema.values())
+    required_field_names = [field.name for field in field_schema.values() if field.required]
+
+    __slots__ = ("values", "translation_context")
+
+    def __init__(self, mapping_dict, translation_context, max_num_cpus_supported=None) -> None:
+        self.translation_context = translation_context
+
+        assert (
+            self.field_index.keys() >= mapping_dict.keys()
+        ), f"Mapping contains invalid fields: {mapping_dict.keys()}. Only {self.field_index.keys()} are allowed."
+
+        for field_name in self.required_field_names:
+            if field_name not in mapping_dict:
+                raise ValueError(f"Field {field_name} is missing from the mapping: {mapping_dict}")
+
+        self.values = [
+            list(default_value) if isinstance(default_value, list) else default_value
+            for default_value in self.default_values
+        ]
+        for field_name, yaml_value in mapping_dict.items():
+            self.values[self.field_index[field_name]] = self.field_schema[
+                field_name
+            ].convert_from_yaml(yaml_value)
 
         if (
             mapping_dict.get("num_pages", None) is None
@@ -141,8 +153,8 @@ class MemoryMapping:
                 raise ValueError(
                     "max_num_cpus_supported cannot be None when num_pages_per_cpu is not None"
                 )
-            self.fields["num_pages"].set_value(
-                int(mapping_dict["num_pages_per_cpu"]) * max_num_cpus_supported
+            self.set_field(
+                "num_pages", int(mapping_dict["num_pages_per_cpu"]) * max_num_cpus_supported
             )
 
         # Alias mappings should have no pma_memory_type.
@@ -173,7 +185,7 @@ class MemoryMapping:
         if len(address_types) > 2:
             raise ValueError(f"Mapping has more than 2 address types set: {address_types}")
 
-        for stage in TranslationStage.get_enabled_stages():
+        for stage in self.translation_context.get_enabled_stages():
             if (
                 len(address_types) == 2
                 and TranslationStage.get_translates_from(stage) in address_types
@@ -204,7 +216,7 @@ class MemoryMapping:
                 continue
 
         raise ValueError(
-            f"Unable to assign translation stage from among valid stages {TranslationStage.get_enabled_stages()} to mapping based on source and destination address types: {self}"
+            f"Unable to assign translation stage from among valid stages {self.translation_context.get_enabled_stages()} to mapping based on source and destination address types: {self}"
         )
 
     def is_bare_mapping(self):
@@ -242,17 +254,19 @@ class MemoryMapping:
         disallowed_address_types = AddressType.get_all_address_types()
         disallowed_address_types.remove(destination_address_type)
         if (
-            TranslationStage.get_selected_mode_for_stage(self.get_field("translation_stage"))
+            self.translation_context.get_selected_mode_for_stage(
+                self.get_field("translation_stage")
+            )
             != "bare"
         ):
             # Only non-bare mappings can have source address type set.
             disallowed_address_types.remove(source_address_type)
 
         for address_type in disallowed_address_types:
-            assert address_type in self.fields.keys()
+            assert address_type in self.field_index
             if self.get_field(address_type) is not None:
                 raise ValueError(
-                    f"Address type '{address_type}' invalid for translation stage '{self.get_field('translation_stage')}' with translation mode '{TranslationStage.get_selected_mode_for_stage(self.get_field('translation_stage'))}' in mapping:\n{self}\n\n"
+                    f"Address type '{address_type}' invalid for translation stage '{self.get_field('translation_stage')}' with translation mode '{self.translation_context.get_selected_mode_for_stage(self.get_field('translation_stage'))}' in mapping:\n{self}\n\n"
                 )
 
         # Make sure that there are only 2 address types set for this mapping.
@@ -300,17 +314,15 @@ class MemoryMapping:
         self._validate_canonical_addresses()
 
     def get_field(self, field_name):
-        assert field_name in self.fields.keys()
-        return self.fields[field_name].get_value()
+        return self.values[self.field_index[field_name]]
 
     def set_field(self, field_name, value):
-        assert field_name in self.fields.keys()
-        self.fields[field_name].set_value(value)
+        self.field_schema[field_name].check_value(value)
+        self.values[self.field_index[field_name]] = value
 
     def __str__(self) -> str:
         print_string = "MemoryMapping("
-        for field_name, field in self.fields.items():
-            field_value = field.get_value()
+        for field_name, field_value in zip(self.field_schema, self.values):
             if isinstance(field_value, int):
                 field_value = f"{hex(field_value)}"
             print_string += f"{field_name}={field_value}, "
@@ -319,7 +331,21 @@ class MemoryMapping:
         return print_string
 
     def copy(self):
-        return copy.deepcopy(self)
+        # The only mutable values are the target_mmu lists so a shallow copy
+        # of the values that copies the lists is enough.
+        mapping = MemoryMapping.__new__(MemoryMapping)
+        mapping.translation_context = self.translation_context
+        mapping.values = [
+            list(value) if isinstance(value, list) else value for value in self.values
+        ]
+        return mapping
+
+    def replace(self, **changes):
+        # Returns a copy of the mapping with the given fields changed.
+        mapping = self.copy()
+        for field_name, value in changes.items():
+            mapping.set_field(field_name, value)
+        return mapping
 
     def _validate_canonical_addresses(self):
         """
@@ -330,7 +356,7 @@ class MemoryMapping:
         if translation_stage is None:
             return
 
-        translation_mode = TranslationStage.get_selected_mode_for_stage(translation_stage)
+        translation_mode = self.translation_context.get_selected_mode_for_stage(translation_stage)
         if translation_mode == "bare":
             return
 
@@ -2,17 +2,31 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import array
+import bisect
 import copy
 import enum
+import functools
 import logging as log
 import math
+import sys
 import typing
 
-from data_structures import BitField
-
 from .page_size import PageSize
 
 
+@functools.lru_cache(maxsize=None)
+def get_numpy():
+    # numpy is optional. Without it the leaf PTEs are encoded in pure Python.
+    # It is only imported once a mapping is large enough to be encoded with
+    # it as importing it slows down the start of every generator run.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
 class PbmtMode:
     @enum.unique
     class Encoding(enum.IntEnum):
@@ -72,12 +86,12 @@ class AddressType:
 
 
 class TranslationStage:
-    virtualization_enabled = None
-
+    # Static description of the translation stages. The translation state of
+    # a diag (whether virtualization is enabled and the mode selected for
+    # each stage) lives in a TranslationContext.
     stages = {
         "s": {
             "valid_modes": ["bare", "sv39", "sv48"],
-            "selected_mode": None,
             "translates": ["va", "pa"],
             "virtualization_enabled": False,
             "next_stage": None,
@@ -85,7 +99,6 @@ class TranslationStage:
         },
         "hs": {
             "valid_modes": ["bare", "sv39", "sv48"],
-            "selected_mode": None,
             "translates": ["va", "pa"],
             "virtualization_enabled": True,
             "next_stage": None,
@@ -93,7 +106,6 @@ class TranslationStage:
         },
         "vs": {
             "valid_modes": ["bare", "sv39", "sv48"],
-            "selected_mode": None,
             "translates": ["va", "gpa"],
             "virtualization_enabled": True,
             "next_stage": "g",
@@ -101,7 +113,6 @@ class TranslationStage:
         },
         "g": {
             "valid_modes": ["bare", "sv39x4", "sv48x4"],
-            "selected_mode": None,
             "translates": ["gpa", "spa"],
             "virtualization_enabled": True,
             "next_stage": None,
@@ -110,38 +121,35 @@ class TranslationStage:
     }
 
     @classmethod
-    def set_virtualization_enabled(cls, value):
-        cls.virtualization_enabled = value
+    def is_valid_stage(cls, stage: str) -> bool:
+        return stage in cls.stages
 
     @classmethod
-    def is_valid_stage(cls, stage: str) -> bool:
-        return (
-            stage in cls.stages
-            and cls.stages[stage]["virtualization_enabled"] == cls.virtualization_enabled
-        )
+    def check_stage(cls, stage: str):
+        if not cls.is_valid_stage(stage):
+            raise ValueError(f"Invalid TranslationStage: {stage}")
+
+    @classmethod
+    def get_stages(cls, virtualization_enabled: bool):
+        return [
+            stage
+            for stage in cls.stages
+            if cls.stages[stage]["virtualization_enabled"] == virtualization_enabled
+        ]
 
     @classmethod
     def is_final_stage(cls, stage: str) -> bool:
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+        cls.check_stage(stage)
         return cls.stages[stage]["next_stage"] is None
 
     @classmethod
     def get_next_stage(cls, stage: str) -> str:
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+        cls.check_stage(stage)
         return cls.stages[stage]["next_stage"]
 
     @classmethod
     def is_valid_mode_for_stage(cls, stage: str, mode: str) -> bool:
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+        cls.check_stage(stage)
 
         if TranslationMode.is_valid_mode(mode) is False:
             raise ValueError(f"Invalid TranslationMode: {mode}")
@@ -149,75 +157,65 @@ class TranslationStage:
         return mode in cls.stages[stage]["valid_modes"]
 
     @classmethod
-    def set_selected_mode_for_stage(cls, stage: str, mode: str):
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
-
-        if TranslationMode.is_valid_mode(mode) is False:
-            raise ValueError(f"Invalid TranslationMode: {mode}")
+    def get_address_types(cls, stage: str):
+        cls.check_stage(stage)
+        return set(cls.stages[stage]["translates"])
 
-        if not TranslationStage.is_valid_mode_for_stage(stage, mode):
-            raise ValueError(f"Invalid TranslationMode: {mode} for TranslationStage: {stage}")
+    @classmethod
+    def get_translates_from(cls, stage: str):
+        cls.check_stage(stage)
+        return cls.stages[stage]["translates"][0]
 
-        cls.stages[stage]["selected_mode"] = mode
+    @classmethod
+    def get_translates_to(cls, stage: str):
+        cls.check_stage(stage)
+        return cls.stages[stage]["translates"][1]
 
     @classmethod
-    def get_selected_mode_for_stage(cls, stage: str):
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+    def get_atp_register(cls, stage: str):
+        cls.check_stage(stage)
+        return cls.stages[stage]["atp_register"]
 
-        if cls.stages[stage]["selected_mode"] is None:
-            raise ValueError(f"TranslationMode not set for TranslationStage: {stage}")
 
-        return cls.stages[stage]["selected_mode"]
+class TranslationContext:
+    # The translation state of one diag: whether virtualization is enabled
+    # and the translation mode selected for each of the stages enabled by
+    # it. The state is fixed at construction so a context can be shared by
+    # threads, and diags with different translation settings can be
+    # generated in the same process with a context each.
+    def __init__(self, virtualization_enabled: bool, selected_modes: typing.Dict[str, str]):
+        self.virtualization_enabled = virtualization_enabled
+        self.enabled_stages = tuple(TranslationStage.get_stages(virtualization_enabled))
 
-    @classmethod
-    def get_address_types(cls, stage: str):
-        if not cls.is_valid_stage(stage):
+        if selected_modes.keys() != set(self.enabled_stages):
             raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
+                f"Translation modes given for stages {list(selected_modes.keys())} but the enabled stages with virtualization enabled: {virtualization_enabled} are {list(self.enabled_stages)}"
             )
 
-        return set(cls.stages[stage]["translates"])
+        for stage, mode in selected_modes.items():
+            if not TranslationStage.is_valid_mode_for_stage(stage, mode):
+                raise ValueError(f"Invalid TranslationMode: {mode} for TranslationStage: {stage}")
+        self.selected_modes = dict(selected_modes)
 
-    @classmethod
-    def get_translates_from(cls, stage: str):
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+    def __str__(self) -> str:
+        return f"TranslationContext(virtualization_enabled={self.virtualization_enabled}, selected_modes={self.selected_modes})"
 
-        return cls.stages[stage]["translates"][0]
+    def is_virtualization_enabled(self) -> bool:
+        return self.virtualization_enabled
 
-    @classmethod
-    def get_translates_to(cls, stage: str):
-        if not cls.is_valid_stage(stage):
-            raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
-            )
+    def is_enabled_stage(self, stage: str) -> bool:
+        return stage in self.selected_modes
 
-        return cls.stages[stage]["translates"][1]
+    def get_enabled_stages(self):
+        return list(self.enabled_stages)
 
-    @classmethod
-    def get_enabled_stages(cls):
-        return [
-            stage
-            for stage in cls.stages
-            if cls.stages[stage]["virtualization_enabled"] == cls.virtualization_enabled
-        ]
-
-    @classmethod
-    def get_atp_register(cls, stage: str):
-        if not cls.is_valid_stage(stage):
+    def get_selected_mode_for_stage(self, stage: str):
+        if not self.is_enabled_stage(stage):
             raise ValueError(
-                f"Invalid TranslationStage: {stage} with virtualization enabled: {cls.virtualization_enabled}"
+                f"Invalid TranslationStage: {stage} with virtualization enabled: {self.virtualization_enabled}"
             )
 
-        return cls.stages[stage]["atp_register"]
+        return self.selected_modes[stage]
 
 
 class PageTableAttributes:
@@ -296,6 +294,133 @@ class PageTableAttributes:
         return self.mode_attributes[self.mode][attribute]
 
 
+class PteCodec:
+    # Encodes and decodes whole PTEs for a translation mode. The shifts and
+    # masks are computed once from the PageTableAttributes bit ranges so
+    # encoding a PTE is a handful of integer operations.
+    codecs: typing.Dict[str, "PteCodec"] = {}
+
+    class DecodedPte(typing.NamedTuple):
+        valid: int
+        xwr: int
+        umode: int
+        a: int
+        d: int
+        pbmt: int
+        pa: int
+
+    @classmethod
+    def get_codec(cls, mode):
+        codec = cls.codecs.get(mode)
+        if codec is None:
+            # Threads that race here build identical codecs and setdefault
+            # makes them all use the first one stored.
+            codec = cls.codecs.setdefault(mode, cls(mode))
+        return codec
+
+    @staticmethod
+    def get_shift_and_mask(bit_range):
+        msb, lsb = bit_range
+        return (lsb, (1 << (msb - lsb + 1)) - 1)
+
+    def __init__(self, mode):
+        self.mode = mode
+        attributes = PageTableAttributes(mode)
+
+        self.pte_size_in_bytes = attributes.get_attribute("pte_size_in_bytes")
+        self.num_levels = attributes.get_attribute("num_levels")
+
+        self.valid_shift, self.valid_mask = self.get_shift_and_mask(
+            attributes.get_attribute("valid_bit")
+        )
+        self.xwr_shift, self.xwr_mask = self.get_shift_and_mask(
+            attributes.get_attribute("xwr_bits")
+        )
+        self.umode_shift, self.umode_mask = self.get_shift_and_mask(
+            attributes.get_attribute("umode_bit")
+        )
+        self.a_shift, self.a_mask = self.get_shift_and_mask(attributes.get_attribute("a_bit"))
+        self.d_shift, self.d_mask = self.get_shift_and_mask(attributes.get_attribute("d_bit"))
+        self.pbmt_shift, self.pbmt_mask = self.get_shift_and_mask(
+            attributes.get_attribute("pbmt_bits")
+        )
+
+        # (pa_shift, pte_shift, mask) per PPN field. Fields that are adjacent
+        # in both the PA and the PTE are merged so the usual layout, where
+        # PPN[*] is one contiguous run in both, is moved in a single step.
+        self.ppn_fields = []
+        for pa_ppn_bits, pte_ppn_bits in sorted(
+            zip(attributes.get_attribute("pa_ppn_bits"), attributes.get_attribute("pte_ppn_bits")),
+            key=lambda ppn_bits: ppn_bits[0][1],
+        ):
+            pa_shift, mask = self.get_shift_and_mask(pa_ppn_bits)
+            pte_shift = pte_ppn_bits[1]
+            assert mask == self.get_shift_and_mask(pte_ppn_bits)[1]
+            if len(self.ppn_fields) > 0:
+                last_pa_shift, last_pte_shift, last_mask = self.ppn_fields[-1]
+                last_width = last_mask.bit_length()
+                if (
+                    pa_shift == last_pa_shift + last_width
+                    and pte_shift == last_pte_shift + last_width
+                ):
+                    self.ppn_fields[-1] = (
+                        last_pa_shift,
+                        last_pte_shift,
+                        (mask << last_width) | last_mask,
+                    )
+                    continue
+            self.ppn_fields.append((pa_shift, pte_shift, mask))
+
+        # (shift, mask) of the VPN field of each level.
+        self.vpn_fields = [
+            self.get_shift_and_mask(vpn_bits)
+            for vpn_bits in attributes.get_attribute("va_vpn_bits")
+        ]
+
+    def encode_ppn(self, pa):
+        pte_value = 0
+        for pa_shift, pte_shift, mask in self.ppn_fields:
+            pte_value |= ((pa >> pa_shift) & mask) << pte_shift
+        return pte_value
+
+    def decode_ppn(self, pte_value):
+        pa = 0
+        for pa_shift, pte_shift, mask in self.ppn_fields:
+            pa |= ((pte_value >> pte_shift) & mask) << pa_shift
+        return pa
+
+    def encode(self, valid=1, xwr=0, umode=0, a=0, d=0, pbmt=0, pa=0):
+        return (
+            ((valid & self.valid_mask) << self.valid_shift)
+            | ((xwr & self.xwr_mask) << self.xwr_shift)
+            | ((umode & self.umode_mask) << self.umode_shift)
+            | ((a & self.a_mask) << self.a_shift)
+            | ((d & self.d_mask) << self.d_shift)
+            | ((pbmt & self.pbmt_mask) << self.pbmt_shift)
+            | self.encode_ppn(pa)
+        )
+
+    def decode(self, pte_value):
+        return self.DecodedPte(
+            valid=(pte_value >> self.valid_shift) & self.valid_mask,
+            xwr=(pte_value >> self.xwr_shift) & self.xwr_mask,
+            umode=(pte_value >> self.umode_shift) & self.umode_mask,
+            a=(pte_value >> self.a_shift) & self.a_mask,
+            d=(pte_value >> self.d_shift) & self.d_mask,
+            pbmt=(pte_value >> self.pbmt_shift) & self.pbmt_mask,
+            pa=self.decode_ppn(pte_value),
+        )
+
+    def get_vpn(self, va, level):
+        shift, mask = self.vpn_fields[level]
+        return (va >> shift) & mask
+
+    def get_page_offset(self, va, level):
+        # The bits of the VA below VPN[level] which are passed through
+        # untranslated by a leaf PTE at that level.
+        return va & ((1 << self.vpn_fields[level][0]) - 1)
+
+
 class PageTablePage:
     def __init__(self, page_pa, va, page_size, translation_mode, level):
         self.level = level
@@ -318,6 +443,16 @@ class PageTablePage:
         assert start_va == (math.floor(va / va_range_in_bytes)) * va_range_in_bytes
         self.start_va = start_va
 
+        # The PTEs in this page and whether each of them has been written.
+        # Unwritten PTEs read as None and are skipped when emitting the page.
+        self.pte_size_in_bytes = PageTableAttributes.mode_attributes[translation_mode][
+            "pte_size_in_bytes"
+        ]
+        num_ptes = self.page_size // self.pte_size_in_bytes
+        self.ptes = array.array("Q", bytes(self.page_size))
+        assert self.ptes.itemsize == self.pte_size_in_bytes
+        self.pte_written = bytearray(num_ptes)
+
     def __str__(self):
         return f"PageTablePage: page_pa={hex(self.page_pa)}, start_va={hex(self.start_va)}, page_size={hex(self.page_size)}, level={hex(self.level)}, range_in_bytes={hex(self.range_in_bytes)}"
 
@@ -337,11 +472,64 @@ class PageTablePage:
     def get_size(self):
         return self.page_size
 
+    def contains_address(self, address):
+        return self.page_pa <= address < (self.page_pa + self.page_size)
+
+    def get_pte_index(self, address):
+        assert self.contains_address(address)
+        assert (address % self.pte_size_in_bytes) == 0
+        return (address - self.page_pa) // self.pte_size_in_bytes
+
+    def read_pte(self, address):
+        pte_index = self.get_pte_index(address)
+        if self.pte_written[pte_index] == 0:
+            return None
+        return self.ptes[pte_index]
+
+    def write_pte(self, address, value):
+        pte_index = self.get_pte_index(address)
+        self.ptes[pte_index] = value
+        self.pte_written[pte_index] = 1
+
+    def has_written_ptes(self, start_address, num_ptes):
+        start_index = self.get_pte_index(start_address)
+        return any(self.pte_written[start_index : start_index + num_ptes])
+
+    def write_ptes(self, start_address, values):
+        # values is an array("Q") of PTEs to write starting at start_address.
+        start_index = self.get_pte_index(start_address)
+        end_index = start_index + len(values)
+        assert end_index <= len(self.ptes)
+        self.ptes[start_index:end_index] = values
+        self.pte_written[start_index:end_index] = b"\x01" * len(values)
+
+    def get_ptes(self):
+        # Yields (address, value) for the written PTEs in address order.
+        for pte_index in range(len(self.ptes)):
+            if self.pte_written[pte_index]:
+                yield (self.page_pa + pte_index * self.pte_size_in_bytes, self.ptes[pte_index])
+
 
 class PageTables:
-    def __init__(self, translation_mode, max_num_4K_pages, memory_mappings):
-        # List of PageTablePage objects
+    # Mappings with fewer pages than this are encoded in pure Python as the
+    # numpy setup cost outweighs the per-PTE savings.
+    min_num_pages_for_vectorized_encoding = 64
+
+    def __init__(
+        self, translation_mode, max_num_4K_pages, memory_mappings, enable_superpage_promotion=False
+    ):
+        self.enable_superpage_promotion = enable_superpage_promotion
+        # List of PageTablePage objects in allocation order.
         self.pages = []
+        # Index of the PageTablePage objects keyed by
+        # (level, va >> range_shift) so that lookups don't have to scan
+        # self.pages.
+        self.pages_index = {}
+        # Running total of the size of all the allocated PageTablePages.
+        self.current_size = 0
+        # Index of the PageTablePage objects keyed by the 4K frame number of
+        # each 4K frame they occupy. Used to find the page a PTE lives in.
+        self.pages_by_frame = {}
         self.translation_mode = translation_mode
         self.mappings = memory_mappings
         self.translation_stage = self.mappings[0].get_field("translation_stage")
@@ -349,8 +537,11 @@ class PageTables:
 
         self.asm_label = f"{self.translation_stage}_stage_pagetables_start"
         self.attributes = PageTableAttributes(self.translation_mode)
+        self.pte_codec = PteCodec.get_codec(self.translation_mode)
 
-        self.pte_memory = {}
+        # A PageTablePage at a given level covers the VA range selected by
+        # the bits above the msb of that level's VPN.
+        self.page_range_shifts = [vpn_bits[0] + 1 for vpn_bits in self.get_attribute("va_vpn_bits")]
 
         self.start_address = None
         for mapping in self.mappings:
@@ -375,11 +566,34 @@ class PageTables:
     def get_attribute(self, attribute):
         return self.attributes.get_attribute(attribute)
 
+    def get_ptes(self):
+        # Yields (address, value) for all the written PTEs in address order.
+        # The pages are allocated at increasing addresses so no sorting is
+        # needed.
+        for page in self.pages:
+            yield from page.get_ptes()
+
+    def get_pte_region_as_bytes(self):
+        # Returns the contents of the pagetable pages as little-endian bytes.
+        # Unwritten PTEs are 0.
+        pte_region = array.array("Q")
+        for page in self.pages:
+            pte_region.extend(page.ptes)
+        if sys.byteorder != "little":
+            pte_region.byteswap()
+        return pte_region.tobytes()
+
     def get_pte_addresses(self):
-        return self.pte_memory.keys()
+        return [address for address, _ in self.get_ptes()]
 
     def get_pte(self, address):
-        return self.pte_memory[address]
+        pte_value = self.read_sparse_memory(address)
+        if pte_value is None:
+            raise KeyError(f"No PTE written at {hex(address)}")
+        return pte_value
+
+    def get_page_containing_address(self, address):
+        return self.pages_by_frame.get(address // PageSize.SIZE_4K)
 
     def get_new_page(self, va, level):
         log.debug(f"get_page_table_page({hex(va)}, {level})")
@@ -389,10 +603,12 @@ class PageTables:
         va_mask = self.attributes.get_attribute("va_mask")
         va = va & va_mask
         # look for an existing pagetable page that contains the given VA
-        for page in self.pages:
-            if page.contains(va, level):
-                log.debug(f"Found existing pagetable page {page}")
-                return page
+        page_key = (level, va >> self.page_range_shifts[level])
+        page = self.pages_index.get(page_key)
+        if page is not None:
+            assert page.contains(va, level)
+            log.debug(f"Found existing pagetable page {page}")
+            return page
 
         # else allocate a new page
         log.debug(f"Allocating new pagetable page for VA {hex(va)} at level {level}")
@@ -414,6 +630,12 @@ class PageTables:
         )
 
         self.pages.append(new_page)
+        self.pages_index[page_key] = new_page
+        for frame_offset in range(0, new_page_size, PageSize.SIZE_4K):
+            self.pages_by_frame[(new_page.get_page_pa() + frame_offset) // PageSize.SIZE_4K] = (
+                new_page
+            )
+        self.current_size += new_page_size
 
         assert self.get_current_size() <= self.get_max_size()
 
@@ -424,150 +646,336 @@ class PageTables:
         return self.max_num_4K_pages * PageSize.SIZE_4K
 
     def get_current_size(self):
-        return sum(page.get_size() for page in self.pages)
+        return self.current_size
 
     def get_start_address(self):
         return self.start_address
 
-    def split_mappings_at_page_granularity(self, memory_mappings):
-        split_mappings = []
-        source_address_type = TranslationStage.get_translates_from(self.translation_stage)
-        dest_address_type = TranslationStage.get_translates_to(self.translation_stage)
-        for entry in memory_mappings:
-            va = entry.get_field(source_address_type)
-            pa = entry.get_field(dest_address_type)
-            for _ in range(entry.get_field("num_pages")):
-                new_entry = entry.copy()
-                new_entry.set_field(source_address_type, va)
-                new_entry.set_field(dest_address_type, pa)
-                new_entry.set_field("num_pages", 1)
-                split_mappings.append(new_entry)
-
-                va += entry.get_field("page_size")
-                pa += entry.get_field("page_size")
-
-        return split_mappings
-
     def write_sparse_memory(self, address, value):
         assert (address % self.get_attribute("pte_size_in_bytes")) == 0
 
-        if address in self.pte_memory:
-            if self.pte_memory[address] != value:
+        page = self.get_page_containing_address(address)
+        assert page is not None, f"[{hex(address)}] is not in an allocated pagetable page"
+
+        current_value = page.read_pte(address)
+        if current_value is not None:
+            if current_value != value:
                 raise Exception(
-                    f"[{hex(address)}] already contains a different value {hex(self.pte_memory[address])}. Cannot update to {hex(value)}"
+                    f"[{hex(address)}] already contains a different value {hex(current_value)}. Cannot update to {hex(value)}"
                 )
             log.debug(f"[{hex(address)}] already contains {hex(value)}. No update needed.")
         else:
-            self.pte_memory[address] = value
+            page.write_pte(address, value)
             log.debug(f"[{hex(address)}] = {hex(value)}")
 
+    def write_sparse_memory_run(self, start_address, values):
+        # Writes the array("Q") of values to consecutive PTEs starting at
+        # start_address. The PTEs have to be in the same pagetable page.
+        assert (start_address % self.get_attribute("pte_size_in_bytes")) == 0
+
+        page = self.get_page_containing_address(start_address)
+        assert page is not None, f"[{hex(start_address)}] is not in an allocated pagetable page"
+
+        if not page.has_written_ptes(start_address, len(values)):
+            page.write_ptes(start_address, values)
+            log.debug(f"[{hex(start_address)}] = {len(values)} PTEs")
+            return
+
+        # Fall back to writing the PTEs one at a time so that conflicting
+        # writes are reported.
+        pte_size_in_bytes = self.get_attribute("pte_size_in_bytes")
+        for pte_id, value in enumerate(values):
+            self.write_sparse_memory(start_address + pte_id * pte_size_in_bytes, value)
+
     def read_sparse_memory(self, address):
         assert (address % self.get_attribute("pte_size_in_bytes")) == 0
 
-        if address in self.pte_memory:
-            return self.pte_memory[address]
-        return None
+        page = self.get_page_containing_address(address)
+        if page is None:
+            return None
+        return page.read_pte(address)
+
+    def get_num_ptes_in_page(self, level):
+        vpn_bits = self.get_attribute("va_vpn_bits")[level]
+        return 1 << (vpn_bits[0] - vpn_bits[1] + 1)
+
+    def place_ppn(self, pte_value, address):
+        return pte_value | self.pte_codec.encode_ppn(address)
+
+    def get_pte_address(self, pagetable_page, va, level):
+        pte_address = pagetable_page.get_page_pa() + self.pte_codec.get_vpn(
+            va, level
+        ) * self.get_attribute("pte_size_in_bytes")
+        assert pte_address < (pagetable_page.get_page_pa() + pagetable_page.get_size())
+        return pte_address
+
+    def get_leaf_pte_value_without_ppn(self, entry):
+        # All the leaf PTEs of a mapping share everything but the PPN.
+        xwr_bits = entry.get_field("xwr")
+        assert xwr_bits != 0x2 and xwr_bits != 0x6
+
+        umode = entry.get_field("umode")
+
+        return self.pte_codec.encode(
+            valid=entry.get_field("valid"),
+            xwr=xwr_bits,
+            umode=umode if umode is not None else 0,
+            a=1,
+            d=1,
+            pbmt=PbmtMode.get_encoding(entry.get_field("pbmt_mode").lower()),
+        )
 
-    # Populates the sparse memory with the pagetable entries
-    def create_from_mappings(self):
+    def encode_leaf_ptes(self, leaf_pte_value_without_ppn, pa, page_size, num_pages):
+        # Returns an array("Q") of the leaf PTE values for num_pages
+        # contiguous pages starting at pa.
+        if num_pages >= self.min_num_pages_for_vectorized_encoding and get_numpy() is not None:
+            return self.encode_leaf_ptes_vectorized(
+                leaf_pte_value_without_ppn, pa, page_size, num_pages
+            )
+
+        return array.array(
+            "Q",
+            (
+                self.place_ppn(leaf_pte_value_without_ppn, pa + page_id * page_size)
+                for page_id in range(num_pages)
+            ),
+        )
+
+    def encode_leaf_ptes_vectorized(self, leaf_pte_value_without_ppn, pa, page_size, num_pages):
+        numpy = get_numpy()
+        assert numpy is not None
+
+        page_pas = numpy.arange(num_pages, dtype=numpy.uint64)
+        page_pas *= numpy.uint64(page_size)
+        page_pas += numpy.uint64(pa)
+
+        pte_values = numpy.full(num_pages, leaf_pte_value_without_ppn, dtype=numpy.uint64)
+        for pa_shift, pte_shift, mask in self.pte_codec.ppn_fields:
+            # The PPN fields are 0 in leaf_pte_value_without_ppn so we can
+            # just OR them in.
+            pte_values |= (
+                (page_pas >> numpy.uint64(pa_shift)) & numpy.uint64(mask)
+            ) << numpy.uint64(pte_shift)
+
+        leaf_pte_values = array.array("Q")
+        leaf_pte_values.frombytes(pte_values.tobytes())
+        return leaf_pte_values
+
+    def create_non_leaf_ptes(self, va, leaf_level):
+        # Walks the levels above the leaf level for the given VA, writing the
+        # non-leaf PTEs along the way, and returns the leaf level page.
+        current_level_PT_page = self.get_new_page(va, 0)
+        for current_level in range(leaf_level):
+            next_level_PT_page = self.get_new_page(va, current_level + 1)
+
+            # A non-leaf PTE holds the PPN of the next level page. The walk
+            # adds the next level's VPN to it.
+            pte_value = self.pte_codec.encode(valid=1, pa=next_level_PT_page.get_page_pa())
+
+            pte_address = self.get_pte_address(current_level_PT_page, va, current_level)
+            log.debug(f"PTE address:{hex(pte_address)}, PTE value:{hex(pte_value)}")
+            self.write_sparse_memory(pte_address, pte_value)
+
+            current_level_PT_page = next_level_PT_page
+
+        return current_level_PT_page
+
+    def create_ptes_for_mapping(self, entry):
         source_address_type = TranslationStage.get_translates_from(self.translation_stage)
         dest_address_type = TranslationStage.get_translates_to(self.translation_stage)
 
-        # No page tables for the bare mappings.
-        mappings = [mapping for mapping in self.mappings if mapping.is_bare_mapping() is False]
+        assert self.translation_stage == entry.get_field("translation_stage")
+        page_size = entry.get_field("page_size")
+        assert page_size in self.get_attribute("page_sizes")
+        leaf_level = self.get_attribute("page_sizes").index(page_size)
+        assert leaf_level < self.get_attribute("num_levels")
+        log.debug("\n")
+        log.debug(f"Generating PTEs for {entry}")
+        log.debug(f"Leaf Level: {leaf_level}")
+
+        num_ptes_in_leaf_page = self.get_num_ptes_in_page(leaf_level)
+
+        va = entry.get_field(source_address_type)
+        num_pages_remaining = entry.get_field("num_pages")
+
+        leaf_pte_values = self.encode_leaf_ptes(
+            self.get_leaf_pte_value_without_ppn(entry),
+            entry.get_field(dest_address_type),
+            page_size,
+            num_pages_remaining,
+        )
+        next_pte_value_index = 0
 
-        for entry in self.split_mappings_at_page_granularity(mappings):
-            assert self.translation_stage == entry.get_field("translation_stage")
-            assert entry.get_field("page_size") in self.get_attribute("page_sizes")
-            leaf_level = self.get_attribute("page_sizes").index(entry.get_field("page_size"))
-            assert leaf_level < self.get_attribute("num_levels")
-            log.debug("\n")
-            log.debug(f"Generating PTEs for {entry}")
-            log.debug(f"Leaf Level: {leaf_level}")
-            current_level = 0
-
-            while current_level <= leaf_level:
-                current_level_PT_page = self.get_new_page(
-                    entry.get_field(source_address_type), current_level
-                )
+        while num_pages_remaining > 0:
+            # The non-leaf PTEs are shared by all the pages that land in the
+            # same leaf level pagetable page so we only write them once per
+            # run of pages.
+            leaf_level_PT_page = self.create_non_leaf_ptes(va, leaf_level)
 
-                current_level_range_start = current_level_PT_page.get_page_pa()
-                current_level_range_end = (
-                    current_level_range_start + current_level_PT_page.get_size()
-                )
+            pte_address = self.get_pte_address(leaf_level_PT_page, va, leaf_level)
+            first_pte_index = self.pte_codec.get_vpn(va, leaf_level)
+            num_pages_in_run = min(num_pages_remaining, num_ptes_in_leaf_page - first_pte_index)
 
-                pte_value = BitField.place_bits(
-                    0, 1, self.attributes.common_attributes["valid_bit"]
-                )
+            self.write_sparse_memory_run(
+                pte_address,
+                leaf_pte_values[next_pte_value_index : next_pte_value_index + num_pages_in_run],
+            )
+
+            next_pte_value_index += num_pages_in_run
+            va += num_pages_in_run * page_size
+            num_pages_remaining -= num_pages_in_run
 
-                if current_level < leaf_level:
-                    next_level_pagetable = self.get_new_page(
-                        entry.get_field(source_address_type), current_level + 1
+    @classmethod
+    def get_num_pagetable_pages_for_mappings(cls, translation_mode, memory_mappings):
+        # Returns the number of 4K pages needed to hold the pagetables for the
+        # given non-bare mappings without creating the pagetables.
+        attributes = PageTableAttributes(translation_mode)
+        va_mask = attributes.get_attribute("va_mask")
+        page_range_shifts = [
+            vpn_bits[0] + 1 for vpn_bits in attributes.get_attribute("va_vpn_bits")
+        ]
+
+        pagetable_page_keys = set()
+        for entry in memory_mappings:
+            source_address_type = TranslationStage.get_translates_from(
+                entry.get_field("translation_stage")
+            )
+            leaf_level = attributes.get_attribute("page_sizes").index(entry.get_field("page_size"))
+            va_start = entry.get_field(source_address_type) & va_mask
+            va_end = va_start + entry.get_field("page_size") * entry.get_field("num_pages") - 1
+
+            for level in range(leaf_level + 1):
+                pagetable_page_keys.update(
+                    (level, key)
+                    for key in range(
+                        va_start >> page_range_shifts[level],
+                        (va_end >> page_range_shifts[level]) + 1,
                     )
+                )
 
-                    next_level_range_start = next_level_pagetable.get_page_pa()
-                    next_level_range_end = next_level_range_start + next_level_pagetable.get_size()
+        pagetable_sizes = attributes.get_attribute("pagetable_sizes")
+        return sum(pagetable_sizes[level] for level, _ in pagetable_page_keys) // PageSize.SIZE_4K
 
-                    next_level_pa = next_level_range_start + BitField.extract_bits(
-                        entry.get_field(source_address_type),
-                        self.get_attribute("va_vpn_bits")[current_level],
-                    ) * self.get_attribute("pte_size_in_bytes")
+    @classmethod
+    def get_num_pagetable_pages_required(
+        cls, translation_mode, memory_mappings, enable_superpage_promotion=False
+    ):
+        # Returns the exact number of 4K pages that PageTables will allocate
+        # for the given memory map.
+        mappings = [mapping for mapping in memory_mappings if mapping.is_bare_mapping() is False]
+
+        if enable_superpage_promotion is True:
+            mappings = cls.promote_mappings_to_superpages(translation_mode, mappings)
+
+        return cls.get_num_pagetable_pages_for_mappings(translation_mode, mappings)
+
+    @staticmethod
+    def has_same_leaf_pte_attributes(entry, other_entry):
+        return all(
+            entry.get_field(field_name) == other_entry.get_field(field_name)
+            for field_name in ["xwr", "umode", "pbmt_mode", "valid"]
+        )
 
-                    assert next_level_pa < next_level_range_end
-                else:
-                    xwr_bits = entry.get_field("xwr")
-                    assert xwr_bits != 0x2 and xwr_bits != 0x6
-                    pte_value = BitField.place_bits(
-                        pte_value, xwr_bits, self.attributes.common_attributes["xwr_bits"]
+    @classmethod
+    def promote_mappings_to_superpages(cls, translation_mode, mappings):
+        # Coalesces VA and PA contiguous mappings with the same leaf PTE
+        # attributes and remaps them with the largest page sizes that the VA
+        # and PA alignment allows. Alias mappings are left as they are.
+        if len(mappings) == 0:
+            return []
+
+        translation_stage = mappings[0].get_field("translation_stage")
+        source_address_type = TranslationStage.get_translates_from(translation_stage)
+        dest_address_type = TranslationStage.get_translates_to(translation_stage)
+
+        promoted_mappings = [entry for entry in mappings if entry.get_field("alias") is True]
+
+        # Each range is [entry, va, pa, size_in_bytes] where entry is the first
+        # mapping of the range.
+        contiguous_ranges = []
+        for entry in sorted(
+            [entry for entry in mappings if entry.get_field("alias") is False],
+            key=lambda x: x.get_field(source_address_type),
+        ):
+            va = entry.get_field(source_address_type)
+            pa = entry.get_field(dest_address_type)
+            size = entry.get_field("page_size") * entry.get_field("num_pages")
+
+            if len(contiguous_ranges) > 0:
+                last_entry, last_va, last_pa, last_size = contiguous_ranges[-1]
+                if (
+                    last_va + last_size == va
+                    and last_pa + last_size == pa
+                    and cls.has_same_leaf_pte_attributes(last_entry, entry)
+                ):
+                    contiguous_ranges[-1][3] += size
+                    continue
+
+            contiguous_ranges.append([entry, va, pa, size])
+
+        page_sizes = sorted(
+            PageTableAttributes(translation_mode).get_attribute("page_sizes"), reverse=True
+        )
+        for entry, va, pa, size in contiguous_ranges:
+            last_promoted_mapping = None
+            while size > 0:
+                page_size = next(
+                    page_size
+                    for page_size in page_sizes
+                    if (va % page_size) == 0 and (pa % page_size) == 0 and page_size <= size
+                )
+
+                if (
+                    last_promoted_mapping is not None
+                    and last_promoted_mapping.get_field("page_size") == page_size
+                ):
+                    last_promoted_mapping.set_field(
+                        "num_pages", last_promoted_mapping.get_field("num_pages") + 1
                     )
+                else:
+                    last_promoted_mapping = entry.copy()
+                    last_promoted_mapping.set_field(source_address_type, va)
+                    last_promoted_mapping.set_field(dest_address_type, pa)
+                    last_promoted_mapping.set_field("page_size", page_size)
+                    last_promoted_mapping.set_field("num_pages", 1)
+                    promoted_mappings.append(last_promoted_mapping)
 
-                    if entry.get_field("umode") is not None:
-                        pte_value = BitField.place_bits(
-                            pte_value,
-                            entry.get_field("umode"),
-                            self.attributes.common_attributes["umode_bit"],
-                        )
+                va += page_size
+                pa += page_size
+                size -= page_size
 
-                    pte_value = BitField.place_bits(
-                        pte_value, 1, self.attributes.common_attributes["a_bit"]
-                    )
-                    pte_value = BitField.place_bits(
-                        pte_value, 1, self.attributes.common_attributes["d_bit"]
-                    )
+        return promoted_mappings
 
-                    pbmt_mode = PbmtMode.get_encoding(entry.get_field("pbmt_mode").lower())
-                    pte_value = BitField.place_bits(
-                        pte_value, pbmt_mode, self.attributes.common_attributes["pbmt_bits"]
-                    )
+    # Populates the sparse memory with the pagetable entries
+    def create_from_mappings(self):
+        # No page tables for the bare mappings.
+        mappings = [mapping for mapping in self.mappings if mapping.is_bare_mapping() is False]
 
-                    pte_value = BitField.place_bits(
-                        pte_value,
-                        entry.get_field("valid"),
-                        self.attributes.common_attributes["valid_bit"],
-                    )
+        if self.enable_superpage_promotion is True:
+            promoted_mappings = self.promote_mappings_to_superpages(self.translation_mode, mappings)
+
+            num_pagetable_pages_before = self.get_num_pagetable_pages_for_mappings(
+                self.translation_mode, mappings
+            )
+            num_pagetable_pages_after = self.get_num_pagetable_pages_for_mappings(
+                self.translation_mode, promoted_mappings
+            )
+            log.info(
+                f"{self.translation_stage} stage: Superpage promotion remapped {len(mappings)} mappings as {len(promoted_mappings)} mappings and saved {num_pagetable_pages_before - num_pagetable_pages_after} pagetable pages ({num_pagetable_pages_before} -> {num_pagetable_pages_after})."
+            )
 
-                    next_level_pa = entry.get_field(dest_address_type)
+            mappings = promoted_mappings
 
-                for ppn_id in range(len(self.get_attribute("pa_ppn_bits"))):
-                    ppn_value = BitField.extract_bits(
-                        next_level_pa, self.get_attribute("pa_ppn_bits")[ppn_id]
-                    )
-                    pte_value = BitField.place_bits(
-                        pte_value, ppn_value, self.get_attribute("pte_ppn_bits")[ppn_id]
-                    )
-                current_level_pt_offset = BitField.extract_bits(
-                    entry.get_field(source_address_type),
-                    self.get_attribute("va_vpn_bits")[current_level],
-                )
-                pte_address = (
-                    current_level_range_start
-                    + current_level_pt_offset * self.get_attribute("pte_size_in_bytes")
-                )
-                assert pte_address < current_level_range_end
-                log.debug(f"PTE address:{hex(pte_address)}, PTE value:{hex(pte_value)}")
-                self.write_sparse_memory(pte_address, pte_value)
+        num_pagetable_pages_required = self.get_num_pagetable_pages_for_mappings(
+            self.translation_mode, mappings
+        )
+        if num_pagetable_pages_required > self.max_num_4K_pages:
+            raise ValueError(
+                f"{self.translation_stage} stage: The memory map needs {num_pagetable_pages_required} pagetable pages but max_num_pagetable_pages_per_stage = {self.max_num_4K_pages}. Increase max_num_pagetable_pages_per_stage or set it to auto."
+            )
 
-                current_level += 1
+        for entry in mappings:
+            self.create_ptes_for_mapping(entry)
 
         # Make sure that we have the first and last addresses set so that we
         # know the range of the page table memory when generating the
@@ -580,10 +988,131 @@ class PageTables:
             - self.get_attribute("pte_size_in_bytes")
         )
 
-        if pte_region_sparse_memory_start not in self.pte_memory:
-            self.pte_memory[pte_region_sparse_memory_start] = 0
-        if pte_region_sparse_memory_end not in self.pte_memory:
-            self.pte_memory[pte_region_sparse_memory_end] = 0
+        if self.read_sparse_memory(pte_region_sparse_memory_start) is None:
+            self.write_sparse_memory(pte_region_sparse_memory_start, 0)
+        if self.read_sparse_memory(pte_region_sparse_memory_end) is None:
+            self.write_sparse_memory(pte_region_sparse_memory_end, 0)
 
     def get_mappings(self):
         return self.mappings
+
+    def get_mapped_ranges(self):
+        # Walks the page tables depth-first from the root page and returns
+        # the ranges mapped by the valid leaf PTEs, sorted by source address
+        # and coalesced. Only the written PTEs are visited so this runs in
+        # time proportional to the number of PTEs, not the address space.
+        va_bits = self.get_attribute("va_vpn_bits")[0][0] + 1
+        sign_extend_va = self.translation_stage != "g"
+
+        mapped_ranges = []
+
+        def walk(page, level, va_base):
+            pte_shift = self.pte_codec.vpn_fields[level][0]
+            for pte_address, pte_value in page.get_ptes():
+                pte = self.pte_codec.decode(pte_value)
+                if pte.valid == 0:
+                    continue
+
+                va = va_base | (
+                    ((pte_address - page.get_page_pa()) // page.pte_size_in_bytes) << pte_shift
+                )
+
+                if pte.xwr == 0:
+                    next_page = self.get_page_containing_address(pte.pa)
+                    assert next_page is not None and next_page.get_level() == level + 1
+                    walk(next_page, level + 1, va)
+                    continue
+
+                if sign_extend_va and (va >> (va_bits - 1)) & 1:
+                    va |= ((1 << 64) - 1) ^ ((1 << va_bits) - 1)
+
+                mapped_ranges.append(
+                    {
+                        "source_address": va,
+                        "dest_address": pte.pa,
+                        "size": 1 << pte_shift,
+                        "xwr": pte.xwr,
+                        "umode": pte.umode,
+                        "pbmt_mode": PbmtMode.Encoding(pte.pbmt).name.lower(),
+                        "page_size": 1 << pte_shift,
+                    }
+                )
+
+        walk(self.get_page_containing_address(self.start_address), 0, 0)
+
+        return self.coalesce_mapped_ranges(
+            sorted(mapped_ranges, key=lambda mapped_range: mapped_range["source_address"])
+        )
+
+    @staticmethod
+    def coalesce_mapped_ranges(mapped_ranges):
+        # Merges source address sorted ranges that are contiguous in both the
+        # source and destination address spaces and have the same attributes.
+        coalesced_ranges = []
+        for mapped_range in mapped_ranges:
+            if len(coalesced_ranges) > 0:
+                last_range = coalesced_ranges[-1]
+                if (
+                    last_range["source_address"] + last_range["size"]
+                    == mapped_range["source_address"]
+                    and last_range["dest_address"] + last_range["size"]
+                    == mapped_range["dest_address"]
+                    and all(
+                        last_range[attribute] == mapped_range[attribute]
+                        for attribute in ["xwr", "umode", "pbmt_mode", "page_size"]
+                    )
+                ):
+                    last_range["size"] += mapped_range["size"]
+                    continue
+
+            coalesced_ranges.append(dict(mapped_range))
+
+        return coalesced_ranges
+
+    @classmethod
+    def compose_mapped_ranges(cls, vs_stage_ranges, g_stage_ranges):
+        # Composes the VA -> GPA ranges of the VS stage with the GPA -> SPA
+        # ranges of the G stage into VA -> SPA ranges. GPAs that the G stage
+        # doesn't map are dropped. Both lists must be sorted by source address.
+        g_stage_starts = [g_stage_range["source_address"] for g_stage_range in g_stage_ranges]
+
+        composed_ranges = []
+        for vs_stage_range in vs_stage_ranges:
+            gpa = vs_stage_range["dest_address"]
+            gpa_end = gpa + vs_stage_range["size"]
+
+            g_stage_range_id = max(bisect.bisect_right(g_stage_starts, gpa) - 1, 0)
+            while g_stage_range_id < len(g_stage_ranges) and gpa < gpa_end:
+                g_stage_range = g_stage_ranges[g_stage_range_id]
+                g_stage_range_end = g_stage_range["source_address"] + g_stage_range["size"]
+                if g_stage_range_end <= gpa:
+                    g_stage_range_id += 1
+                    continue
+                if g_stage_range["source_address"] >= gpa_end:
+                    break
+
+                overlap_start = max(gpa, g_stage_range["source_address"])
+                overlap_end = min(gpa_end, g_stage_range_end)
+
+                # The VS stage PBMT overrides the G stage PBMT unless it is PMA.
+                pbmt_mode = vs_stage_range["pbmt_mode"]
+                if pbmt_mode == "pma":
+                    pbmt_mode = g_stage_range["pbmt_mode"]
+
+                composed_ranges.append(
+                    {
+                        "source_address": vs_stage_range["source_address"]
+                        + (overlap_start - vs_stage_range["dest_address"]),
+                        "dest_address": g_stage_range["dest_address"]
+                        + (overlap_start - g_stage_range["source_address"]),
+                        "size": overlap_end - overlap_start,
+                        "xwr": vs_stage_range["xwr"] & g_stage_range["xwr"],
+                        "umode": vs_stage_range["umode"],
+                        "pbmt_mode": pbmt_mode,
+                        "page_size": min(vs_stage_range["page_size"], g_stage_range["page_size"]),
+                    }
+                )
+
+                gpa = overlap_end
+
+        return cls.coalesce_mapped_ranges(composed_ranges)
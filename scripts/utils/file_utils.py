@@ -0,0 +1,31 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+
+# mkstemp() creates files that are only accessible by the owner. Give the
+# renamed file the permissions that open() would have.
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def write_file_atomically(file_path, content):
+    # Writes content (str or bytes) to a temporary file next to file_path and
+    # renames it over file_path so that readers never see a partially written
+    # file. Replacing the file also leaves any hard links to the old file
+    # untouched.
+    file_dir, file_name = os.path.split(os.path.abspath(file_path))
+    temp_file_descriptor, temp_file_path = tempfile.mkstemp(
+        prefix=f".{file_name}.", suffix=".tmp", dir=file_dir
+    )
+    try:
+        with os.fdopen(temp_file_descriptor, "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+        os.chmod(temp_file_path, 0o666 & ~_umask)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        raise
@@ -0,0 +1,171 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import logging as log
+import os
+import shutil
+import tempfile
+
+from .file_utils import write_file_atomically
+
+
+def get_default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "jumpstart", "generated_sources")
+
+
+def hash_files(file_paths):
+    file_hash = hashlib.sha256()
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            file_hash.update(hashlib.sha256(f.read()).digest())
+    return file_hash.hexdigest()
+
+
+class GeneratedSourcesCache:
+    # Content-addressed cache of the files written by the diag source
+    # generator.
+    #
+    # Each entry is a directory named after the hash of everything the
+    # generated files depend on and holds a copy of each file along with a
+    # manifest of their paths relative to the output directory. The relative
+    # paths are part of the key as the generated files refer to each other by
+    # them. On a hit the files are copied into the output directory. Copies
+    # get a current modification time so build systems comparing
+    # modification times see the restored files as new.
+    #
+    # Entries are created in a temporary directory and renamed into place so
+    # concurrent generators never see partial entries. The modification time
+    # of an entry directory is bumped on every hit and evict() removes the
+    # least recently used entries until the cache fits in max_size_in_bytes.
+    manifest_file_name = "manifest.json"
+
+    def __init__(self, cache_dir, max_size_in_bytes):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_in_bytes = max_size_in_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, generator_version, input_files, arguments, output_files, output_dir):
+        # input_files are hashed by content and arguments have to be JSON
+        # serializable. Only the paths of output_files relative to output_dir
+        # are part of the key so that the same sources generated in another
+        # build directory hit.
+        key_data = {
+            "generator_version": generator_version,
+            "input_files": {
+                input_file: hash_files([input_file]) for input_file in sorted(input_files)
+            },
+            "arguments": arguments,
+            "output_files": sorted(
+                os.path.relpath(output_file, output_dir) for output_file in output_files
+            ),
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def get_entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def restore(self, key, output_dir):
+        # Copies the files of the entry for key into output_dir. Returns True
+        # on a hit.
+        entry_dir = self.get_entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, self.manifest_file_name)) as f:
+                output_files = json.load(f)["output_files"]
+
+            for file_id, output_file in enumerate(output_files):
+                self.copy_file(
+                    os.path.join(entry_dir, str(file_id)), os.path.join(output_dir, output_file)
+                )
+
+            # Mark the entry as most recently used.
+            os.utime(entry_dir)
+        except OSError:
+            # Missing entry or one evicted while it was being restored.
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        return True
+
+    def copy_file(self, cached_file, output_file):
+        # A hard link would share the modification time of the cached file,
+        # which is older than the inputs the file is restored for, and
+        # touching it would change the time seen through the links of every
+        # other build. Replace the output with a copy instead.
+        with open(cached_file, "rb") as f:
+            write_file_atomically(output_file, f.read())
+
+    def store(self, key, output_files, output_dir):
+        entry_dir = self.get_entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+
+        temp_entry_dir = tempfile.mkdtemp(prefix=".tmp.", dir=self.cache_dir)
+        try:
+            for file_id, output_file in enumerate(output_files):
+                shutil.copyfile(output_file, os.path.join(temp_entry_dir, str(file_id)))
+
+            with open(os.path.join(temp_entry_dir, self.manifest_file_name), "w") as f:
+                json.dump(
+                    {
+                        "output_files": [
+                            os.path.relpath(output_file, output_dir) for output_file in output_files
+                        ]
+                    },
+                    f,
+                )
+
+            os.rename(temp_entry_dir, entry_dir)
+        except OSError as exc:
+            # Another generator stored the same entry first or the cache
+            # isn't writable. Neither affects the generated files.
+            log.debug(f"Not caching the generated sources in {entry_dir}: {exc}")
+            shutil.rmtree(temp_entry_dir, ignore_errors=True)
+
+    def get_entries(self):
+        # Returns (last use time, size in bytes, entry dir) for each entry.
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            if entry_name.startswith("."):
+                continue
+            entry_dir = os.path.join(self.cache_dir, entry_name)
+            try:
+                entry_size = sum(
+                    os.stat(os.path.join(entry_dir, file_name)).st_size
+                    for file_name in os.listdir(entry_dir)
+                )
+                entries.append((os.stat(entry_dir).st_mtime, entry_size, entry_dir))
+            except OSError:
+                # Evicted by another process.
+                continue
+        return entries
+
+    def evict(self):
+        # Removes the least recently used entries until the cache fits in
+        # max_size_in_bytes.
+        entries = sorted(self.get_entries())
+        cache_size = sum(entry_size for _, entry_size, _ in entries)
+
+        for _, entry_size, entry_dir in entries:
+            if cache_size <= self.max_size_in_bytes:
+                break
+
+            # Rename the entry out of the way first so that it is removed
+            # atomically for anyone trying to restore it.
+            evicted_entry_dir = tempfile.mkdtemp(prefix=".evicted.", dir=self.cache_dir)
+            try:
+                os.rename(entry_dir, os.path.join(evicted_entry_dir, "entry"))
+                cache_size -= entry_size
+            except OSError:
+                pass
+            shutil.rmtree(evicted_entry_dir, ignore_errors=True)
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses}
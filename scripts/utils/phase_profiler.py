@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2026 Rivos Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import cProfile
+import json
+import time
+import tracemalloc
+
+
+class PhaseProfiler:
+    # Records the wall time and the peak memory allocated by Python (as seen
+    # by tracemalloc) of named phases. Phases can be nested and are named
+    # after the phases they are nested in, e.g.
+    # process_memory_map/create_page_tables.
+    #
+    # A disabled profiler doesn't measure anything so callers don't need to
+    # check whether profiling is enabled.
+    def __init__(self, enabled=True, cprofile=False):
+        self.enabled = enabled
+        self.phases = []
+
+        # Names and peak memory of the phases that haven't ended yet.
+        self.open_phase_names = []
+        self.open_phase_peaks = []
+
+        self.cprofile = None
+        if enabled and cprofile:
+            self.cprofile = cProfile.Profile()
+
+        # Tracing is left on once started so that the peaks include the
+        # memory still held from earlier phases.
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def phase(self, name, output_file=None):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._phase(name, output_file)
+
+    @contextlib.contextmanager
+    def _phase(self, name, output_file):
+        if self.cprofile is not None and len(self.open_phase_names) == 0:
+            self.cprofile.enable()
+
+        # tracemalloc only keeps one peak so save the peak of the enclosing
+        # phase before resetting it.
+        if len(self.open_phase_peaks) > 0:
+            self.open_phase_peaks[-1] = max(
+                self.open_phase_peaks[-1], tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+
+        self.open_phase_names.append(name)
+        self.open_phase_peaks.append(0)
+        phase = {"name": "/".join(self.open_phase_names)}
+        if output_file is not None:
+            phase["output_file"] = output_file
+        # Phases are listed in the order they start.
+        self.phases.append(phase)
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase["wall_time_in_seconds"] = time.perf_counter() - start_time
+            phase["peak_memory_in_bytes"] = max(
+                self.open_phase_peaks.pop(), tracemalloc.get_traced_memory()[1]
+            )
+            self.open_phase_names.pop()
+            if len(self.open_phase_peaks) > 0:
+                self.open_phase_peaks[-1] = max(
+                    self.open_phase_peaks[-1], phase["peak_memory_in_bytes"]
+                )
+
+            if self.cprofile is not None and len(self.open_phase_names) == 0:
+                self.cprofile.disable()
+
+    def get_profile(self):
+        top_level_phases = [phase for phase in self.phases if "/" not in phase["name"]]
+        return {
+            "wall_time_in_seconds": sum(
+                phase["wall_time_in_seconds"] for phase in top_level_phases
+            ),
+            "peak_memory_in_bytes": max(
+                (phase["peak_memory_in_bytes"] for phase in top_level_phases), default=0
+            ),
+            "phases": self.phases,
+        }
+
+    def write(self, profile_file_prefix):
+        # Writes <prefix>.json and, with cProfile enabled, the cProfile stats
+        # to <prefix>.cprofile. The stats can be read with pstats.
+        with open(f"{profile_file_prefix}.json", "w") as f:
+            json.dump(self.get_profile(), f, indent=2)
+            f.write("\n")
+
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(f"{profile_file_prefix}.cprofile")